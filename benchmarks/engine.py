@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""engine.py: parse time of the argparse and the fast engine
+
+Usage: python benchmarks/engine.py [N ...]
+
+Parses a few typical command lines against a generated tree of N
+subcommands with either engine and prints microseconds per parse.
+"""
+
+import sys
+import timeit
+
+from argparse_deco import Arg, Flag
+from argparse_deco.command import Command
+from argparse_deco.engine import ENGINES
+
+
+def make_function(index: int):
+    """a generated command with a handful of options"""
+    def command(name: Arg(), paths: Arg(nargs='*'),
+                limit: Arg('--limit', type=int)=10,
+                output: Arg('-o', '--output')=None,
+                force: Flag('-f', '--force')=False,
+                tags: Arg('--tag', action='append')=None):
+        pass
+    command.__name__ = f"command{index}"
+    command.__qualname__ = f"command{index}"
+    return command
+
+
+def main(sizes, number: int=2000):
+    print(f"{'nodes':>7} {'argparse':>9} {'fast':>9} {'speedup':>8}")
+    for count in sizes:
+        class root:
+            """generated root"""
+        command = Command(root)
+        for index in range(count):
+            command.subcommand(make_function(index))
+        parser = command.setup_parser()
+        last = f"command{count - 1}"
+        argvs = [[last, 'name'],
+                 [last, '--limit', '5', 'name', 'a', 'b', 'c'],
+                 ['command0', '-f', '--output=out', '--tag', 'x', '--tag',
+                  'y', '--lim', '3', 'name', 'path']]
+        timings = dict()
+        for engine_name, factory in ENGINES.items():
+            engine = factory(parser)
+            for args in argvs:
+                engine.parse_args(args)
+            timings[engine_name] = min(timeit.repeat(
+                lambda: [engine.parse_args(args) for args in argvs],
+                number=number, repeat=3)) / number / len(argvs) * 1e6
+        print(f"{count:>7} {timings['argparse']:>8.1f}u "
+              f"{timings['fast']:>8.1f}u "
+              f"{timings['argparse'] / timings['fast']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [10, 100, 1000])
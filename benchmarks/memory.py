@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""memory.py: memory usage of large generated command trees
+
+Usage: python benchmarks/memory.py [N ...]
+
+Every size is measured in a fresh subprocess, so RSS figures are not
+polluted by earlier runs.
+"""
+
+import gc
+import os
+import subprocess
+import sys
+import tracemalloc
+
+from argparse_deco import Arg
+from argparse_deco.command import Command
+
+
+def make_function(index: int):
+    """a generated command as an API schema would produce it"""
+    def command(name: Arg('--name', help="name of the resource"),
+                limit: Arg('--limit', type=int, help="maximum count")=10):
+        pass
+    command.__name__ = f"command{index}"
+    command.__qualname__ = f"command{index}"
+    command.__doc__ = "generated " + "command"
+    return command
+
+
+def rss() -> int:
+    """current resident set size in bytes (Linux only)"""
+    try:
+        with open('/proc/self/statm') as fp:
+            return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return 0
+
+
+def measure(count: int, compact: bool):
+    class root:
+        """generated root"""
+    gc.collect()
+    rss_before = rss()
+    tracemalloc.start()
+    command = Command(root, compact=compact)
+    for index in range(count):
+        command.subcommand(make_function(index))
+    tree_size = tracemalloc.get_traced_memory()[0]
+    parser = command.setup_parser()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss()
+    del parser
+    return tree_size, current, peak, rss_after - rss_before
+
+
+def main(sizes):
+    print(f"{'nodes':>7} {'mode':>8} {'tree/node':>10} {'built/node':>11} "
+          f"{'peak/node':>10} {'rss/node':>9}")
+    for count in sizes:
+        for compact in (False, True):
+            output = subprocess.check_output(
+                [sys.executable, __file__, '--run', str(count),
+                 str(int(compact))])
+            tree, built, peak, delta = map(int, output.split())
+            mode = 'compact' if compact else 'default'
+            print(f"{count:>7} {mode:>8} {tree // count:>10} "
+                  f"{built // count:>11} {peak // count:>10} "
+                  f"{delta // count:>9}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        print(*measure(int(sys.argv[2]), sys.argv[3] == '1'))
+    else:
+        main([int(size) for size in sys.argv[1:]] or [100, 1000, 10000])
@@ -19,15 +19,45 @@
 #
 """arguments.py: store arguments in annotation"""
 
+import argparse
+import os
+import sys
+
 from .compat import HAS_PY37, PEP560Meta
+from .streams import RecordStream, ResponseFile, Responses
+from .vectors import VectorAction, check_typecode, ranges_type, vector_type
+
+__all__ = ('Arg', 'Flag', 'Append', 'Count', 'Response', 'Vector',
+           'Ranges', 'Records')
+
+
+def intern_strings(values) -> tuple:
+    """interns option strings, so equal flags share a single object"""
+    return tuple(sys.intern(value) if isinstance(value, str) else value
+                 for value in values)
+
+
+def intern_help(kwargs: dict) -> dict:
+    """interns the help text of `kwargs` (in place)"""
+    text = kwargs.get('help')
+    if isinstance(text, str):
+        kwargs['help'] = sys.intern(text)
+    return kwargs
+
 
-__all__ = ('Arg', 'Flag', 'Append', 'Count')
+def check_fanout(fanout):
+    """`fanout` of `Arg`: False, True (or 'thread') for running the
+    command once per item on threads or 'process' on processes"""
+    if fanout not in (False, True, 'thread', 'process'):
+        raise ValueError(f"Unknown fanout {fanout!r}, expected True, "
+                         "'thread' or 'process'")
+    return fanout
 
 
 class Arg(metaclass=type if HAS_PY37 else PEP560Meta):
     """Stores argument's options in the annotation"""
 
-    __slots__ = ('name_or_flags', 'kwargs', 'group')
+    __slots__ = ('name_or_flags', 'kwargs', 'group', 'fanout')
 
     def __class_getitem__(cls, group):
         """assigns argument to a group"""
@@ -35,15 +65,18 @@ class Arg(metaclass=type if HAS_PY37 else PEP560Meta):
         arg.group = group
         return arg
 
-    def __init__(self, *name_or_flags, **kwargs):
-        self.name_or_flags = name_or_flags
-        self.kwargs = kwargs
+    def __init__(self, *name_or_flags, fanout=False, **kwargs):
+        self.name_or_flags = intern_strings(name_or_flags)
+        self.kwargs = intern_help(kwargs)
         self.group = None
+        self.fanout = check_fanout(fanout)
 
     def __call__(self, *name_or_flags, **kwargs):
         if name_or_flags:
-            self.name_or_flags = name_or_flags
-        self.kwargs.update(kwargs)
+            self.name_or_flags = intern_strings(name_or_flags)
+        if 'fanout' in kwargs:
+            self.fanout = check_fanout(kwargs.pop('fanout'))
+        self.kwargs.update(intern_help(kwargs))
         return self
 
     def __repr__(self) -> str:
@@ -54,6 +87,8 @@ class Arg(metaclass=type if HAS_PY37 else PEP560Meta):
                 yield repr(s)
             for k, v in self.kwargs.items():
                 yield f"{k}={v}"
+            if self.fanout:
+                yield f"fanout={self.fanout!r}"
         return f"{type(self).__name__}{group}({', '.join(args())})"
 
     def apply(self, parser, name: str, default=None) -> None:
@@ -97,3 +132,148 @@ class Count(Arg):
         kwargs['action'] = 'count'
         kwargs['dest'] = name
         parser.add_argument(*args, **kwargs)
+
+
+class ResponseAction(argparse.Action):
+    """Collects values and `@file` response files lazily. The values
+    are converted by `convert` and checked against `allowed` here, the
+    records of response files while iterating them."""
+
+    def __init__(self, *args, prefix: str='@', delimiter: bytes=None,
+                 convert=None, allowed=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefix = prefix
+        self.delimiter = delimiter
+        self.convert = convert
+        self.allowed = allowed
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        if isinstance(values, str):
+            values = (values,)
+        name = '/'.join(self.option_strings) or self.dest
+        sources = []
+        for value in values:
+            if value.startswith(self.prefix):
+                path = value[len(self.prefix):]
+                if not os.access(path, os.R_OK):
+                    parser.error(f"argument {name}: can't read response "
+                                 f"file {path!r}")
+                sources.append(ResponseFile(path, self.delimiter,
+                                            self.convert, self.allowed))
+                continue
+            if self.convert is not None:
+                try:
+                    value = self.convert(value)
+                except (TypeError, ValueError):
+                    type_name = getattr(self.convert, '__name__',
+                                        repr(self.convert))
+                    parser.error(f"argument {name}: invalid {type_name} "
+                                 f"value: {value!r}")
+            if self.allowed is not None and value not in self.allowed:
+                parser.error(f"argument {name}: invalid choice: {value!r}")
+            sources.append(value)
+        responses = getattr(namespace, self.dest, None)
+        if not isinstance(responses, Responses):
+            responses = Responses()
+        setattr(namespace, self.dest, responses + sources)
+
+
+class Response(Arg):
+    """Values which may be read from `@file` response files (NUL or
+    newline delimited). The parameter receives a lazy iterable instead
+    of a list, hence response files are only read while iterating.
+    `type` and `choices` apply to the records of response files too."""
+
+    def apply(self, parser, name: str, default=None) -> None:
+        args = self.name_or_flags
+        kwargs = dict(self.kwargs)
+        kwargs['dest'] = name
+        kwargs['action'] = ResponseAction
+        # argparse would convert the `@file` argument itself
+        kwargs['convert'] = kwargs.pop('type', None)
+        kwargs['allowed'] = kwargs.pop('choices', None)
+        kwargs.setdefault('nargs', '*')
+        kwargs['default'] = Responses(default or ())
+        parser.add_argument(*args, **kwargs)
+
+
+class Records(Arg):
+    """A path (`-` for standard input) received as lazy `RecordStream`:
+    an iterable of batches of up to `batch_size` records ending with
+    `delimiter` (newline by default, e.g. `b'\\0'`) or, with `size`,
+    of fixed size chunks. The file is only opened while iterating."""
+
+    __slots__ = ('delimiter', 'size', 'batch_size')
+
+    def __init__(self, *name_or_flags, delimiter: bytes=b'\n',
+                 size: int=None, batch_size: int=1024, **kwargs):
+        super().__init__(*name_or_flags, **kwargs)
+        self.delimiter = delimiter
+        self.size = size
+        self.batch_size = batch_size
+
+    def __call__(self, *name_or_flags, **kwargs):
+        for name in ('delimiter', 'size', 'batch_size'):
+            if name in kwargs:
+                setattr(self, name, kwargs.pop(name))
+        return super().__call__(*name_or_flags, **kwargs)
+
+    def records(self, path: str) -> RecordStream:
+        return RecordStream(path, self.delimiter, self.size,
+                            self.batch_size)
+
+    def apply(self, parser, name: str, default=None) -> None:
+        args = self.name_or_flags
+        kwargs = self.kwargs
+        kwargs['dest'] = name
+        kwargs['type'] = self.records
+        if default:
+            kwargs['default'] = default
+        parser.add_argument(*args, **kwargs)
+
+
+class Vector(Arg):
+    """Comma separated numbers (e.g. `--weights 0.1,0.2,0.7`) parsed
+    into a compact `array.array` of `typecode` instead of a list of
+    boxed numbers. Several values or occurrences are concatenated.
+    argparse takes a value starting with a negative number for an
+    option, so it has to be attached: `--weights=-0.5,0.2`."""
+
+    __slots__ = ('typecode',)
+
+    convert = staticmethod(vector_type)
+
+    def __init__(self, *name_or_flags, typecode: str='d', **kwargs):
+        super().__init__(*name_or_flags, **kwargs)
+        self.typecode = check_typecode(typecode)
+
+    def __call__(self, *name_or_flags, **kwargs):
+        if 'typecode' in kwargs:
+            self.typecode = check_typecode(kwargs.pop('typecode'))
+        return super().__call__(*name_or_flags, **kwargs)
+
+    def apply(self, parser, name: str, default=None) -> None:
+        args = self.name_or_flags
+        kwargs = self.kwargs
+        kwargs['dest'] = name
+        kwargs['type'] = self.convert(self.typecode)
+        kwargs['action'] = VectorAction
+        kwargs['typecode'] = self.typecode
+        if default is not None:
+            kwargs['default'] = default
+        parser.add_argument(*args, **kwargs)
+
+
+class Ranges(Vector):
+    """Integers and inclusive ranges `FIRST-LAST[:STEP]`, e.g.
+    `--ids 1-100000:2,5,9`. Bounds may be negative (`--ids=-5--1,3`,
+    attached like negative `Vector` values). A single range is kept as
+    lazy `range`, others are expanded into an `array.array` of
+    `typecode`."""
+
+    __slots__ = ()
+
+    convert = staticmethod(ranges_type)
+
+    def __init__(self, *name_or_flags, typecode: str='q', **kwargs):
+        super().__init__(*name_or_flags, typecode=typecode, **kwargs)
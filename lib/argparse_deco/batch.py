@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""batch.py: Batch files of command lines, sharded across nodes"""
+
+import heapq
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Container, Iterable, Iterator, Optional, Tuple
+
+__all__ = ('Shard', 'iter_lines', 'ResultWriter', 'Journal',
+           'merge_shards', 'SHARD_BY')
+
+SHARD_BY = ('stride', 'hash')
+
+
+class Shard:
+    """The share `index` of `count` shares of a batch: every `count`-th
+    line or, if `hashed`, the lines whose CRC-32 falls into it. Both
+    are stable across machines and runs."""
+
+    __slots__ = ('index', 'count', 'hashed')
+
+    def __init__(self, index: int, count: int, hashed: bool=False):
+        if not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index}/{count}")
+        self.index = index
+        self.count = count
+        self.hashed = hashed
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}({self.index}, {self.count}, "
+                f"hashed={self.hashed})")
+
+    def __str__(self) -> str:
+        return f"{self.index}-of-{self.count}"
+
+    def selects(self, position: int, line: bytes) -> bool:
+        if self.hashed:
+            return zlib.crc32(line) % self.count == self.index
+        return position % self.count == self.index
+
+
+def shard(text: str) -> Shard:
+    """argument type of `--shard INDEX/COUNT`"""
+    index, separator, count = text.partition('/')
+    if not separator:
+        raise ValueError(text)
+    return Shard(int(index), int(count))
+
+
+def iter_lines(path: str, shard: Shard=None,
+               skip: Container[int]=()) -> Iterator[Tuple[int, str]]:
+    """`(position, line)` of the non-blank lines of the file `path`
+    (`-` for standard input) which belong to `shard` and whose position
+    is not in `skip`. Other lines are skipped before they are even
+    decoded."""
+    fp = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    try:
+        for position, line in enumerate(fp):
+            if position in skip:
+                continue
+            line = line.rstrip(b'\r\n')
+            if shard is not None and not shard.selects(position, line):
+                continue
+            if line.strip():
+                yield position, os.fsdecode(line)
+    finally:
+        if fp is not sys.stdin.buffer:
+            fp.close()
+
+
+class ResultWriter:
+    """Writes JSON lines `{"item": position, "result": ...}` (or
+    `"error"`) to the file `path` (`-` for standard output),
+    replacing or extending (`append`) it. `offset` is the size of the
+    file after the last record (None for standard output)."""
+
+    def __init__(self, path: str='-', append: bool=False):
+        self.path = path
+        self.append = append
+        self.fp = None
+        self.count = 0
+        self.errors = 0
+        self.offset = None
+
+    def __enter__(self):
+        if self.path == '-':
+            self.fp = sys.stdout
+        else:
+            self.fp = open(self.path, 'a' if self.append else 'w',
+                           encoding='utf-8')
+            self.offset = self.fp.seek(0, os.SEEK_END)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, position: int, result=None,
+              error: BaseException=None) -> None:
+        if error is None:
+            record = dict(item=position, result=result)
+        else:
+            record = dict(item=position, error=describe(error))
+            self.errors += 1
+        # ASCII only, so the length is the size in bytes
+        line = json.dumps(record, default=str) + '\n'
+        self.fp.write(line)
+        self.count += 1
+        if self.offset is not None:
+            self.offset += len(line)
+
+    def flush(self) -> None:
+        self.fp.flush()
+
+    def sync(self) -> None:
+        """flushes the records to the disk"""
+        self.fp.flush()
+        if self.fp is not sys.stdout:
+            os.fsync(self.fp.fileno())
+
+    def close(self) -> None:
+        if self.fp is not None:
+            self.fp.flush()
+            if self.fp is not sys.stdout:
+                self.fp.close()
+            self.fp = None
+
+
+class Positions:
+    """Set of non-negative integers as bitmap, one bit per position"""
+
+    __slots__ = ('bits', 'count')
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, position: int) -> bool:
+        index = position >> 3
+        return index < len(self.bits) \
+            and bool(self.bits[index] & 1 << (position & 7))
+
+    def add(self, position: int) -> None:
+        index = position >> 3
+        if index >= len(self.bits):
+            self.bits.extend(bytes(max(index + 1 - len(self.bits),
+                                       len(self.bits))))
+        if not self.bits[index] & 1 << (position & 7):
+            self.bits[index] |= 1 << (position & 7)
+            self.count += 1
+
+
+class Journal:
+    """Append-only journal of a batch run at `path`: a line
+    `position status offset` for every item run, `offset` being the
+    size of the result file `results` after its result. The records
+    are kept in memory and written to the disk by `sync`, which the
+    caller runs every `sync_every` items or `sync_interval` seconds
+    after syncing the results, so the journal never gets ahead of
+    them. An existing journal is loaded up to the last record whose
+    offset the result file still reaches: its `completed` positions
+    are skipped and `truncate` cuts the result file back to that
+    offset, dropping results of unjournaled items.
+    """
+
+    def __init__(self, path: str, results: str='-', sync_every: int=1000,
+                 sync_interval: float=1.0):
+        self.path = path
+        self.results = results
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.completed = Positions()
+        self.offset = None
+        self.pending = []
+        self.synced = time.monotonic()
+        self.fp = None
+        self.load()
+
+    def __enter__(self):
+        self.fp = open(self.path, 'a', encoding='ascii')
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def resumed(self) -> bool:
+        return len(self.completed) > 0
+
+    def load(self) -> None:
+        try:
+            fp = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with fp:
+            data = fp.read()
+        size = None
+        if self.results != '-':
+            try:
+                size = os.path.getsize(self.results)
+            except FileNotFoundError:
+                size = 0
+        end = 0
+        # a torn last record of an interrupted write has no newline
+        for line in data[:data.rfind(b'\n') + 1].splitlines(True):
+            position, status, offset = line.split()
+            offset = None if offset == b'-' else int(offset)
+            if offset is not None and size is not None and offset > size:
+                # the results of the following records were lost
+                break
+            self.completed.add(int(position))
+            self.offset = offset
+            end += len(line)
+        if end < len(data):
+            os.truncate(self.path, end)
+
+    def truncate(self) -> None:
+        """cuts the result file back to the journaled offset"""
+        if self.offset is None or self.results == '-':
+            return
+        try:
+            if os.path.getsize(self.results) > self.offset:
+                os.truncate(self.results, self.offset)
+        except FileNotFoundError:
+            pass
+
+    def record(self, position: int, failed: bool=False,
+               offset: Optional[int]=None) -> bool:
+        """journals the item at `position` (in memory until `sync`);
+        returns whether it is time to sync the results and the journal
+        """
+        self.pending.append(
+            f"{position} {'failed' if failed else 'done'} "
+            f"{'-' if offset is None else offset}\n")
+        self.completed.add(position)
+        return len(self.pending) >= self.sync_every \
+            or time.monotonic() - self.synced >= self.sync_interval
+
+    def sync(self) -> None:
+        """writes the pending records to the disk; the results must
+        have been synced before"""
+        self.fp.write(''.join(self.pending))
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.pending = []
+        self.synced = time.monotonic()
+
+    def close(self) -> None:
+        if self.fp is not None:
+            self.sync()
+            self.fp.close()
+            self.fp = None
+
+
+def describe(error: BaseException) -> str:
+    if isinstance(error, SystemExit):
+        return f"exit status {error.code}"
+    return f"{type(error).__name__}: {error}"
+
+
+def read_results(path: str) -> Iterator[Tuple[int, str]]:
+    with open(path, encoding='utf-8') as fp:
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)['item'], line
+
+
+def merge_shards(paths: Iterable[str], output: str) -> int:
+    """merges the result files of all shards into `output` in input
+    order; returns the number of results"""
+    count = 0
+    with open(output, 'w', encoding='utf-8') as fp:
+        for position, line in heapq.merge(
+                *(read_results(path) for path in paths),
+                key=lambda result: result[0]):
+            fp.write(line if line.endswith('\n') else line + '\n')
+            count += 1
+    return count
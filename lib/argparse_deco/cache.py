@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""cache.py: On-disk memoization of command results"""
+
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+from typing import Any, Optional
+
+from .limits import parse_size
+from .streams import RecordStream, Responses
+
+__all__ = ('ResultCache', 'fingerprint')
+
+MTIME = 'mtime'
+CONTENT = 'content'
+
+# file of the cache directory keeping the estimated size of all entries
+SIZE_FILE = 'size'
+# eviction keeps this fraction of `max_size`, so the next writes do not
+# have to evict again right away
+LOW_WATER = 0.9
+
+
+def default_directory() -> str:
+    base = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'argparse-deco')
+
+
+def fingerprint(path, mode: str=MTIME) -> str:
+    """identifies the state of a file or directory tree by modification
+    times and sizes (`mtime`) or by a hash of the contents (`content`)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 'missing'
+    if os.path.isdir(path):
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(path)):
+            digest.update(name.encode('utf-8', 'surrogateescape'))
+            digest.update(fingerprint(os.path.join(path, name), mode)
+                          .encode())
+        return digest.hexdigest()
+    if mode == MTIME:
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Uncacheable(Exception):
+    """an argument has no stable representation"""
+
+
+class ResultCache:
+    """Pickled results of a command keyed by its arguments and the
+    fingerprints of path arguments, evicting the least recently used
+    entries beyond `max_size` bytes.
+
+    Writes keep a running estimate of the total size in the cache
+    directory and only scan the entries when it exceeds `max_size`
+    (or is missing), so storing a result does not cost a `stat` of
+    every entry."""
+
+    __slots__ = ('directory', 'max_size', 'mode')
+
+    def __init__(self, directory: str=None, max_size='1G',
+                 fingerprint: str=MTIME):
+        if fingerprint not in (MTIME, CONTENT):
+            raise ValueError(f"Unknown fingerprint mode {fingerprint!r}")
+        self.directory = directory
+        self.max_size = parse_size(max_size)
+        self.mode = fingerprint
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}({self.directory!r}, "
+                f"max_size={self.max_size!r}, fingerprint={self.mode!r})")
+
+    @property
+    def path(self) -> str:
+        return self.directory or default_directory()
+
+    def encode(self, value) -> str:
+        """a stable representation of an argument's value"""
+        if value is None or isinstance(value, (bool, int, float, str,
+                                               bytes)):
+            return repr(value)
+        if isinstance(value, os.PathLike):
+            return f"path({os.fspath(value)!r}, " \
+                f"{fingerprint(value, self.mode)})"
+        if isinstance(value, (list, tuple, set, frozenset)):
+            items = [self.encode(item) for item in value]
+            if isinstance(value, (set, frozenset)):
+                items.sort()
+            return f"{type(value).__name__}({', '.join(items)})"
+        if isinstance(value, dict):
+            return "dict({})".format(', '.join(sorted(
+                f"{self.encode(k)}: {self.encode(v)}"
+                for k, v in value.items())))
+        if isinstance(value, (Responses, RecordStream, io.IOBase)) \
+           or hasattr(value, '__next__'):
+            # lazy streams whose contents are unknown
+            raise Uncacheable(repr(value))
+        text = repr(value)
+        if ' at 0x' in text:
+            raise Uncacheable(text)
+        return f"{type(value).__qualname__}({text})"
+
+    def key(self, func, arguments: dict) -> Optional[str]:
+        """the cache key of calling `func` with `arguments`
+        or None if they cannot be represented"""
+        try:
+            encoded = ', '.join(f"{name}={self.encode(value)}"
+                                for name, value in sorted(arguments.items()))
+        except Uncacheable:
+            return None
+        text = f"{func.__module__}.{func.__qualname__}({encoded})"
+        return hashlib.sha256(text.encode('utf-8', 'surrogateescape')) \
+            .hexdigest()
+
+    def filename(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + '.pickle')
+
+    def get(self, key: str) -> Any:
+        """returns the cached result or raises KeyError"""
+        filename = self.filename(key)
+        try:
+            with open(filename, 'rb') as fp:
+                result = pickle.load(fp)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            raise KeyError(key) from None
+        try:
+            # mark as recently used
+            os.utime(filename)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, result) -> bool:
+        """stores a (picklable) result; returns whether it was stored"""
+        try:
+            data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        filename = self.filename(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        try:
+            replaced = os.stat(filename).st_size
+        except OSError:
+            replaced = 0
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(filename))
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.replace(temporary, filename)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.account(len(data) - replaced)
+        return True
+
+    def account(self, delta: int) -> None:
+        """adds `delta` bytes to the estimated size, evicting entries
+        once it exceeds `max_size`"""
+        size = self.size()
+        if size is None:
+            if self.max_size is None:
+                return
+            # the entry just written is part of the scan
+            size = sum(entry[1] for entry in self.entries())
+        else:
+            size += delta
+        if self.max_size is not None and size > self.max_size:
+            size = self.evict()
+        self.store_size(size)
+
+    def size(self) -> Optional[int]:
+        """the estimated size of all entries, None if unknown"""
+        try:
+            with open(os.path.join(self.path, SIZE_FILE)) as fp:
+                return max(int(fp.read()), 0)
+        except (OSError, ValueError):
+            return None
+
+    def store_size(self, size: int) -> None:
+        fd, temporary = tempfile.mkstemp(dir=self.path)
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                fp.write(str(size))
+            os.replace(temporary, os.path.join(self.path, SIZE_FILE))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def entries(self):
+        """(mtime, size, filename) of all entries"""
+        try:
+            directories = os.scandir(self.path)
+        except OSError:
+            return
+        with directories:
+            for directory in directories:
+                if not directory.is_dir():
+                    continue
+                with os.scandir(directory.path) as files:
+                    for entry in files:
+                        if entry.name.endswith('.pickle'):
+                            stat = entry.stat()
+                            yield stat.st_mtime_ns, stat.st_size, entry.path
+
+    def evict(self) -> int:
+        """removes least recently used entries down to `LOW_WATER` of
+        `max_size` if they exceed `max_size`; returns the size of the
+        remaining entries"""
+        entries = sorted(self.entries(), reverse=True)
+        total = sum(size for mtime, size, filename in entries)
+        if self.max_size is None or total <= self.max_size:
+            return total
+        limit = int(self.max_size * LOW_WATER)
+        total = 0
+        full = False
+        for mtime, size, filename in entries:
+            # once the limit is reached, all older entries go
+            full = full or total + size > limit
+            if full:
+                try:
+                    os.unlink(filename)
+                except OSError:
+                    pass
+            else:
+                total += size
+        return total
+
+    def clear(self) -> None:
+        for mtime, size, filename in list(self.entries()):
+            os.unlink(filename)
+        try:
+            os.unlink(os.path.join(self.path, SIZE_FILE))
+        except OSError:
+            pass
@@ -23,6 +23,16 @@ import inspect
 from typing import Type
 
 from .command import Command
+from .batch import SHARD_BY
+from .cache import ResultCache
+from .engine import ENGINES
+from .executor import ExecutorPool
+from .limits import Limits
+from .metrics import Metrics, DEFAULT_BUCKETS
+from .output import Sink, DEFAULT_BUFFER_SIZE
+from .profiling import Profiler
+from .resources import Provider, INVOCATION
+from .scheduling import Concurrency
 
 class CommandDecorator:
 
@@ -63,6 +73,8 @@ class CommandDecorator:
                     option = []
                     command.options[self.name] = option
                 option.append(self.cli_deco(*args, **kwargs))
+            if command.built is not None:
+                command.refresh()
             return command
         return decorator
 
@@ -85,8 +97,68 @@ class CLI:
     subparsers = CommandDecorator(default, single=True)
 
     @CommandDecorator(single=True)
-    def bind(executor_class: type):
-        return executor_class
+    def bind(executor_class: type, pool: int=None):
+        if pool is None:
+            return executor_class
+        return ExecutorPool(executor_class, pool)
+
+    @CommandDecorator(single=True)
+    def metrics(buckets=DEFAULT_BUCKETS):
+        return Metrics(buckets)
+
+    @CommandDecorator(single=True)
+    def output(format: str='plain', buffer_size: int=DEFAULT_BUFFER_SIZE):
+        return format, Sink(buffer_size=buffer_size)
+
+    @CommandDecorator(single=True)
+    def profile(top: int=20, interval: float=0.005):
+        return Profiler(top, interval)
+
+    @CommandDecorator(single=True)
+    def watch(debounce: float=0.1, interval: float=0.5):
+        return debounce, interval
+
+    @CommandDecorator(single=True)
+    def batch(shard_by: str='stride'):
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"Unknown sharding {shard_by!r}, "
+                             f"expected one of {', '.join(SHARD_BY)}")
+        return shard_by
+
+    @CommandDecorator(single=True)
+    def pipeline(separator: str='::'):
+        return separator
+
+    @CommandDecorator(single=True)
+    def concurrency(name: str, cost: float=1.0, limit: int=None):
+        return Concurrency(name, cost, limit)
+
+    @CommandDecorator(single=True)
+    def shutdown(grace: float=10.0):
+        if grace is not None and grace < 0:
+            raise ValueError(f"Negative grace period {grace!r}")
+        return grace
+
+    @CommandDecorator(single=True)
+    def engine(name='fast'):
+        if not isinstance(name, str):
+            return name
+        try:
+            return ENGINES[name]
+        except KeyError:
+            raise ValueError(f"Unknown parsing engine {name!r}") from None
+
+    @CommandDecorator
+    def provide(name: str, factory: callable, scope: str=INVOCATION):
+        return name, Provider(factory, scope)
+
+    @CommandDecorator(single=True)
+    def limits(timeout: float=None, max_rss=None, cpu_seconds: int=None):
+        return Limits(timeout, max_rss, cpu_seconds)
+
+    @CommandDecorator(single=True)
+    def cache(directory: str=None, max_size='1G', fingerprint: str='mtime'):
+        return ResultCache(directory, max_size, fingerprint)
 
     @CommandDecorator
     def argument(*args, group=None, **kwargs):
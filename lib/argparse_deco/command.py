@@ -20,68 +20,437 @@
 """command.py: Wrapper class for parsing a definition"""
 
 import argparse
+import contextlib
+import functools
 import inspect
-from typing import Any, List, Dict, Union
+import shlex
+import sys
+import threading
+import traceback
+import types
+import weakref
+from typing import Any, Iterable, List, Dict, Tuple, Union
 
 from .arguments import Arg
+from .batch import Journal, ResultWriter, iter_lines, shard
+from .engine import ArgparseEngine
+from .executor import ExecutorPool
+from .fanout import fan_out, positive
+from .hints import resolve, infer
+from .output import FORMATS
+from .parsing import ArgumentParser
+from .pipeline import Input, split_stages, closing
+from .profiling import MODES
+from .resources import Resource, Scope, PROCESS, BATCH
+from .scheduling import DEFAULT, Scheduler, Task
+from .shell import Shell
+from .shutdown import CancellationToken, Shutdown, cancellations, current
+from .suggest import NGramIndex
+from .testing import Result, captured
+from .watch import Changes, Watcher
+
+# shared by all compact leaf commands until a subcommand is added
+NO_SUBCOMMANDS = types.MappingProxyType({})
+
+_signatures = weakref.WeakKeyDictionary()
+_arguments = weakref.WeakKeyDictionary()
+
+
+def signature(func) -> inspect.Signature:
+    """`inspect.signature` with postponed annotations evaluated,
+    computed once per function"""
+    try:
+        return _signatures[func]
+    except KeyError:
+        pass
+    except TypeError:
+        # not weak referenceable
+        return resolve(func)
+    result = _signatures[func] = resolve(func)
+    return result
+
+
+def arguments(func) -> tuple:
+    """`(name, Arg, default)` of all parameters of `func` annotated with
+    an `Arg` or a plain type hint it can be inferred from, computed once
+    per function"""
+    try:
+        return _arguments[func]
+    except KeyError:
+        pass
+    except TypeError:
+        return tuple(infer_arguments(func))
+    result = _arguments[func] = tuple(infer_arguments(func))
+    return result
+
+
+def fanout_parameter(func):
+    """`(name, fanout)` of the parameter of `func` whose `Arg` has
+    `fanout` set, or None"""
+    parameters = [(name, argument.fanout)
+                  for name, argument, default in arguments(func)
+                  if argument.fanout]
+    if len(parameters) > 1:
+        names = ', '.join(name for name, fanout in parameters)
+        raise TypeError(
+            f"{func.__qualname__} has more than one fanout argument: {names}")
+    return parameters[0] if parameters else None
+
+
+# argparse actions collecting values into a list (extend is new in 3.8)
+LIST_ACTIONS = (argparse._AppendAction,
+                getattr(argparse, '_ExtendAction', argparse._AppendAction))
+
+
+def check_fanout_action(action):
+    """raises ValueError unless `action` stores a list, which fanout
+    argument's items are taken from"""
+    if isinstance(action, LIST_ACTIONS) \
+            or action.nargs in ('*', '+', argparse.REMAINDER) \
+            or isinstance(action.nargs, int):
+        return
+    raise ValueError(
+        f"fanout argument {action.dest} must produce a list: use nargs "
+        "'*', '+' or a number, or action='append'")
+
+
+def infer_arguments(func):
+    for name, parameter in signature(func).parameters.items():
+        argument = parameter.annotation
+        if parameter.kind in (parameter.VAR_POSITIONAL,
+                              parameter.VAR_KEYWORD) \
+           or argument is parameter.empty:
+            continue
+        if not isinstance(argument, Arg):
+            argument = infer(name, argument, parameter.default)
+            if argument is None:
+                continue
+        default = None if parameter.default is parameter.empty \
+                  else parameter.default
+        yield name, argument, default
+
+
+class Warmup(threading.Thread):
+    """Builds the parser tree of a root command in the background"""
+
+    def __init__(self, command):
+        super().__init__(name=f"prewarm-{command.name}", daemon=True)
+        self.command = command
+        self.error = None
+
+    def run(self):
+        try:
+            command = self.command
+            command.track(command.setup_parser())
+        except BaseException as error:
+            self.error = error
+
+    def result(self):
+        """waits for the parser tree and re-raises errors"""
+        self.join()
+        if self.error is not None:
+            raise self.error
+
 
 class Command:
     """Wraps a command (class or function) for creating
     an ArgumentParser instance. Additionally it can pass these
     ArgumentParser's arguments to the function (or the class'
-    __call__ method) and execute it."""
+    __call__ method) and execute it.
 
-    __slots__ = ('definition', 'options', 'parent', 'subcommands')
+    A `compact` command keeps functions as they are instead of wrapping
+    them into a synthetic class, shares the empty subcommand mapping
+    of leaves and the registries of its subparsers. Subcommands inherit
+    the setting of their parent, also when they were built by a `CLI`
+    decorator before being attached to it."""
+
+    __slots__ = ('definition', 'options', 'parent', 'subcommands', 'compact',
+                 'resources', 'built', 'built_subparsers', 'built_engine',
+                 'nodes', 'warmup', 'index')
 
     # definition: type
     options: Dict[str, Any]
     # parent: Command
     # subcommands: Dict[str, Command]
 
-    def __init__(self, definition: Union[callable, type], parent=None):
+    def __init__(self, definition: Union[callable, type], parent=None,
+                 compact: bool=None):
+        if compact is None and isinstance(parent, Command):
+            compact = parent.compact
+        elif compact is None and parent is not None:
+            compact = False
+        # None: not decided yet, settled by the parent attaching it
+        self.compact = compact
+
         if inspect.isclass(definition):
            self.definition = definition
         elif inspect.isfunction(definition):
-           self.definition = type(
-               definition.__name__, (), dict(
-                   __doc__=definition.__doc__,
-                   __module__=definition.__module__,
-                   __qualname__=definition.__qualname__,
-                   __call__=definition)
-           )
+            if compact:
+                if definition.__doc__:
+                    definition.__doc__ = sys.intern(definition.__doc__)
+                self.definition = definition
+            else:
+                self.definition = type(
+                    definition.__name__, (), dict(
+                        __doc__=definition.__doc__,
+                        __module__=definition.__module__,
+                        __qualname__=definition.__qualname__,
+                        __call__=definition,
+                        __wrapped__=definition)
+                )
         else:
             raise TypeError(
                 f"{definition!r} is neither a class nor a function")
 
         self.options = dict()
         self.parent = parent
+        self.resources = None
+        self.built = None
+        self.built_subparsers = None
+        self.built_engine = None
+        self.nodes = None
+        self.warmup = None
+        self.index = None
 
         def subcommands():
             for name, attr in vars(definition).items():
                 if not name.startswith('__'):
                     if isinstance(attr, Command):
-                        attr.parent = self
+                        self.adopt(attr)
                         yield name, attr
                     elif inspect.isfunction(attr) or inspect.isclass(attr):
                         yield name, Command(attr, self)
         self.subcommands = dict(subcommands())
+        if compact and not self.subcommands:
+            self.subcommands = NO_SUBCOMMANDS
 
     @property
     def name(self) -> str:
         return self.definition.__name__
 
+    @property
+    def func(self):
+        """the callable run by this command"""
+        if inspect.isfunction(self.definition):
+            return self.definition
+        return self.definition.__call__
+
+    @property
+    def path(self) -> str:
+        """names of the commands from the root down to this one"""
+        names = []
+        command = self
+        while isinstance(command, Command):
+            names.append(command.name)
+            command = command.parent
+        return ' '.join(reversed(names))
+
+    @property
+    def root(self):
+        """the topmost command of the tree"""
+        command = self
+        while isinstance(command.parent, Command):
+            command = command.parent
+        return command
+
+    def adopt(self, subcommand: 'Command') -> None:
+        """makes this command the parent of `subcommand`, which becomes
+        compact along with this one unless it was decided otherwise"""
+        subcommand.parent = self
+        if self.compact and subcommand.compact is None:
+            subcommand.make_compact()
+
+    def make_compact(self) -> None:
+        """turns this command and its undecided subcommands compact,
+        e.g. when a command built by a `CLI` decorator without a parent
+        is attached to a compact tree"""
+        self.compact = True
+        definition = self.definition
+        wrapped = vars(definition).get('__wrapped__')
+        if inspect.isclass(definition) and wrapped is not None \
+                and vars(definition).get('__call__') is wrapped:
+            if wrapped.__doc__:
+                wrapped.__doc__ = sys.intern(wrapped.__doc__)
+            self.definition = wrapped
+        for command in self.subcommands.values():
+            if command.compact is None:
+                command.make_compact()
+        if not self.subcommands:
+            self.subcommands = NO_SUBCOMMANDS
+
     def subcommand(self, definition):
         """Decorator for adding a subcommand"""
         if isinstance(definition, Command):
             subcommand = definition
-            subcommand.parent = self
+            self.adopt(subcommand)
         else:
             subcommand = Command(definition, self)
-        self.subcommands[subcommand.definition.__name__] = subcommand
+        if self.subcommands is NO_SUBCOMMANDS:
+            self.subcommands = dict()
+        name = subcommand.definition.__name__
+        if self.built is not None and name in self.subcommands:
+            self.unpatch(name)
+        self.subcommands[name] = subcommand
+        if self.built is not None:
+            self.patch(name)
+        return subcommand
+
+    def remove_subcommand(self, name: str):
+        """Removes the subcommand `name` (from the built parser, too)"""
+        if self.built is not None:
+            self.unpatch(name)
+        subcommand = self.subcommands.pop(name)
+        subcommand.parent = None
         return subcommand
 
+    # Parser graph
+    @property
+    def parser(self):
+        """The parser of the command tree, built on first use. Later
+        changes of the tree patch only the affected subparsers."""
+        root = self.root
+        warmup = root.warmup
+        if warmup is not None:
+            root.warmup = None
+            warmup.result()
+        if root.built is None:
+            root.track(root.setup_parser())
+        if self.built is None:
+            raise LookupError(f"{self.name} is not part of the parser tree")
+        return self.built
+
+    @property
+    def engine(self):
+        """The parsing engine selected by `CLI.engine` (of the command
+        or its root) for the parser of the command, argparse itself by
+        default. It is recreated whenever the tree is patched."""
+        parser = self.parser
+        if self.built_engine is None:
+            factory = self.options.get('engine') \
+                or self.root.options.get('engine', ArgparseEngine)
+            self.built_engine = factory(parser)
+        return self.built_engine
+
+    def prewarm(self) -> None:
+        """Starts building the parser tree (including the analysis of
+        all signatures) in a background thread, e.g. while the
+        application initialises. `parser` waits for the result.
+        The tree must not be changed until then."""
+        root = self.root
+        if root.built is None and root.warmup is None:
+            root.warmup = Warmup(root)
+            root.warmup.start()
+
+    def track(self, parser) -> None:
+        """records `parser` as built by this command and descends
+        into the subparsers"""
+        root = self.root
+        if root.nodes is None:
+            root.nodes = dict()
+        root.nodes[parser] = self
+        command = self
+        while isinstance(command, Command):
+            command.built_engine = None
+            command = command.parent
+        self.built = parser
+        self.built_subparsers = None
+        for action in parser._actions:
+            if isinstance(action, argparse._SubParsersAction):
+                self.built_subparsers = action
+                self.index = None
+                action.suggest = self.suggest
+                for name, command in self.subcommands.items():
+                    command.track(action.choices[name])
+                break
+
+    def untrack(self) -> None:
+        """forgets the parsers built by this command's subtree"""
+        nodes = self.root.nodes
+        if nodes is not None:
+            nodes.pop(self.built, None)
+        self.built = self.built_subparsers = self.built_engine = None
+        for command in self.subcommands.values():
+            command.untrack()
+
+    def suggest(self, name: str, limit: int=3) -> List[str]:
+        """Subcommand names and aliases similar to a mistyped `name`"""
+        if self.index is None:
+            self.parser
+            action = self.built_subparsers
+            self.index = NGramIndex(action.choices if action else ())
+        return self.index.suggest(name, limit)
+
+    def command_for(self, namespace):
+        """returns the command which built the parser of `namespace`"""
+        nodes = self.root.nodes or {}
+        return nodes.get(getattr(namespace, '_parser', None), self)
+
+    def patch(self, name: str) -> None:
+        """adds the subparser of the subcommand `name`
+        to the built parser"""
+        command = self.subcommands[name]
+        self.index = None
+        if self.built_subparsers is None:
+            self.setup_subparsers(self.built)
+            self.track(self.built)
+            return
+        subparser = command.setup_parser(self.built_subparsers.add_parser,
+                                         name)
+        if self.compact:
+            share_registries(self.built, subparser)
+        command.track(subparser)
+
+    def unpatch(self, name: str) -> None:
+        """removes the subparser of the subcommand `name`
+        from the built parser"""
+        command = self.subcommands[name]
+        action = self.built_subparsers
+        self.index = None
+        if action is not None:
+            for key, subparser in tuple(action.choices.items()):
+                if subparser is command.built:
+                    del action.choices[key]
+            action._choices_actions[:] = [
+                choice for choice in action._choices_actions
+                if choice.dest != name]
+        command.untrack()
+
+    def refresh(self) -> None:
+        """Rebuilds the parser of this command's subtree in place,
+        e.g. after arguments or aliases were changed"""
+        parent = self.parent
+        if not isinstance(parent, Command) or parent.built is None:
+            root = self.root
+            if root.built is not None:
+                root.untrack()
+                root.nodes = None
+                root.track(root.setup_parser())
+            return
+        name = next(key for key, command in parent.subcommands.items()
+                    if command is self)
+        action = parent.built_subparsers
+        order = list(action.choices)
+        position = {choice.dest: index for index, choice
+                    in enumerate(action._choices_actions)}
+        parent.unpatch(name)
+        parent.patch(name)
+        # restore the original order of choices and help lines
+        choices = dict(action.choices)
+        keys = [key for key, subparser in choices.items()
+                if subparser is self.built]
+        action.choices.clear()
+        for key in order:
+            if key == name:
+                for key in keys:
+                    action.choices[key] = choices.pop(key)
+            elif key in choices:
+                action.choices[key] = choices.pop(key)
+        action.choices.update(choices)
+        action._choices_actions.sort(
+            key=lambda choice: position.get(choice.dest, len(position)))
+
     # Parsing
-    def setup_parser(self, factory=argparse.ArgumentParser, name=None):
+    def setup_parser(self, factory=ArgumentParser, name=None):
         """creates the ArgumentParser and calls setup_{arguments,subparsers}"""
         args, kwargs = self.options.get('parser', ((), {}))
 
@@ -120,9 +489,72 @@ class Command:
                 except StopIteration:
                     break
 
+        if self.parent is None and 'output' in self.options:
+            self.setup_output(parser)
+        if self.parent is None and 'profile' in self.options:
+            self.setup_profile(parser)
+        if self.parent is None and 'watch' in self.options:
+            self.setup_watch(parser)
+        if self.parent is None and 'batch' in self.options:
+            self.setup_batch(parser)
         self.setup_subparsers(parser)
         return parser
 
+    def setup_output(self, parser):
+        """adds the global `--format` option of `CLI.output`"""
+        default, sink = self.options['output']
+        parser.add_argument(
+            '--format', dest='_format', choices=tuple(FORMATS),
+            default=default, help=f"output format (default: {default})")
+
+    def setup_profile(self, parser):
+        """adds the global `--profile` options of `CLI.profile`"""
+        group = parser.add_argument_group("profiling")
+        group.add_argument(
+            '--profile', dest='_profile', choices=tuple(MODES),
+            help="profile the command")
+        group.add_argument(
+            '--profile-format', dest='_profile_format',
+            choices=sorted({format for formats in MODES.values()
+                            for format in formats}),
+            help="format of the profile (default: top for cprofile and "
+                 "tracemalloc, collapsed for sample)")
+        group.add_argument(
+            '--profile-output', dest='_profile_output', metavar='FILE',
+            help="file of the profile (default: standard error)")
+
+    def setup_watch(self, parser):
+        """adds the global `--watch` option of `CLI.watch`"""
+        parser.add_argument(
+            '--watch', dest='_watch', metavar='PATH', action='append',
+            help="run the command again whenever files below PATH change "
+                 "(repeatable)")
+
+    def setup_batch(self, parser):
+        """adds the global `--batch` options of `CLI.batch`"""
+        group = parser.add_argument_group("batch")
+        group.add_argument(
+            '--batch', dest='_batch', metavar='FILE',
+            help="run every line of FILE (- for standard input) as "
+                 "command line")
+        group.add_argument(
+            '--shard', dest='_shard', metavar='INDEX/COUNT', type=shard,
+            help="run only the share INDEX (counting from 0) of COUNT "
+                 "shares of the lines")
+        group.add_argument(
+            '--results', dest='_results', metavar='FILE', default='-',
+            help="JSON lines file of the results, {shard} is replaced by "
+                 "the shard (default: standard output)")
+        group.add_argument(
+            '--journal', dest='_journal', metavar='FILE',
+            help="journal of the lines run, for resuming an interrupted "
+                 "run; {shard} is replaced by the shard")
+        group.add_argument(
+            '--workers', dest='_workers', metavar='N', type=positive,
+            default=1,
+            help="run up to N lines at once, honouring the concurrency "
+                 "classes of the commands")
+
     def setup_deco_groups(self, parser):
         """Setup argument groups defined by `CLI.group`
         and `CLI.mutually_exclusive`"""
@@ -142,26 +574,37 @@ class Command:
         """process command's arguments"""
 
         # setup decorator defined arguments
+        defined = set()
         for group_name, args, kwargs in reversed(
                 self.options.get('argument', ())):
             parser = yield group_name
-            parser.add_argument(*args, **kwargs)
+            action = parser.add_argument(*args, **kwargs)
+            defined.add(action.dest)
+            defined.update(action.option_strings)
 
         # setup signature defined arguments
-        func = self.definition.__call__
+        func = self.func
         if inspect.isfunction(func):
-            signature = inspect.signature(func)
-            for name, parameter in signature.parameters.items():
-                argument = parameter.annotation
-                if isinstance(argument, Arg):
-                    default = None if parameter.default is parameter.empty \
-                              else parameter.default
-                    parser = yield argument.group
-                    argument.apply(parser, name, default)
+            parameters = signature(func).parameters
+            for name, argument, default in arguments(func):
+                if parameters[name].annotation is not argument and (
+                        name in defined or defined.intersection(
+                            argument.name_or_flags)):
+                    # inferred from a hint, but defined by a decorator
+                    continue
+                parser = yield argument.group
+                argument.apply(parser, name, default)
+                if argument.fanout:
+                    check_fanout_action(parser._actions[-1])
 
             # setup default action
             parser = yield
             parser.set_defaults(_func=func)
+            if fanout_parameter(func) is not None:
+                parser.add_argument(
+                    '--jobs', dest='_jobs', type=positive, default=1,
+                    metavar='N', help="run the command for up to N items "
+                    "at once (default: 1)")
 
     def setup_subparsers(self, parser):
         """process subparsers"""
@@ -171,30 +614,445 @@ class Command:
             #     'required', not inspect.isfunction(self.definition.__call__))
             subparsers = parser.add_subparsers(*args, **kwargs)
             for name, command in self.subcommands.items():
-                command.setup_parser(subparsers.add_parser, name)
+                subparser = command.setup_parser(subparsers.add_parser, name)
+                if self.compact:
+                    share_registries(parser, subparser)
 
-    def __call__(self, args: List[str]=None):
-        """Parse `args` and run the fitting command.
+    def parse(self, args: List[str]=None):
+        """Parse `args` and return the parser and the namespace"""
+        parser = self.parser
+        engine = self.engine
+        metrics = self.options.get('metrics')
+        if metrics is None:
+            return parser, engine.parse_args(args)
+        timer = metrics.timer('parse', self.path)
+        try:
+            namespace = engine.parse_args(args)
+        except BaseException as error:
+            timer(type(error), error, None)
+            raise
+        timer.command = self.command_for(namespace).path
+        timer(None, None, None)
+        return parser, namespace
+
+    @contextlib.contextmanager
+    def executor(self, parser, namespace):
+        """Provides the executor bound by `CLI.bind` (or the namespace)"""
+        binding = self.options.get('bind')
+        if binding is None:
+            yield namespace
+        elif isinstance(binding, ExecutorPool):
+            with binding.lease(parser, namespace) as executor:
+                yield executor
+        else:
+            yield binding(parser, namespace)
+
+    def resource(self, name: str, batch: Scope=None,
+                 invocation: Scope=None, command: 'Command'=None):
+        """Returns the resource `name` from the scope of its provider
+        registered by `CLI.provide` on `command` (default: this one) or
+        the nearest of its parents"""
+        owner = self if command is None else command
+        while isinstance(owner, Command):
+            provider = dict(owner.options.get('provide', ())).get(name)
+            if provider is not None:
+                break
+            owner = owner.parent
+        else:
+            raise LookupError(f"No provider for resource {name!r}")
+        if provider.scope == PROCESS:
+            if owner.resources is None:
+                owner.resources = Scope()
+            scope = owner.resources
+        elif provider.scope == BATCH and batch is not None:
+            scope = batch
+        else:
+            scope = invocation
+        return scope.get(name, provider)
+
+    def dispatch(self, parser, namespace, batch: Scope=None, upstream=None,
+                 changes: frozenset=None):
+        """Run the command selected by a parsed `namespace`
 
         :params:
-           args:     List of command line arguments for argument parser
+           batch:    Scope of batch scoped resources
+           upstream: Result of the previous stage of a pipeline
+           changes:  Paths changed since the previous run of `--watch`
         """
-        parser = self.setup_parser()
-        namespace = parser.parse_args(args)
-
         try:
             func = namespace._func
         except AttributeError:
             return parser.print_usage()
 
-        args = ()
-        kwargs = {}
-        for i, name in enumerate(inspect.signature(func).parameters):
-            if i == 0 and name == 'self':
+        with contextlib.ExitStack() as stack:
+            args = ()
+            kwargs = {}
+            invocation = None
+            # results depending on piped input or changes are not cached
+            cacheable = True
+            parameters = signature(func).parameters
+            command = self.command_for(namespace)
+            for i, (name, parameter) in enumerate(parameters.items()):
+                resource = Resource.lookup(parameter)
+                if i == 0 and name == 'self':
+                    args = (stack.enter_context(
+                        self.executor(parser, namespace)),)
+                elif resource is not None:
+                    if invocation is None:
+                        invocation = stack.enter_context(Scope())
+                    kwargs[name] = self.resource(
+                        resource, batch, invocation, command)
+                elif Input.lookup(parameter):
+                    cacheable = False
+                    if upstream is not None:
+                        kwargs[name] = upstream
+                        upstream = None
+                    elif parameter.default is parameter.empty:
+                        kwargs[name] = None
+                elif Changes.lookup(parameter):
+                    cacheable = False
+                    kwargs[name] = changes
+                elif CancellationToken.lookup(parameter):
+                    kwargs[name] = current() or CancellationToken()
+                elif name in vars(namespace):
+                    kwargs[name] = getattr(namespace, name)
+            if upstream is not None:
+                parser.error(f"{func.__name__} does not accept piped input")
+            metrics = self.options.get('metrics')
+            if metrics is not None:
+                stack.push(metrics.timer('execute', command.path))
+            profiler = self.options.get('profile')
+            mode = getattr(namespace, '_profile', None)
+            if profiler is not None and mode is not None:
                 try:
-                    args = (self.options['bind'](parser, namespace),)
+                    stack.enter_context(profiler.session(
+                        mode, namespace._profile_format,
+                        namespace._profile_output))
+                except ValueError as error:
+                    parser.error(str(error))
+            fanout = fanout_parameter(func)
+            if fanout is None or not kwargs.get(fanout[0]):
+                result = self.execute(command, func, args, kwargs, namespace,
+                                      cacheable)
+            else:
+                name, kind = fanout
+
+                def call(item):
+                    # generators run in the worker, while the resources
+                    # of the invocation are open, and are collected
+                    result = self.execute(command, func, args,
+                                          dict(kwargs, **{name: [item]}),
+                                          namespace, cacheable)
+                    if inspect.isgenerator(result):
+                        result = list(result)
+                    return result
+                result = fan_out(call, kwargs[name],
+                                 getattr(namespace, '_jobs', 1),
+                                 processes=kind == 'process')
+            if inspect.isgenerator(result):
+                return closing(result, stack.pop_all())
+            return result
+
+    def execute(self, command, func, args: tuple, kwargs: dict, namespace,
+                cacheable: bool=True):
+        """Calls the `func` of `command` honouring its cache and limits.
+        The cache key covers all values of the `namespace`, which bound
+        and class commands see through `self`."""
+        options = command.options
+        cache = options.get('cache')
+        key = None
+        if cache is not None and cacheable:
+            arguments = {name: value
+                         for name, value in vars(namespace).items()
+                         if not name.startswith('_')}
+            arguments.update((name, value)
+                             for name, value in kwargs.items()
+                             if name in arguments)
+            key = cache.key(func, arguments)
+            if key is not None:
+                try:
+                    return cache.get(key)
                 except KeyError:
-                    args = (namespace,)
-            elif name in vars(namespace):
-                kwargs[name] = getattr(namespace, name)
-        return func(*args, **kwargs)
+                    pass
+        limits = options.get('limits')
+        if limits is not None:
+            result = limits.run(func, args, kwargs)
+        else:
+            result = func(*args, **kwargs)
+            if inspect.iscoroutine(result):
+                import asyncio  # only imported by asynchronous commands
+                result = asyncio.run(result)
+        if key is not None and not inspect.isgenerator(result):
+            cache.put(key, result)
+        return result
+
+    def run_many(self, argvs, jobs: int=1):
+        """Parse and run each argument list of `argvs` with a single
+        parser and shared batch scoped resources; yields the results.
+        With `jobs` up to that many run at once (see `run_lines`), the
+        results are still yielded in order and generators consumed."""
+        if jobs > 1:
+            for position, result, error in self.run_lines(
+                    enumerate(argvs), Scheduler(jobs)):
+                if error is not None:
+                    raise error
+                yield result
+            return
+        with Scope() as batch:
+            for args in argvs:
+                yield self.dispatch(*self.parse(args), batch)
+
+    def concurrency(self):
+        """the concurrency class of `CLI.concurrency` of this command
+        or its nearest ancestor"""
+        command = self
+        while command is not None:
+            concurrency = command.options.get('concurrency')
+            if concurrency is not None:
+                return concurrency
+            command = command.parent
+        return DEFAULT
+
+    def run_line(self, parser, namespace, batch: Scope):
+        result = self.dispatch(parser, namespace, batch)
+        if inspect.isgenerator(result):
+            result = list(result)
+        return result
+
+    def run_lines(self, lines: Iterable[Tuple[int, Any]],
+                  scheduler: Scheduler=None):
+        """Parse and run the command line (or argument list) of each
+        `(position, line)` of `lines` like `run_many`; yields
+        `(position, result, error)`. Failing lines do not end the run,
+        generators are consumed. After a shutdown request no further
+        lines are started.
+
+        With a `scheduler` the lines are parsed in order and run on its
+        workers, limited by the concurrency classes of their commands;
+        the results are still yielded in order."""
+        token = current()
+        with Scope() as batch:
+            if scheduler is not None:
+                def tasks():
+                    for position, line in lines:
+                        try:
+                            parser, namespace = self.parse(
+                                shlex.split(line) if isinstance(line, str)
+                                else line)
+                        except (Exception, SystemExit) as error:
+                            yield Task(position, None, error=error)
+                            continue
+                        yield Task(position, functools.partial(
+                            self.run_line, parser, namespace, batch),
+                            self.command_for(namespace).concurrency())
+                cancelled = None if token is None \
+                    else (lambda: token.cancelled)
+                for task in scheduler.run(tasks(), cancelled):
+                    yield task.position, task.result, task.error
+                return
+            for position, line in lines:
+                if token is not None and token.cancelled:
+                    return
+                try:
+                    parser, namespace = self.parse(
+                        shlex.split(line) if isinstance(line, str) else line)
+                    result = self.run_line(parser, namespace, batch)
+                except (Exception, SystemExit) as error:
+                    yield position, None, error
+                else:
+                    yield position, result, None
+
+    def run_batch(self, namespace) -> int:
+        """Runs the lines of the `--batch` file belonging to the
+        `--shard` of this node, writing the results to `--results`;
+        returns the number of lines run. With `--journal` the lines
+        completed by an earlier run are skipped and their results
+        kept. With `--workers` the statistics of the concurrency
+        classes are reported to standard error."""
+        shard = namespace._shard
+        if shard is not None:
+            shard.hashed = self.options['batch'] == 'hash'
+        label = 'all' if shard is None else str(shard)
+        path = namespace._results.replace('{shard}', label)
+        workers = getattr(namespace, '_workers', 1)
+        scheduler = Scheduler(workers) if workers > 1 else None
+        if getattr(namespace, '_journal', None) is None:
+            with ResultWriter(path) as writer:
+                for position, result, error in self.run_lines(
+                        iter_lines(namespace._batch, shard), scheduler):
+                    writer.write(position, result, error)
+        else:
+            with Journal(namespace._journal.replace('{shard}', label),
+                         path) as journal:
+                journal.truncate()
+                with ResultWriter(path, append=journal.resumed) as writer:
+                    try:
+                        for position, result, error in self.run_lines(
+                                iter_lines(namespace._batch, shard,
+                                           journal.completed), scheduler):
+                            writer.write(position, result, error)
+                            if journal.record(position, error is not None,
+                                              writer.offset):
+                                writer.sync()
+                                journal.sync()
+                    finally:
+                        writer.sync()
+        if scheduler is not None:
+            print(scheduler.format_report(), file=sys.stderr)
+        return writer.count
+
+    def run_pipeline(self, stages):
+        """Run each argument list of `stages` passing its result to the
+        `Input` parameter of the next one; returns the last result"""
+        upstream = None
+        for args in stages:
+            parser, namespace = self.parse(args)
+            upstream = self.dispatch(parser, namespace, upstream=upstream)
+        return self.output(namespace, upstream)
+
+    def watch(self, parser, namespace, paths: List[str], runs: int=None):
+        """Dispatches `namespace` and again whenever files below
+        `paths` changed, until interrupted (or `runs` runs). Generator
+        results are consumed by each run. Errors of a run are reported
+        without ending the loop, a shutdown request ends it."""
+        debounce, interval = self.options.get('watch', (0.1, 0.5))
+        token = current()
+        result = None
+        with Watcher(paths, debounce, interval) as watcher:
+            changes = None
+            count = 0
+            while True:
+                try:
+                    result = self.output(
+                        namespace,
+                        self.dispatch(parser, namespace, changes=changes))
+                    # a generator left over by output() runs now
+                    if inspect.isgenerator(result):
+                        result = list(result)
+                except Exception:
+                    traceback.print_exc()
+                count += 1
+                if runs is not None and count >= runs:
+                    return result
+                if token is None:
+                    changes = watcher.wait()
+                    continue
+                changes = None
+                while changes is None:
+                    if token.cancelled:
+                        return result
+                    changes = watcher.wait(interval)
+
+    def formatted(self, result) -> bool:
+        """whether `output` writes `result` through the sink of
+        `CLI.output`"""
+        return 'output' in self.options and result is not None \
+            and not isinstance(result, (str, bytes, dict)) \
+            and hasattr(result, '__iter__')
+
+    def output(self, namespace, result, stream=None):
+        """Writes iterable results through the sink of `CLI.output`
+        in the format chosen by `--format` (to `stream` instead of the
+        sink's one if given) and returns the number of records
+        written; returns other results as they are"""
+        if not self.formatted(result):
+            return result
+        default, sink = self.options['output']
+        return sink.write(result, getattr(namespace, '_format', default),
+                          stream)
+
+    def close(self) -> None:
+        """Close executor pools and process scoped resources
+        of this command and its subcommands"""
+        binding = self.options.get('bind')
+        if isinstance(binding, ExecutorPool):
+            binding.close()
+        if self.resources is not None:
+            self.resources.close()
+        for command in self.subcommands.values():
+            command.close()
+
+    def shell(self, prompt: str=None, history: str=None, stdin=None,
+              stdout=None) -> None:
+        """Runs an interactive prompt parsing every line with the
+        parser built once; batch scoped resources live for the session.
+        `history` is the file keeping the history of lines."""
+        Shell(self, prompt, history, stdin, stdout).cmdloop()
+
+    def invoke(self, args: List[str]=None, env: Dict[str, str]=None,
+               stdin: Union[str, bytes]=None) -> Result:
+        """Run the command like `__call__`, but capture the standard
+        streams and exits, e.g. for tests. The returned `Result` holds
+        the exit code, the output, the return value and any exception.
+        The built parser is reused across invocations.
+
+        :params:
+           args:     List of command line arguments for argument parser
+           env:      Environment variables to set (or unset by `None`)
+           stdin:    Contents of the standard input
+        """
+        with captured(env, stdin) as result:
+            try:
+                result.value = self(args)
+            except SystemExit as exit:
+                code = exit.code
+                if code is None:
+                    code = 0
+                elif not isinstance(code, int):
+                    print(code, file=sys.stderr)
+                    code = 1
+                result.exit_code = code
+            except Exception as error:
+                result.exception = error
+                result.exit_code = 1
+        return result
+
+    def __call__(self, args: List[str]=None):
+        """Parse `args` and run the fitting command. With
+        `CLI.shutdown` SIGINT and SIGTERM request a graceful shutdown:
+        in-flight work is finished, executor pools and resources are
+        closed and the exit code is 128 plus the signal number.
+
+        :params:
+           args:     List of command line arguments for argument parser
+        """
+        if 'shutdown' not in self.options:
+            return self.run(args)
+        with Shutdown(self.options['shutdown']) as token:
+            try:
+                result = self.run(args)
+            except cancellations():
+                if not token.cancelled:
+                    raise
+            finally:
+                if token.cancelled:
+                    self.close()
+        if token.cancelled:
+            sys.exit(token.exit_code)
+        return result
+
+    def run(self, args: List[str]=None):
+        """Parse `args` and run the fitting command (see `__call__`)"""
+        if 'pipeline' in self.options:
+            if args is None:
+                args = sys.argv[1:]
+            stages = split_stages(args, self.options['pipeline'])
+            if len(stages) > 1:
+                return self.run_pipeline(stages)
+        parser, namespace = self.parse(args)
+        if getattr(namespace, '_batch', None) is not None:
+            return self.run_batch(namespace)
+        paths = getattr(namespace, '_watch', None)
+        if paths:
+            return self.watch(parser, namespace, paths)
+        return self.output(namespace, self.dispatch(parser, namespace))
+
+def share_registries(parser, subparser) -> None:
+    """Let `subparser` and its groups use the action and type
+    registries of `parser` instead of keeping their own copies"""
+    registries = parser._registries
+    subparser._registries = registries
+    for group in subparser._action_groups:
+        group._registries = registries
+    for group in subparser._mutually_exclusive_groups:
+        group._registries = registries
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""engine.py: Parsing engines turning argument lists into namespaces"""
+
+import argparse
+import re
+import sys
+from typing import List, Optional, Tuple
+
+__all__ = ('Engine', 'ArgparseEngine', 'FastEngine', 'Trie', 'ENGINES')
+
+# argparse's own notion of a negative number
+NEGATIVE_NUMBER = re.compile(r'^-\d+$|^-\d*\.\d+$')
+
+# regular expression patterns of positional slots by nargs
+NARGS_PATTERNS = {None: '(A)', argparse.OPTIONAL: '(A?)',
+                  argparse.ZERO_OR_MORE: '(A*)',
+                  argparse.ONE_OR_MORE: '(A+)'}
+
+
+class Engine:
+    """Interface of parsing engines. `parse_args` turns a list of
+    strings into the namespace of the built `parser` exactly like
+    `argparse.ArgumentParser.parse_args` does, including the handling
+    of errors and `--help`."""
+
+    __slots__ = ('parser',)
+
+    def __init__(self, parser: argparse.ArgumentParser):
+        self.parser = parser
+
+    def parse_args(self, args: List[str]=None) -> argparse.Namespace:
+        raise NotImplementedError
+
+
+class ArgparseEngine(Engine):
+    """The reference engine: argparse itself"""
+
+    __slots__ = ()
+
+    def parse_args(self, args: List[str]=None) -> argparse.Namespace:
+        return self.parser.parse_args(args)
+
+
+class Fallback(Exception):
+    """Input the fast engine leaves to argparse"""
+
+
+class Trie:
+    """Prefix tree of option strings resolving abbreviations. Every
+    node counts the words below it and remembers one of them."""
+
+    __slots__ = ('root',)
+
+    def __init__(self, words=()):
+        self.root = dict()
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+            entry = node.get(None)
+            if entry is None:
+                node[None] = [1, word]
+            else:
+                entry[0] += 1
+
+    def complete(self, prefix: str) -> Tuple[int, Optional[str]]:
+        """the number of words starting with `prefix` and one of them"""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return 0, None
+        count, word = node.get(None, (0, None))
+        return count, word
+
+
+class Table:
+    """Lookup tables compiled from a single parser of the tree"""
+
+    __slots__ = ('parser', 'options', 'prefixes', 'slots', 'pattern',
+                 'subparsers', 'defaults', 'converted', 'required',
+                 'supported')
+
+    def __init__(self, parser: argparse.ArgumentParser):
+        self.parser = parser
+        self.options = dict(parser._option_string_actions)
+        self.prefixes = Trie(self.options)
+        self.supported = (parser.prefix_chars == '-'
+                          and parser.fromfile_prefix_chars is None
+                          and not parser._mutually_exclusive_groups
+                          and not parser._has_negative_number_optionals)
+
+        positionals = [action for action in parser._actions
+                       if not action.option_strings]
+        self.subparsers = None
+        self.slots = []
+        patterns = []
+        for action in positionals:
+            if action.nargs == argparse.PARSER:
+                self.subparsers = action
+                self.supported &= len(positionals) == 1
+            elif action.nargs in NARGS_PATTERNS:
+                self.slots.append(action)
+                patterns.append(NARGS_PATTERNS[action.nargs])
+            elif isinstance(action.nargs, int):
+                self.slots.append(action)
+                patterns.append(f"(A{{{action.nargs}}})")
+            else:
+                self.supported = False
+        self.pattern = re.compile(''.join(patterns))
+        for action in self.options.values():
+            if action.nargs in (argparse.PARSER, argparse.REMAINDER,
+                                argparse.SUPPRESS):
+                self.supported = False
+
+        self.defaults = dict()
+        for action in parser._actions:
+            if action.dest is not argparse.SUPPRESS \
+               and action.default is not argparse.SUPPRESS:
+                self.defaults.setdefault(action.dest, action.default)
+        for dest, default in parser._defaults.items():
+            self.defaults.setdefault(dest, default)
+        # string defaults are converted unless the argument was given
+        self.converted = [action for action in parser._actions
+                          if isinstance(action.default, str)]
+        self.required = [action for action in parser._actions
+                         if action.required]
+
+    def classify(self, token: str):
+        """`None` for positionals and `(action, option_string,
+        explicit_arg)` for options (the action of unknown options is
+        `None`), like `ArgumentParser._parse_optional`"""
+        if not token or token[0] != '-':
+            return None
+        action = self.options.get(token)
+        if action is not None:
+            return action, token, None
+        if len(token) == 1:
+            return None
+        if token == '--':
+            raise Fallback
+        if '=' in token:
+            option, explicit = token.split('=', 1)
+            action = self.options.get(option)
+            if action is not None:
+                return action, option, explicit
+        if token[1] != '-':
+            # combined short options, attached values or abbreviations
+            if token[:2] in self.options or self.prefixes.complete(token)[0]:
+                raise Fallback
+            if NEGATIVE_NUMBER.match(token):
+                return None
+        elif self.parser.allow_abbrev:
+            if '=' in token:
+                option, explicit = token.split('=', 1)
+            else:
+                option, explicit = token, None
+            count, word = self.prefixes.complete(option)
+            if count > 1:
+                raise Fallback
+            if count == 1:
+                return self.options[word], word, explicit
+        if ' ' in token:
+            return None
+        return None, token, None
+
+
+class FastEngine(Engine):
+    """Parses with lookup tables compiled (lazily, per parser) from the
+    built argparse parsers in a single pass over the arguments: hash
+    maps of option strings, a prefix trie for abbreviations and the
+    positional slots matched at once. Type conversion and actions are
+    those of argparse; they only run once all arguments are assigned,
+    so input left to argparse is never converted twice.
+
+    Everything beyond the common cases -- errors, interleaved
+    positionals, `--`, combined short options, mutually exclusive
+    groups and the like -- is left to argparse, so results and error
+    messages are always the ones of the reference engine."""
+
+    __slots__ = ('tables', 'fallbacks')
+
+    def __init__(self, parser: argparse.ArgumentParser):
+        super().__init__(parser)
+        self.tables = dict()
+        self.fallbacks = 0
+
+    def table(self, parser: argparse.ArgumentParser) -> Table:
+        try:
+            return self.tables[parser]
+        except KeyError:
+            table = self.tables[parser] = Table(parser)
+            return table
+
+    def parse_args(self, args: List[str]=None) -> argparse.Namespace:
+        if args is None:
+            args = sys.argv[1:]
+        else:
+            args = list(args)
+        try:
+            return self.parse(self.parser, args)
+        except Fallback:
+            self.fallbacks += 1
+            return self.parser.parse_args(args)
+
+    def parse(self, parser, args: List[str]) -> argparse.Namespace:
+        """parses `args` with the tables of `parser`
+        or raises `Fallback`"""
+        return self.apply(self.plan(parser, args))
+
+    def plan(self, parser, args: List[str]) -> tuple:
+        """assigns the values of `args` to the actions of `parser`
+        without converting them; returns `(table, seen, steps,
+        descent)` or raises `Fallback`, before any type converter or
+        action ran, so argparse parsing again runs them only once"""
+        table = self.table(parser)
+        if not table.supported:
+            raise Fallback
+        seen = set()
+        steps = []
+        descent = None
+        kinds = [table.classify(token) for token in args]
+        count = len(args)
+        run = None
+        index = 0
+        while index < count:
+            kind = kinds[index]
+            if kind is None:
+                if table.subparsers is not None:
+                    descent = self.descend(table, seen, args[index:])
+                    break
+                if run is not None:
+                    # positionals interleaved with options
+                    raise Fallback
+                end = index + 1
+                while end < count and kinds[end] is None:
+                    end += 1
+                run = args[index:end]
+                self.consume(table, seen, steps, run)
+                index = end
+                continue
+
+            action, option_string, explicit = kind
+            if action is None:
+                raise Fallback
+            nargs = action.nargs
+            if explicit is not None:
+                if nargs not in (None, argparse.OPTIONAL,
+                                 argparse.ZERO_OR_MORE,
+                                 argparse.ONE_OR_MORE, 1):
+                    raise Fallback
+                values = [explicit]
+                index += 1
+            else:
+                end = index + 1
+                while end < count and kinds[end] is None:
+                    end += 1
+                available = end - index - 1
+                if nargs is None:
+                    take = 1
+                elif nargs == argparse.OPTIONAL:
+                    take = min(available, 1)
+                elif nargs in (argparse.ZERO_OR_MORE, argparse.ONE_OR_MORE):
+                    take = available
+                else:
+                    take = nargs
+                if take > available \
+                   or (nargs == argparse.ONE_OR_MORE and not take):
+                    raise Fallback
+                values = args[index + 1:index + 1 + take]
+                index += 1 + take
+            seen.add(action)
+            steps.append((action, values, option_string))
+
+        if run is None and table.slots:
+            self.consume(table, seen, steps, [])
+        for action in table.required:
+            if action not in seen:
+                raise Fallback
+        return table, seen, steps, descent
+
+    def consume(self, table, seen, steps, run: List[str]) -> None:
+        """distributes the positional arguments `run` to the slots"""
+        match = table.pattern.match('A' * len(run))
+        if match is None or match.end() != len(run):
+            raise Fallback
+        start = 0
+        for action, group in zip(table.slots, match.groups()):
+            end = start + len(group)
+            seen.add(action)
+            steps.append((action, run[start:end], None))
+            start = end
+
+    def descend(self, table, seen, args: List[str]) -> tuple:
+        """plans the remaining `args` with the subparser named by the
+        first one; returns `(name, plan)`"""
+        action = table.subparsers
+        name = args[0]
+        subparser = action.choices.get(name)
+        if subparser is None:
+            raise Fallback
+        seen.add(action)
+        return name, self.plan(subparser, args[1:])
+
+    def apply(self, plan: tuple) -> argparse.Namespace:
+        """converts the values of a `plan` and calls its actions like
+        argparse, reporting invalid values the way argparse does"""
+        table, seen, steps, descent = plan
+        parser = table.parser
+        namespace = argparse.Namespace(**table.defaults)
+        try:
+            for action, values, option_string in steps:
+                values = parser._get_values(action, values)
+                if values is not argparse.SUPPRESS:
+                    action(parser, namespace, values, option_string)
+            if descent is not None:
+                name, subplan = descent
+                if table.subparsers.dest is not argparse.SUPPRESS:
+                    setattr(namespace, table.subparsers.dest, name)
+                for key, value in vars(self.apply(subplan)).items():
+                    setattr(namespace, key, value)
+            for action in table.converted:
+                default = action.default
+                if action not in seen \
+                   and getattr(namespace, action.dest, None) is default:
+                    setattr(namespace, action.dest,
+                            parser._get_value(action, default))
+        except argparse.ArgumentError as error:
+            if not getattr(parser, 'exit_on_error', True):
+                raise
+            parser.error(str(error))
+        return namespace
+
+
+ENGINES = dict(argparse=ArgparseEngine, fast=FastEngine)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""executor.py: Reusable executors for `CLI.bind`"""
+
+import atexit
+import contextlib
+import os
+import queue
+import threading
+
+__all__ = ('Executor', 'ExecutorPool')
+
+
+class Executor:
+    """Base class for executors bound by `CLI.bind`.
+
+    Expensive setup belongs into `__init__`, since pooled executors are
+    created only once per process and merely `reset` for every
+    invocation. `close` is called on shutdown."""
+
+    def __init__(self, parser, namespace):
+        self.reset(parser, namespace)
+
+    def reset(self, parser, namespace) -> None:
+        """prepares the executor for the next invocation"""
+        self.parser = parser
+        self.namespace = namespace
+
+    def close(self) -> None:
+        """releases the executor's resources"""
+
+
+class ExecutorPool:
+    """Keeps up to `size` executors alive for the lifetime of the process
+    (or a forked worker) and hands them out per invocation."""
+
+    def __init__(self, executor_class: type, size: int=1):
+        if size < 1:
+            raise ValueError(f"Pool size must be positive: {size}")
+        self.executor_class = executor_class
+        self.size = size
+        self.lock = threading.Lock()
+        self.pid = None
+        self.idle = None
+        self.executors = None
+
+    def __repr__(self) -> str:
+        return (f"<{type(self).__name__} "
+                f"{self.executor_class.__qualname__} size={self.size}>")
+
+    def _check_pid(self) -> None:
+        """forked children start over with their own executors"""
+        pid = os.getpid()
+        if self.pid != pid:
+            if self.pid is None:
+                atexit.register(self.close)
+            self.pid = pid
+            self.idle = queue.LifoQueue()
+            self.executors = []
+
+    def acquire(self, parser, namespace):
+        """returns an idle (or new) executor reset to `namespace`"""
+        with self.lock:
+            self._check_pid()
+            idle = self.idle
+            if idle.empty() and len(self.executors) < self.size:
+                executor = self.executor_class(parser, namespace)
+                self.executors.append(executor)
+                return executor
+        executor = idle.get()
+        reset = getattr(executor, 'reset', None)
+        if reset is not None:
+            reset(parser, namespace)
+        return executor
+
+    def release(self, executor) -> None:
+        """gives back an executor obtained by `acquire`"""
+        with self.lock:
+            if executor in (self.executors or ()):
+                self.idle.put(executor)
+
+    @contextlib.contextmanager
+    def lease(self, parser, namespace):
+        """context manager around `acquire` and `release`"""
+        executor = self.acquire(parser, namespace)
+        try:
+            yield executor
+        finally:
+            self.release(executor)
+
+    def close(self) -> None:
+        """closes all executors created by this process"""
+        with self.lock:
+            if self.pid != os.getpid():
+                return
+            executors, self.executors = self.executors, []
+            self.idle = queue.LifoQueue()
+        for executor in executors:
+            close = getattr(executor, 'close', None)
+            if close is not None:
+                close()
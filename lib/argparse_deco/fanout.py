@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""fanout.py: Running a command once per item of a list argument"""
+
+import concurrent.futures
+import signal
+from typing import Callable, Iterable, List
+
+from .shutdown import Cancelled, current
+
+__all__ = ('FanoutError', 'fan_out', 'positive')
+
+# calls of running fan-outs, inherited by forked worker processes
+_calls = dict()
+
+
+class FanoutError(Exception):
+    """Some items of a fan-out failed. `errors` lists `(item, error)`
+    in input order, `results` has the results of all items (None for
+    the failed ones)."""
+
+    def __init__(self, errors: list, results: list):
+        self.errors = errors
+        self.results = results
+        details = '; '.join(f"{item!r}: {error!r}" for item, error in errors)
+        super().__init__(
+            f"{len(errors)} of {len(results)} items failed: {details}")
+
+    def __reduce__(self):
+        return type(self), (self.errors, self.results)
+
+
+def positive(value: str) -> int:
+    """argument type of `--jobs`"""
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+
+def call_forked(key: int, item):
+    return _calls[key](item)
+
+
+def ignore_interrupts() -> None:
+    """initializer of worker processes: Ctrl-C reaches the whole
+    process group, the parent decides about its in-flight items"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def fan_out(call: Callable, items: Iterable, jobs: int=1,
+            processes: bool=False) -> List:
+    """calls `call(item)` for every item, up to `jobs` of them at once
+    on threads (or forked processes, whose results must be picklable).
+    Returns the results in input order or raises `FanoutError` after
+    all items ran. After a shutdown request pending items are not
+    started and fail with `Cancelled`."""
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    token = current()
+    if jobs <= 1 or len(items) <= 1:
+        for index, item in enumerate(items):
+            if token is not None and token.cancelled:
+                errors.append((item, Cancelled(token.signum)))
+                continue
+            try:
+                results[index] = call(item)
+            except Exception as error:
+                errors.append((item, error))
+    elif processes:
+        import multiprocessing  # only imported by process fan-outs
+        key = id(call)
+        _calls[key] = call
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                    min(jobs, len(items)),
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=ignore_interrupts) as executor:
+                futures = [executor.submit(call_forked, key, item)
+                           for item in items]
+                try:
+                    collect(futures, items, results, errors, token)
+                except BaseException:
+                    # the grace period of a shutdown ended
+                    terminate(executor, futures)
+                    raise
+        finally:
+            del _calls[key]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(
+                min(jobs, len(items)), thread_name_prefix='fanout') \
+                as executor:
+            futures = [executor.submit(call, item) for item in items]
+            collect(futures, items, results, errors, token)
+    if errors:
+        raise FanoutError(errors, results)
+    return results
+
+
+def collect(futures, items, results, errors, token=None) -> None:
+    """waits for `futures`, cancelling the pending ones on a shutdown
+    request of `token`"""
+    def cancel():
+        for future in futures:
+            future.cancel()
+
+    if token is not None:
+        token.add_callback(cancel)
+    try:
+        for index, future in enumerate(futures):
+            try:
+                results[index] = future.result()
+            except concurrent.futures.CancelledError:
+                errors.append((items[index], Cancelled(token.signum)))
+            except Exception as error:
+                errors.append((items[index], error))
+    finally:
+        if token is not None:
+            token.remove_callback(cancel)
+
+
+def terminate(executor, futures) -> None:
+    """stops the worker processes of `executor` without waiting for
+    their items"""
+    for future in futures:
+        future.cancel()
+    executor.shutdown(wait=False)
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
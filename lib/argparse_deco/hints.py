@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""hints.py: Arguments inferred from plain type hints"""
+
+import collections.abc
+import enum
+import inspect
+import pathlib
+import types
+import typing
+from typing import Any, Optional
+
+from .arguments import Arg, Flag
+
+__all__ = ('resolve', 'infer', 'EnumType')
+
+NoneType = type(None)
+Literal = getattr(typing, 'Literal', None)
+UnionType = getattr(types, 'UnionType', None)
+
+# containers filled from `nargs` lists
+SEQUENCES = (list, collections.abc.Sequence, collections.abc.Iterable)
+
+
+def evaluate(annotation, namespace: dict):
+    """evaluates a postponed (string) annotation in `namespace`,
+    keeping it as it is if that fails"""
+    if not isinstance(annotation, str):
+        return annotation
+    try:
+        return eval(annotation, namespace)
+    except Exception:
+        return annotation
+
+
+def resolve(func) -> inspect.Signature:
+    """the signature of `func` with postponed annotations evaluated
+    (see PEP 563) like `typing.get_type_hints`"""
+    result = inspect.signature(func)
+    parameters = result.parameters.values()
+    if not any(isinstance(parameter.annotation, str)
+               for parameter in parameters):
+        return result
+    namespace = getattr(func, '__globals__', {})
+    return result.replace(parameters=[
+        parameter.replace(
+            annotation=evaluate(parameter.annotation, namespace))
+        for parameter in parameters])
+
+
+class EnumType:
+    """Converts the name of a member of `enum`"""
+
+    __slots__ = ('enum', '__name__')
+
+    def __init__(self, enum: type):
+        self.enum = enum
+        self.__name__ = enum.__name__
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.__name__})"
+
+    def __call__(self, value: str):
+        try:
+            return self.enum[value]
+        except KeyError:
+            raise ValueError(value) from None
+
+
+def unwrap_optional(hint):
+    """`T` of `Optional[T]`, otherwise `hint`
+    (or None for other unions)"""
+    if getattr(hint, '__origin__', None) is typing.Union \
+       or (UnionType is not None and isinstance(hint, UnionType)):
+        args = [arg for arg in hint.__args__ if arg is not NoneType]
+        return args[0] if len(args) == 1 else None
+    return hint
+
+
+def infer(name: str, hint, default: Any=inspect.Parameter.empty) \
+        -> Optional[Arg]:
+    """an `Arg` for a parameter with a plain type hint: `int`, `float`,
+    `str`, `pathlib` paths, `bool` flags, `Enum` members, `Literal`
+    choices, lists of those and `Optional` ones. Other hints return None.
+
+    Parameters without a default become positional arguments, others
+    `--name` options."""
+    required = default is inspect.Parameter.empty
+    hint = unwrap_optional(hint)
+    kwargs = dict()
+    origin = getattr(hint, '__origin__', None)
+    if hint in SEQUENCES or origin in SEQUENCES:
+        args = getattr(hint, '__args__', None) or (str,)
+        hint = unwrap_optional(args[0])
+        if isinstance(hint, typing.TypeVar):
+            hint = str
+        origin = getattr(hint, '__origin__', None)
+        kwargs['nargs'] = '+' if required else '*'
+
+    if hint is bool:
+        if 'nargs' in kwargs:
+            return None
+        option = f"--no-{name}" if default is True else f"--{name}"
+        return Flag(option.replace('_', '-'))
+    if Literal is not None and origin is Literal:
+        choices = hint.__args__
+        kinds = {type(choice) for choice in choices}
+        if len(kinds) == 1 and str not in kinds:
+            kwargs['type'], = kinds
+        kwargs['choices'] = choices
+    elif isinstance(hint, type) and issubclass(hint, enum.Enum):
+        kwargs['type'] = EnumType(hint)
+        kwargs['choices'] = tuple(hint)
+        kwargs['metavar'] = f"{{{','.join(hint.__members__)}}}"
+    elif hint in (int, float) or (isinstance(hint, type)
+                                  and issubclass(hint, pathlib.PurePath)):
+        kwargs['type'] = hint
+    elif hint is not str:
+        return None
+
+    if required:
+        return Arg(**kwargs)
+    return Arg(f"--{name.replace('_', '-')}", default=default, **kwargs)
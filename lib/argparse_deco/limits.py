@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""limits.py: Timeouts and resource limits of commands"""
+
+import inspect
+import pickle
+import re
+import signal
+import threading
+import time
+import warnings
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover (Windows)
+    resource = None
+
+__all__ = ('Limits', 'LimitError', 'CommandTimeout',
+           'ResourceLimitExceeded', 'parse_size')
+
+UNITS = dict(K=1 << 10, M=1 << 20, G=1 << 30, T=1 << 40)
+
+
+def parse_size(size) -> Optional[int]:
+    """converts sizes like `512M` or `2G` into bytes"""
+    if size is None or isinstance(size, int):
+        return size
+    match = re.fullmatch(r'\s*(\d+)\s*([KMGT]?)I?B?\s*', str(size).upper())
+    if match is None:
+        raise ValueError(f"Invalid size: {size!r}")
+    number, unit = match.groups()
+    return int(number) * UNITS.get(unit, 1)
+
+
+class LimitError(Exception):
+    """A command exceeded one of its limits"""
+
+    def __init__(self, command: str, limit: str, value):
+        super().__init__(f"{command} exceeded its {limit} limit ({value})")
+        self.command = command
+        self.limit = limit
+        self.value = value
+
+    def __reduce__(self):
+        return type(self), (self.command, self.limit, self.value)
+
+
+class CommandTimeout(LimitError, TimeoutError):
+    """A command did not finish within its timeout"""
+
+    def __init__(self, command: str, value, limit: str='timeout'):
+        super().__init__(command, limit, value)
+
+    def __reduce__(self):
+        return type(self), (self.command, self.value)
+
+
+class ResourceLimitExceeded(LimitError):
+    """A command used more memory or CPU time than allowed"""
+
+
+class Limits:
+    """Limits set by `CLI.limits`. Synchronous commands run in a forked
+    child process with `setrlimit` applied (their results must be
+    picklable), coroutine functions are cancelled in-process after
+    `timeout` seconds. Items of generators are streamed from the child
+    one by one, `timeout` limits the whole run.
+
+    Forking a process running several threads (e.g. the workers of
+    `--workers` or of a thread fan-out) may deadlock the child, so
+    there the child is started by a fork server, which needs the
+    command and its arguments to be picklable; otherwise it is forked
+    with a `RuntimeWarning`."""
+
+    __slots__ = ('timeout', 'max_rss', 'cpu_seconds')
+
+    def __init__(self, timeout: float=None, max_rss=None,
+                 cpu_seconds: int=None):
+        self.timeout = timeout
+        self.max_rss = parse_size(max_rss)
+        self.cpu_seconds = cpu_seconds
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}(timeout={self.timeout!r}, "
+                f"max_rss={self.max_rss!r}, "
+                f"cpu_seconds={self.cpu_seconds!r})")
+
+    def run(self, func, args: tuple, kwargs: dict):
+        """calls `func(*args, **kwargs)` within the limits"""
+        name = func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            import asyncio  # only imported by asynchronous commands
+            return asyncio.run(self.run_async(name, func(*args, **kwargs)))
+        return self.run_isolated(name, func, args, kwargs)
+
+    async def run_async(self, name: str, coroutine):
+        import asyncio
+        try:
+            return await asyncio.wait_for(coroutine, self.timeout)
+        except asyncio.TimeoutError:
+            raise CommandTimeout(name, self.timeout) from None
+
+    def apply(self) -> None:
+        """sets the resource limits of the current process"""
+        if resource is None:
+            return
+        if self.max_rss is not None:
+            resource.setrlimit(resource.RLIMIT_AS,
+                               (self.max_rss, self.max_rss))
+        if self.cpu_seconds is not None:
+            resource.setrlimit(resource.RLIMIT_CPU,
+                               (self.cpu_seconds, self.cpu_seconds + 1))
+
+    def child(self, connection, name, func, args, kwargs) -> None:
+        try:
+            try:
+                self.apply()
+                result = func(*args, **kwargs)
+                if inspect.isgenerator(result):
+                    for item in result:
+                        connection.send(('item', item))
+                    message = ('end', None)
+                else:
+                    message = ('result', result)
+            except MemoryError:
+                message = ('error', ResourceLimitExceeded(
+                    name, 'max_rss', self.max_rss))
+            except BaseException as error:
+                message = ('error', error)
+            try:
+                connection.send(message)
+            except Exception as error:
+                connection.send(('error', error))
+        finally:
+            connection.close()
+
+    def context(self, func, args: tuple, kwargs: dict):
+        """the multiprocessing context of starting the child"""
+        import multiprocessing  # only imported by limited commands
+        if threading.active_count() > 1:
+            try:
+                pickle.dumps((self, func, args, kwargs))
+            except Exception:
+                warnings.warn(
+                    f"forking {func.__qualname__} from a process with "
+                    "several threads, since it cannot be pickled",
+                    RuntimeWarning, stacklevel=4)
+            else:
+                return multiprocessing.get_context('forkserver')
+        return multiprocessing.get_context('fork')
+
+    def run_isolated(self, name: str, func, args: tuple, kwargs: dict):
+        context = self.context(func, args, kwargs)
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=self.child, args=(sender, name, func, args, kwargs),
+            daemon=True)
+        process.start()
+        sender.close()
+        deadline = None if self.timeout is None \
+            else time.monotonic() + self.timeout
+        try:
+            kind, value = self.receive(name, process, receiver, deadline)
+        except BaseException:
+            self.stop(process, receiver)
+            raise
+        if kind in ('item', 'end'):
+            return self.stream(name, process, receiver, deadline,
+                               kind, value)
+        self.stop(process, receiver)
+        if kind == 'error':
+            raise value
+        return value
+
+    def receive(self, name: str, process, receiver, deadline):
+        """the next message of the child"""
+        timeout = None if deadline is None \
+            else max(0, deadline - time.monotonic())
+        try:
+            if not receiver.poll(timeout):
+                raise CommandTimeout(name, self.timeout)
+            return receiver.recv()
+        except EOFError:
+            process.join()
+            if process.exitcode in (-signal.SIGXCPU, -signal.SIGKILL) \
+               and self.cpu_seconds is not None:
+                raise ResourceLimitExceeded(
+                    name, 'cpu_seconds', self.cpu_seconds) from None
+            raise ResourceLimitExceeded(
+                name, 'process', f"exit code {process.exitcode}") from None
+
+    def stream(self, name: str, process, receiver, deadline, kind, value):
+        """yields the items of a generator running in the child"""
+        try:
+            while kind == 'item':
+                yield value
+                kind, value = self.receive(name, process, receiver,
+                                           deadline)
+            if kind == 'error':
+                raise value
+        finally:
+            self.stop(process, receiver)
+
+    @staticmethod
+    def stop(process, receiver) -> None:
+        receiver.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""metrics.py: Latency histograms and error counts of commands"""
+
+import bisect
+import os
+import tempfile
+import threading
+import time
+import weakref
+from typing import Dict, Iterator, Tuple
+
+__all__ = ('Metrics',)
+
+DEFAULT_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5,
+                   1., 2.5, 5., 10., 30., 60.)
+
+STAGES = dict(
+    parse="Time spent parsing command lines",
+    execute="Time spent executing commands",
+)
+
+
+class Owner:
+    """Kept by a thread only: collected when the thread ends"""
+
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard: Dict):
+        self.shard = shard
+
+
+def merge(totals: Dict, shard: Dict) -> None:
+    """adds the histograms and error counts of `shard` to `totals`"""
+    histograms = totals['histograms']
+    for key, histogram in tuple(shard['histograms'].items()):
+        histogram = list(histogram)
+        merged = histograms.setdefault(key, [0] * len(histogram))
+        for i, value in enumerate(histogram):
+            merged[i] += value
+    errors = totals['errors']
+    for key, count in tuple(shard['errors'].items()):
+        errors[key] = errors.get(key, 0) + count
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+class Timer:
+    """Exit callback (for an `ExitStack`) observing the time since its
+    creation and counting errors"""
+
+    __slots__ = ('metrics', 'stage', 'command', 'start')
+
+    def __init__(self, metrics, stage: str, command: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.command = command
+        self.start = time.perf_counter()
+
+    def __call__(self, exc_type, exc, traceback) -> bool:
+        self.metrics.observe(self.stage, self.command,
+                             time.perf_counter() - self.start)
+        if exc_type is not None and not (
+                issubclass(exc_type, SystemExit) and not exc.code):
+            self.metrics.error(self.stage, self.command)
+        return False
+
+
+class Metrics:
+    """In-process latency histograms of parsing and executing commands
+    and error counts, labeled by the command path.
+
+    Every thread updates its own shard, so recording never takes a
+    lock; `snapshot` merges the shards. The shard of a thread that
+    ended is folded into `retired`, so pools started over and over
+    do not pile up shards."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # shards of live threads by their id
+        self.shards = {}
+        self.retired = dict(histograms={}, errors={})
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def shard(self) -> Dict:
+        try:
+            return self.local.owner.shard
+        except AttributeError:
+            shard = dict(histograms={}, errors={})
+            owner = self.local.owner = Owner(shard)
+            with self.lock:
+                self.shards[id(shard)] = shard
+            # the thread local owner goes away with the thread
+            weakref.finalize(owner, self.retire, shard)
+            return shard
+
+    def retire(self, shard: Dict) -> None:
+        """folds the `shard` of an ended thread into `retired`"""
+        with self.lock:
+            self.shards.pop(id(shard), None)
+            merge(self.retired, shard)
+
+    def observe(self, stage: str, command: str, seconds: float) -> None:
+        histograms = self.shard()['histograms']
+        key = (stage, command)
+        try:
+            histogram = histograms[key]
+        except KeyError:
+            # per bucket counts, +Inf count, sum
+            histogram = histograms[key] = [0] * (len(self.buckets) + 1) \
+                + [0.]
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def error(self, stage: str, command: str) -> None:
+        errors = self.shard()['errors']
+        key = (stage, command)
+        errors[key] = errors.get(key, 0) + 1
+
+    def timer(self, stage: str, command: str) -> Timer:
+        return Timer(self, stage, command)
+
+    def snapshot(self) -> Dict[str, Dict[Tuple[str, str], list]]:
+        """merged copies of all shards:
+        `histograms` maps (stage, command) to per bucket counts
+        (the last bucket being +Inf) followed by the sum of seconds,
+        `errors` maps (stage, command) to error counts"""
+        totals = dict(histograms={}, errors={})
+        with self.lock:
+            merge(totals, self.retired)
+            for shard in tuple(self.shards.values()):
+                merge(totals, shard)
+        return totals
+
+    def render(self, prefix: str='argparse_deco') -> str:
+        """the snapshot in the Prometheus text exposition format"""
+        return ''.join(self.lines(prefix))
+
+    def lines(self, prefix: str) -> Iterator[str]:
+        snapshot = self.snapshot()
+        for stage, description in STAGES.items():
+            name = f"{prefix}_{stage}_seconds"
+            yield f"# HELP {name} {description}\n"
+            yield f"# TYPE {name} histogram\n"
+            for (key_stage, command), histogram in \
+                    sorted(snapshot['histograms'].items()):
+                if key_stage != stage:
+                    continue
+                label = f'command="{escape(command)}"'
+                cumulative = 0
+                bounds = [repr(bound) for bound in self.buckets] + ['+Inf']
+                for bound, count in zip(bounds, histogram):
+                    cumulative += count
+                    yield f'{name}_bucket{{{label},le="{bound}"}} ' \
+                        f'{cumulative}\n'
+                yield f"{name}_sum{{{label}}} {histogram[-1]!r}\n"
+                yield f"{name}_count{{{label}}} {cumulative}\n"
+        name = f"{prefix}_errors_total"
+        yield f"# HELP {name} Failed parses and executions of commands\n"
+        yield f"# TYPE {name} counter\n"
+        for (stage, command), count in sorted(snapshot['errors'].items()):
+            yield f'{name}{{command="{escape(command)}",stage="{stage}"}} ' \
+                f'{count}\n'
+
+    def write_textfile(self, path: str) -> None:
+        """writes the metrics atomically, e.g. for the textfile
+        collector of the node exporter"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                fp.write(self.render())
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def serve(self, port: int=0, host: str='127.0.0.1'):
+        """serves the metrics over HTTP from a daemon thread;
+        returns the server (`server_address` holds the actual port)"""
+        import http.server  # only needed by daemons serving metrics
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever,
+                                  name="metrics", daemon=True)
+        thread.start()
+        return server
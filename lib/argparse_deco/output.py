@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""output.py: Buffered output of records returned by commands"""
+
+import csv
+import io
+import json
+import os
+import sys
+from typing import Callable, Dict, Iterable, Iterator
+
+__all__ = ('FORMATS', 'Sink')
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def encode_jsonl(records: Iterable) -> Iterator[str]:
+    dumps = json.JSONEncoder(ensure_ascii=False, default=str).encode
+    for record in records:
+        yield dumps(record)
+        yield '\n'
+
+
+def encode_plain(records: Iterable) -> Iterator[str]:
+    for record in records:
+        if isinstance(record, (tuple, list)):
+            yield ' '.join(map(str, record))
+        else:
+            yield str(record)
+        yield '\n'
+
+
+def encode_delimited(records: Iterable, dialect: str) -> Iterator[str]:
+    """encodes records by the csv module; mappings get a header line"""
+    buffer = io.StringIO()
+    writer = None
+    for record in records:
+        if writer is None:
+            if isinstance(record, dict):
+                writer = csv.DictWriter(buffer, list(record),
+                                        dialect=dialect)
+                writer.writeheader()
+            else:
+                writer = csv.writer(buffer, dialect=dialect)
+        if not isinstance(record, (dict, tuple, list)):
+            record = (record,)
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class TSV(csv.excel_tab):
+    lineterminator = '\n'
+
+
+class CSV(csv.excel):
+    lineterminator = '\n'
+
+
+FORMATS: Dict[str, Callable[[Iterable], Iterator[str]]] = dict(
+    plain=encode_plain,
+    jsonl=encode_jsonl,
+    csv=lambda records: encode_delimited(records, CSV),
+    tsv=lambda records: encode_delimited(records, TSV),
+)
+
+
+class Sink:
+    """Writes encoded records in large chunks to a binary stream
+    (standard output by default) without materialising them"""
+
+    __slots__ = ('stream', 'buffer_size', 'encoding')
+
+    def __init__(self, stream=None, buffer_size: int=DEFAULT_BUFFER_SIZE,
+                 encoding: str='utf-8'):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+
+    def _target(self, stream=None):
+        if stream is None:
+            stream = sys.stdout if self.stream is None else self.stream
+        if isinstance(stream, io.TextIOBase):
+            stream.flush()
+            buffer = getattr(stream, 'buffer', None)
+            if buffer is None:
+                # e.g. StringIO: write text instead of bytes
+                return stream, False
+            return buffer, True
+        return stream, True
+
+    def write(self, records: Iterable, format: str='plain',
+              stream=None) -> int:
+        """encodes `records` and writes them (to `stream` instead of
+        the sink's own one if given); returns their count"""
+        try:
+            encode = FORMATS[format]
+        except KeyError:
+            raise ValueError(f"Unknown output format {format!r}") from None
+        stream, binary = self._target(stream)
+        chunk = []
+        size = 0
+        count = 0
+        records = iter(records)
+
+        def counted():
+            nonlocal count
+            for count, record in enumerate(records, 1):
+                yield record
+
+        try:
+            for piece in encode(counted()):
+                chunk.append(piece)
+                size += len(piece)
+                if size >= self.buffer_size:
+                    self._flush(stream, binary, chunk)
+                    chunk = []
+                    size = 0
+            self._flush(stream, binary, chunk)
+            stream.flush()
+        except BrokenPipeError:
+            close = getattr(records, 'close', None)
+            if close is not None:
+                close()
+            self._broken_pipe(stream)
+        return count
+
+    def _flush(self, stream, binary: bool, chunk: list) -> None:
+        if chunk:
+            data = ''.join(chunk)
+            stream.write(data.encode(self.encoding) if binary else data)
+
+    @staticmethod
+    def _broken_pipe(stream) -> None:
+        """The reader went away: silence further output (including the
+        interpreter's final flush) and exit like a well-behaved filter"""
+        try:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, stream.fileno())
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+        sys.exit(1)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""parsing.py: ArgumentParser with helpful errors for large trees"""
+
+import argparse
+
+__all__ = ('ArgumentParser',)
+
+# list all choices of subcommands only up to this number
+MAX_CHOICES = 20
+
+
+class SubParsersAction(argparse._SubParsersAction):
+    """Shows a plain metavar in usage lines instead of
+    more than `MAX_CHOICES` choices"""
+
+    suggest = None
+
+    @property
+    def metavar(self):
+        if self._metavar is None and len(self.choices) > MAX_CHOICES:
+            return 'COMMAND'
+        return self._metavar
+
+    @metavar.setter
+    def metavar(self, value):
+        self._metavar = value
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    """Suggests similar subcommands instead of listing all choices"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.register('action', 'parsers', SubParsersAction)
+
+    def _check_value(self, action, value):
+        if isinstance(action, argparse._SubParsersAction) \
+           and value not in action.choices:
+            suggest = getattr(action, 'suggest', None)
+            suggestions = suggest(value) if suggest is not None else ()
+            message = f"invalid choice: {value!r}"
+            if suggestions:
+                *others, last = map(repr, suggestions)
+                if others:
+                    last = f"{', '.join(others)} or {last}"
+                message += f" (did you mean {last}?)"
+            elif len(action.choices) <= MAX_CHOICES:
+                return super()._check_value(action, value)
+            raise argparse.ArgumentError(action, message)
+        return super()._check_value(action, value)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""pipeline.py: In-process pipelines of subcommands"""
+
+from typing import Iterator, List
+
+__all__ = ('Input', 'split_stages')
+
+
+class Input:
+    """Annotates the parameter receiving the return value (usually a
+    generator) of the previous stage of a pipeline"""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return type(self).__name__
+
+    @classmethod
+    def lookup(cls, parameter) -> bool:
+        """whether `parameter` is annotated as pipeline input"""
+        annotation = parameter.annotation
+        return annotation is cls or isinstance(annotation, cls)
+
+
+def split_stages(args: List[str], separator: str='::') -> List[List[str]]:
+    """splits command line arguments into the stages of a pipeline"""
+    stages = [[]]
+    for arg in args:
+        if arg == separator:
+            stages.append([])
+        else:
+            stages[-1].append(arg)
+    return stages
+
+
+def closing(generator, stack) -> Iterator:
+    """yields from `generator` and closes `stack` once it is exhausted
+    or closed, so executors and resources outlive the dispatch call"""
+    with stack:
+        yield from generator
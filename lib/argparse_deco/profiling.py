@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""profiling.py: Profiling dispatched commands in place"""
+
+import cProfile
+import collections
+import contextlib
+import io
+import pstats
+import sys
+import threading
+import tracemalloc
+from typing import List
+
+__all__ = ('Profiler', 'Sampler', 'MODES')
+
+# profiling modes with their report formats, the first one is the default
+MODES = dict(
+    cprofile=('top', 'pstats'),
+    sample=('collapsed', 'top'),
+    tracemalloc=('top',),
+)
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of the thread identified by `sampled` every
+    `interval` seconds counting the collapsed stacks (outermost frame
+    first)"""
+
+    def __init__(self, sampled: int, interval: float=0.005):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.sampled = sampled
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        current_frames = sys._current_frames
+        while not self.stopped.wait(self.interval):
+            frame = current_frames().get(self.sampled)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self) -> List[str]:
+        """lines of the collapsed stack format read by flamegraph tools"""
+        return [f"{stack} {count}" for stack, count
+                in sorted(self.counts.items())]
+
+    def top(self, limit: int) -> List[str]:
+        """functions by the number of samples they were running in"""
+        total = sum(self.counts.values())
+        leaves = collections.Counter()
+        for stack, count in self.counts.items():
+            leaves[stack.rpartition(';')[2]] += count
+        lines = [f"{total} samples every {self.interval * 1000:g}ms",
+                 f"{'samples':>8} {'share':>6}  function"]
+        for function, count in leaves.most_common(limit):
+            lines.append(f"{count:>8} {count / total:>6.1%}  {function}")
+        return lines
+
+
+class Profiler:
+    """Profiles commands selected by the `--profile` option of
+    `CLI.profile`: `cprofile` (a `top` list or a `pstats` dump),
+    `sample` (collapsed stacks or a `top` list of a sampling profiler)
+    and `tracemalloc` (the peak and the `top` allocation sites)"""
+
+    __slots__ = ('top', 'interval')
+
+    def __init__(self, top: int=20, interval: float=0.005):
+        self.top = top
+        self.interval = interval
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}(top={self.top}, "
+                f"interval={self.interval})")
+
+    @contextlib.contextmanager
+    def session(self, mode: str, format: str=None, output: str=None):
+        """profiles the body and writes the report to the file
+        `output` (or standard error)"""
+        try:
+            formats = MODES[mode]
+        except KeyError:
+            raise ValueError(f"Unknown profiling mode {mode!r}") from None
+        if format is None:
+            format = formats[0]
+        elif format not in formats:
+            raise ValueError(f"{mode} profiles cannot be written as "
+                             f"{format}, only as {', '.join(formats)}")
+        if format == 'pstats' and output is None:
+            raise ValueError("pstats profiles need an output file")
+        with getattr(self, mode)(format, output):
+            yield
+
+    @contextlib.contextmanager
+    def cprofile(self, format: str, output: str):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            if format == 'pstats':
+                profile.dump_stats(output)
+            else:
+                stream = io.StringIO()
+                stats = pstats.Stats(profile, stream=stream)
+                stats.sort_stats('cumulative').print_stats(self.top)
+                self.write(output, stream.getvalue().strip('\n').split('\n'))
+
+    @contextlib.contextmanager
+    def sample(self, format: str, output: str):
+        sampler = Sampler(threading.get_ident(), self.interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            self.write(output, sampler.collapsed() if format == 'collapsed'
+                       else sampler.top(self.top))
+
+    @contextlib.contextmanager
+    def tracemalloc(self, format: str, output: str):
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+            lines = [f"peak: {peak} bytes, current: {current} bytes",
+                     f"{'size':>10} {'count':>7}  allocation site"]
+            for statistic in snapshot.statistics('lineno')[:self.top]:
+                frame = statistic.traceback[0]
+                lines.append(f"{statistic.size:>10} {statistic.count:>7}  "
+                             f"{frame.filename}:{frame.lineno}")
+            self.write(output, lines)
+
+    @staticmethod
+    def write(output: str, lines: List[str]) -> None:
+        if output is None:
+            print(*lines, sep='\n', file=sys.stderr)
+        else:
+            with open(output, 'w') as fp:
+                fp.writelines(f"{line}\n" for line in lines)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""resources.py: Shared resources injected into commands"""
+
+import contextlib
+import inspect
+import threading
+from typing import Any, Callable, Dict
+
+from .compat import HAS_PY37, PEP560Meta
+
+__all__ = ('Resource', 'Provider', 'Scope',
+           'PROCESS', 'BATCH', 'INVOCATION')
+
+PROCESS = 'process'
+BATCH = 'batch'
+INVOCATION = 'invocation'
+SCOPES = (PROCESS, BATCH, INVOCATION)
+
+
+class Resource(metaclass=type if HAS_PY37 else PEP560Meta):
+    """Annotates a parameter to be filled by the provider `name`
+    (defaults to the parameter's name) instead of the namespace"""
+
+    __slots__ = ('name',)
+
+    def __class_getitem__(cls, name):
+        return cls(name)
+
+    def __init__(self, name: str=None):
+        self.name = name
+
+    def __repr__(self) -> str:
+        name = f"[{self.name!r}]" if self.name else ""
+        return f"{type(self).__name__}{name}"
+
+    @classmethod
+    def lookup(cls, parameter):
+        """returns the provider name of an annotated `parameter` or None"""
+        annotation = parameter.annotation
+        if annotation is cls:
+            return parameter.name
+        if isinstance(annotation, cls):
+            return annotation.name or parameter.name
+        return None
+
+
+class Provider:
+    """Factory of a resource with its scope. Generator functions are
+    entered like context managers, i.e. the code after their `yield`
+    tears the resource down."""
+
+    __slots__ = ('factory', 'scope')
+
+    def __init__(self, factory: Callable, scope: str=INVOCATION):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown scope {scope!r}, "
+                             f"expected one of {', '.join(SCOPES)}")
+        self.factory = factory
+        self.scope = scope
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}({self.factory.__qualname__}, "
+                f"scope={self.scope!r})")
+
+    def create(self, stack: contextlib.ExitStack) -> Any:
+        if inspect.isgeneratorfunction(self.factory):
+            return stack.enter_context(
+                contextlib.contextmanager(self.factory)())
+        return self.factory()
+
+
+class Scope:
+    """Lazily created resources living until the scope is closed"""
+
+    __slots__ = ('instances', 'stack', 'lock')
+
+    def __init__(self):
+        self.instances: Dict[str, Any] = dict()
+        self.stack = contextlib.ExitStack()
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, name: str, provider: Provider) -> Any:
+        """returns the resource `name`, creating it on first use"""
+        try:
+            return self.instances[name]
+        except KeyError:
+            pass
+        with self.lock:
+            if name not in self.instances:
+                self.instances[name] = provider.create(self.stack)
+            return self.instances[name]
+
+    def close(self) -> None:
+        """tears down all resources in reverse order of creation"""
+        with self.lock:
+            self.instances.clear()
+            stack, self.stack = self.stack, contextlib.ExitStack()
+        stack.close()
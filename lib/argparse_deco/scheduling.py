@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""scheduling.py: Work-stealing scheduling of batches by concurrency class"""
+
+import array
+import collections
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+__all__ = ('Concurrency', 'Task', 'Scheduler', 'ClassStats')
+
+
+class Concurrency:
+    """The concurrency class `name` of a command, the relative `cost`
+    of running it and at most `limit` concurrent runs of the class"""
+
+    __slots__ = ('name', 'cost', 'limit')
+
+    def __init__(self, name: str='default', cost: float=1.0,
+                 limit: int=None):
+        if cost <= 0:
+            raise ValueError(f"Cost must be positive, not {cost!r}")
+        if limit is not None and limit < 1:
+            raise ValueError(f"Limit must be positive, not {limit!r}")
+        self.name = name
+        self.cost = cost
+        self.limit = limit
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}({self.name!r}, cost={self.cost}, "
+                f"limit={self.limit})")
+
+
+DEFAULT = Concurrency()
+
+
+class Task:
+    """A `call` of the class `concurrency`; after it ran `done` is set
+    and it has its `result` or `error`"""
+
+    __slots__ = ('position', 'call', 'concurrency', 'queued', 'result',
+                 'error', 'done', 'dropped')
+
+    def __init__(self, position, call: Optional[Callable],
+                 concurrency: Concurrency=DEFAULT, error=None):
+        self.position = position
+        self.call = call
+        self.concurrency = concurrency
+        self.queued = time.perf_counter()
+        self.result = None
+        self.error = error
+        # tasks failing before being scheduled are done at once
+        self.done = call is None
+        self.dropped = False
+
+
+class ClassStats:
+    """Counts, wall time and latencies (from queueing to completion)
+    of the tasks of a concurrency class"""
+
+    __slots__ = ('count', 'errors', 'busy', 'first', 'last', 'latencies')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.first = None
+        self.last = None
+        self.latencies = array.array('d')
+
+    def record(self, task: Task, started: float, finished: float) -> None:
+        self.count += 1
+        if task.error is not None:
+            self.errors += 1
+        self.busy += finished - started
+        if self.first is None or started < self.first:
+            self.first = started
+        self.last = finished if self.last is None \
+            else max(self.last, finished)
+        self.latencies.append(finished - task.queued)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> Dict[str, float]:
+        elapsed = (self.last - self.first) if self.count else 0.0
+        return dict(
+            count=self.count,
+            errors=self.errors,
+            throughput=self.count / elapsed if elapsed > 0 else 0.0,
+            busy=self.busy,
+            p50=self.percentile(.5),
+            p95=self.percentile(.95),
+            max=max(self.latencies, default=0.0))
+
+
+class Scheduler:
+    """Runs tasks on `workers` threads, each with its own queue. New
+    tasks go to the queue with the least cost, idle workers steal from
+    the back of the busiest queue, and a task whose class is at its
+    limit is skipped for another one, so cheap classes keep all workers
+    busy while expensive ones are throttled. At most `window` tasks are
+    queued, running or waiting to be yielded in input order."""
+
+    def __init__(self, workers: int, window: int=None):
+        self.workers = workers
+        self.window = window or workers * 64
+        self.queues = [collections.deque() for _ in range(workers)]
+        self.loads = [0.0] * workers
+        self.limits = {}
+        self.running = collections.Counter()
+        self.stats = collections.defaultdict(ClassStats)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.cancelled = None
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """the summaries of the statistics by concurrency class"""
+        with self.condition:
+            return {name: stats.summary()
+                    for name, stats in sorted(self.stats.items())}
+
+    def format_report(self) -> str:
+        lines = [f"{'class':<16}{'count':>8}{'errors':>8}{'per s':>10}"
+                 f"{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, summary in self.report().items():
+            lines.append(
+                f"{name:<16}{summary['count']:>8}{summary['errors']:>8}"
+                f"{summary['throughput']:>10.1f}"
+                f"{summary['p50'] * 1e3:>10.1f}"
+                f"{summary['p95'] * 1e3:>10.1f}"
+                f"{summary['max'] * 1e3:>10.1f}")
+        return '\n'.join(lines)
+
+    def run(self, tasks: Iterable[Task],
+            cancelled: Callable[[], bool]=None) -> Iterator[Task]:
+        """schedules `tasks` and yields them in input order once done;
+        after `cancelled()` became true no further tasks are started"""
+        self.closed = False
+        self.cancelled = cancelled
+        threads = [threading.Thread(target=self.work, args=(index,),
+                                    name=f'scheduler-{index}', daemon=True)
+                   for index in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        pending = collections.deque()
+        try:
+            for task in tasks:
+                if cancelled is not None and cancelled():
+                    break
+                with self.condition:
+                    while len(pending) >= self.window \
+                            and not pending[0].done:
+                        self.condition.wait()
+                yield from self.completed(pending)
+                pending.append(task)
+                if not task.done:
+                    self.submit(task)
+            with self.condition:
+                self.closed = True
+                self.condition.notify_all()
+            while pending:
+                with self.condition:
+                    while not pending[0].done:
+                        if cancelled is not None and cancelled():
+                            self.drop()
+                        self.condition.wait(0.1)
+                yield from self.completed(pending)
+            for thread in threads:
+                thread.join()
+        finally:
+            # on errors running tasks are not waited for
+            self.drop()
+            with self.condition:
+                self.closed = True
+                self.condition.notify_all()
+
+    def completed(self, pending: collections.deque) -> Iterator[Task]:
+        while pending and pending[0].done:
+            task = pending.popleft()
+            if not task.dropped:
+                yield task
+
+    def submit(self, task: Task) -> None:
+        concurrency = task.concurrency
+        with self.condition:
+            if concurrency.limit is not None:
+                limit = self.limits.get(concurrency.name)
+                self.limits[concurrency.name] = concurrency.limit \
+                    if limit is None else min(limit, concurrency.limit)
+            index = min(range(self.workers), key=self.loads.__getitem__)
+            self.queues[index].append(task)
+            self.loads[index] += concurrency.cost
+            self.condition.notify_all()
+
+    def drop(self) -> None:
+        """drops the queued tasks, running ones are finished"""
+        with self.condition:
+            for index, queue in enumerate(self.queues):
+                for task in queue:
+                    task.dropped = task.done = True
+                queue.clear()
+                self.loads[index] = 0.0
+            self.condition.notify_all()
+
+    def runnable(self, task: Task) -> bool:
+        name = task.concurrency.name
+        limit = self.limits.get(name)
+        return limit is None or self.running[name] < limit
+
+    def take(self, index: int, stealing: bool) -> Optional[Task]:
+        """removes the first runnable task of the queue `index`, from
+        the back when `stealing`"""
+        queue = self.queues[index]
+        positions = range(len(queue) - 1, -1, -1) if stealing \
+            else range(len(queue))
+        for position in positions:
+            task = queue[position]
+            if self.runnable(task):
+                del queue[position]
+                self.loads[index] -= task.concurrency.cost
+                return task
+        return None
+
+    def next_task(self, index: int) -> Optional[Task]:
+        if self.cancelled is not None and self.cancelled():
+            self.drop()
+            return None
+        task = self.take(index, False)
+        if task is not None:
+            return task
+        victims = sorted((victim for victim in range(self.workers)
+                          if victim != index and self.queues[victim]),
+                         key=self.loads.__getitem__, reverse=True)
+        for victim in victims:
+            task = self.take(victim, True)
+            if task is not None:
+                return task
+        return None
+
+    def work(self, index: int) -> None:
+        while True:
+            with self.condition:
+                while True:
+                    task = self.next_task(index)
+                    if task is not None:
+                        break
+                    if self.closed and not any(self.queues):
+                        return
+                    self.condition.wait(0.1)
+                name = task.concurrency.name
+                self.running[name] += 1
+            started = time.perf_counter()
+            try:
+                task.result = task.call()
+            except (Exception, SystemExit) as error:
+                task.error = error
+            finished = time.perf_counter()
+            with self.condition:
+                self.running[name] -= 1
+                self.stats[name].record(task, started, finished)
+                task.done = True
+                self.condition.notify_all()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""shell.py: Interactive prompt over a warm command tree"""
+
+import argparse
+import cmd
+import inspect
+import shlex
+import sys
+import traceback
+from typing import List
+
+from .resources import Scope
+
+try:
+    import readline
+except ImportError:  # pragma: no cover
+    readline = None
+
+__all__ = ('Shell',)
+
+HISTORY_LENGTH = 1000
+
+
+class Shell(cmd.Cmd):
+    """Runs every line as command line of `command`, which is parsed
+    with the parser built once. Batch scoped resources live for the
+    whole session. Completes subcommands and options, and keeps the
+    history in the file `history` (if readline is available)."""
+
+    def __init__(self, command, prompt: str=None, history: str=None,
+                 stdin=None, stdout=None):
+        super().__init__(stdin=stdin, stdout=stdout)
+        if stdin is not None:
+            self.use_rawinput = False
+        self.command = command
+        self.prompt = f"{command.name}> " if prompt is None else prompt
+        self.history = history
+        self.session = Scope()
+        self.delimiters = None
+
+    def preloop(self):
+        if readline is None:
+            return
+        # options are completed as a whole
+        self.delimiters = readline.get_completer_delims()
+        readline.set_completer_delims(' \t\n')
+        if self.history is not None:
+            readline.set_history_length(HISTORY_LENGTH)
+            try:
+                readline.read_history_file(self.history)
+            except OSError:
+                pass
+
+    def postloop(self):
+        self.session.close()
+        if readline is None:
+            return
+        readline.set_completer_delims(self.delimiters)
+        if self.history is not None:
+            try:
+                readline.write_history_file(self.history)
+            except OSError as error:
+                print(f"cannot write history: {error}", file=sys.stderr)
+
+    def emptyline(self) -> bool:
+        return False
+
+    def onecmd(self, line: str) -> bool:
+        """runs `line`, returns True for ending the session"""
+        try:
+            args = shlex.split(line)
+        except ValueError as error:
+            print(f"error: {error}", file=sys.stderr)
+            return False
+        if not args:
+            return False
+        subcommands = self.command.subcommands
+        if args[0] in ('exit', 'quit', 'EOF') and args[0] not in subcommands:
+            if args[0] == 'EOF':
+                print(file=self.stdout)
+            return True
+        if args[0] == 'help' and 'help' not in subcommands:
+            args = args[1:] + ['--help']
+        self.run(args)
+        return False
+
+    def run(self, args: List[str]) -> None:
+        """parses and dispatches `args`, printing the result"""
+        command = self.command
+        try:
+            parser, namespace = command.parse(args)
+            result = command.dispatch(parser, namespace, self.session)
+            if command.formatted(result):
+                # the sink writes the records, the count is not shown
+                command.output(namespace, result, self.stdout)
+            elif inspect.isgenerator(result):
+                for item in result:
+                    print(item, file=self.stdout)
+            elif result is not None:
+                print(result, file=self.stdout)
+        except SystemExit:
+            # errors and help of argparse
+            pass
+        except Exception:
+            traceback.print_exc()
+
+    def candidates(self, words: List[str]) -> List[str]:
+        """subcommands and options of the (sub)parser `words` lead to"""
+        parser = self.command.parser
+        for word in words:
+            subparsers = subparsers_action(parser)
+            if subparsers is not None and word in subparsers.choices:
+                parser = subparsers.choices[word]
+        subparsers = subparsers_action(parser)
+        names = list(subparsers.choices) if subparsers is not None else []
+        return names + list(parser._option_string_actions)
+
+    def completenames(self, text: str, *ignored) -> List[str]:
+        return sorted(candidate for candidate in self.candidates([])
+                      if candidate.startswith(text))
+
+    def completedefault(self, text: str, line: str, begidx: int,
+                        endidx: int) -> List[str]:
+        try:
+            words = shlex.split(line[:begidx])
+        except ValueError:
+            return []
+        return sorted(candidate for candidate in self.candidates(words)
+                      if candidate.startswith(text))
+
+    complete_help = completedefault
+
+
+def subparsers_action(parser):
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return action
+    return None
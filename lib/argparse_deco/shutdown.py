@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""shutdown.py: Graceful shutdown and cooperative cancellation"""
+
+import os
+import signal
+import sys
+import threading
+import traceback
+from typing import Callable, Optional
+
+__all__ = ('Cancelled', 'CancellationToken', 'Shutdown', 'current')
+
+SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+# tokens of the installed handlers, innermost last
+_active = []
+
+
+class Cancelled(Exception):
+    """Raised by `CancellationToken.check` after a shutdown request"""
+
+
+class CancellationToken:
+    """Set once a shutdown was requested by a signal. Commands receive
+    it by annotating a parameter with `CancellationToken` and check it
+    between units of work, so in-flight work is finished."""
+
+    __slots__ = ('event', 'signum', 'callbacks', 'lock')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.signum = None
+        self.callbacks = []
+        self.lock = threading.RLock()
+
+    def __repr__(self) -> str:
+        state = f"signum={self.signum}" if self.cancelled else "active"
+        return f"<{type(self).__name__} {state}>"
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    @property
+    def exit_code(self) -> int:
+        """the exit code after the shutdown, e.g. 130 for SIGINT"""
+        return 128 + (self.signum or signal.SIGTERM)
+
+    def cancel(self, signum: int=None) -> None:
+        """requests the shutdown and calls the callbacks (once)"""
+        with self.lock:
+            if self.cancelled:
+                return
+            self.signum = signum
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                traceback.print_exc()
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """calls `callback` on cancellation (now if already cancelled)"""
+        with self.lock:
+            if not self.cancelled:
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def check(self) -> None:
+        """raises `Cancelled` after a shutdown request"""
+        if self.cancelled:
+            raise Cancelled(self.signum)
+
+    def wait(self, timeout: float=None) -> bool:
+        """sleeps up to `timeout` seconds, returns whether cancelled"""
+        return self.event.wait(timeout)
+
+    @classmethod
+    def lookup(cls, parameter) -> bool:
+        """whether `parameter` is annotated to receive the token"""
+        annotation = parameter.annotation
+        return annotation is cls or isinstance(annotation, cls)
+
+
+def current() -> Optional[CancellationToken]:
+    """the token of the innermost running `Shutdown`, if any"""
+    return _active[-1] if _active else None
+
+
+def cancellations() -> tuple:
+    """exceptions ending work after a shutdown request; asyncio's is
+    only raised if asyncio was imported"""
+    asyncio = sys.modules.get('asyncio')
+    if asyncio is None:
+        return KeyboardInterrupt, Cancelled
+    return KeyboardInterrupt, Cancelled, asyncio.CancelledError
+
+
+def cancel_tasks() -> None:
+    """cancels the tasks of an event loop running in this thread"""
+    asyncio = sys.modules.get('asyncio')
+    if asyncio is None:
+        # no event loop can be running
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    def cancel():
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+    loop.call_soon_threadsafe(cancel)
+
+
+class Shutdown:
+    """Installs handlers of SIGINT and SIGTERM (in the main thread)
+    which cancel the token, running asyncio tasks and the callbacks,
+    e.g. of pending work of executors. After `grace` seconds (or a
+    second signal) `KeyboardInterrupt` is raised in the main thread."""
+
+    def __init__(self, grace: float=None):
+        self.grace = grace
+        self.token = CancellationToken()
+        self.previous = {}
+        self.timer = None
+
+    def __enter__(self) -> CancellationToken:
+        if threading.current_thread() is threading.main_thread():
+            for signum in SIGNALS:
+                self.previous[signum] = signal.signal(signum, self.handle)
+        _active.append(self.token)
+        return self.token
+
+    def __exit__(self, *exc_info):
+        _active.remove(self.token)
+        if self.timer is not None:
+            self.timer.cancel()
+        for signum, handler in self.previous.items():
+            signal.signal(signum, handler)
+        self.previous.clear()
+
+    def handle(self, signum: int, frame) -> None:
+        token = self.token
+        if token.cancelled:
+            # a second signal or the end of the grace period
+            raise KeyboardInterrupt
+        token.cancel(signum)
+        cancel_tasks()
+        if self.grace is not None:
+            self.timer = threading.Timer(
+                self.grace, os.kill, (os.getpid(), signal.SIGINT))
+            self.timer.daemon = True
+            self.timer.start()
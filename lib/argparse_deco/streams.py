@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""streams.py: Bulk reading of records from files"""
+
+import mmap
+import os
+import sys
+from typing import Any, Callable, Iterator, List, Union
+
+__all__ = ('iter_records', 'ResponseFile', 'Responses', 'RecordStream')
+
+# files of at least this size are mapped instead of read at once
+MMAP_THRESHOLD = 1 << 20
+
+# initial size of the buffer of `RecordStream`
+BUFFER_SIZE = 1 << 20
+
+
+def split_records(data, delimiter: bytes=None) -> Iterator[str]:
+    """yields the delimited records of the buffer `data`
+
+    Without a `delimiter`, records are separated by NUL bytes if
+    there are any, else by newlines."""
+    if delimiter is None:
+        delimiter = b'\0' if data.find(b'\0') >= 0 else b'\n'
+    crlf = delimiter == b'\n'
+    start = 0
+    end = len(data)
+    while start < end:
+        stop = data.find(delimiter, start)
+        if stop < 0:
+            stop = end
+        record = data[start:stop]
+        if crlf and record.endswith(b'\r'):
+            record = record[:-1]
+        if record:
+            yield os.fsdecode(record)
+        start = stop + len(delimiter)
+
+
+def iter_records(path: Union[str, os.PathLike],
+                 delimiter: bytes=None) -> Iterator[str]:
+    """lazily yields the records of the file `path`
+
+    Small files are read with a single call, large ones are mapped into
+    memory, so no intermediate list of lines is ever built."""
+    with open(path, 'rb') as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            yield from split_records(fp.read(), delimiter)
+        else:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield from split_records(data, delimiter)
+
+
+class ResponseFile:
+    """A file whose records are arguments, converted by `convert` and
+    checked against `choices` (if given) while iterating"""
+
+    __slots__ = ('path', 'delimiter', 'convert', 'choices')
+
+    def __init__(self, path: str, delimiter: bytes=None,
+                 convert: Callable[[str], Any]=None, choices=None):
+        self.path = path
+        self.delimiter = delimiter
+        self.convert = convert
+        self.choices = choices
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.path!r})"
+
+    def __iter__(self) -> Iterator:
+        records = iter_records(self.path, self.delimiter)
+        if self.convert is None and self.choices is None:
+            return records
+        return self.checked(records)
+
+    def checked(self, records: Iterator[str]) -> Iterator:
+        convert = self.convert
+        choices = self.choices
+        for record in records:
+            value = record
+            if convert is not None:
+                try:
+                    value = convert(record)
+                except (TypeError, ValueError):
+                    name = getattr(convert, '__name__', repr(convert))
+                    raise ValueError(f"invalid {name} value {record!r} "
+                                     f"in {self.path}") from None
+            if choices is not None and value not in choices:
+                raise ValueError(f"invalid choice {value!r} in {self.path}")
+            yield value
+
+
+class Responses:
+    """Lazy sequence of literal values and response files"""
+
+    __slots__ = ('sources',)
+
+    def __init__(self, sources: tuple=()):
+        self.sources = tuple(sources)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self.sources)!r})"
+
+    def __add__(self, sources):
+        return type(self)(self.sources + tuple(sources))
+
+    def __iter__(self) -> Iterator[str]:
+        for source in self.sources:
+            if isinstance(source, ResponseFile):
+                yield from source
+            else:
+                yield source
+
+
+class RecordStream:
+    """Lazy iterable of batches (lists) of up to `batch_size` records
+    of the file `path` (`-` for standard input): the bytes ending with
+    `delimiter` (without it) or, with `size`, chunks of `size` bytes.
+
+    The file is read by `readinto` into a single reusable buffer, which
+    only grows for records longer than it, and split into records once
+    per read, so memory stays bounded by the buffer and a batch."""
+
+    __slots__ = ('path', 'delimiter', 'size', 'batch_size', 'buffer_size')
+
+    def __init__(self, path: str, delimiter: bytes=b'\n', size: int=None,
+                 batch_size: int=1024, buffer_size: int=BUFFER_SIZE):
+        if not delimiter and size is None:
+            raise ValueError("Either delimiter or size is needed")
+        if size is not None and size < 1 or batch_size < 1:
+            raise ValueError("Sizes must be positive")
+        self.path = path
+        self.delimiter = delimiter
+        self.size = size
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+
+    def __repr__(self) -> str:
+        split = f"size={self.size}" if self.size \
+            else f"delimiter={self.delimiter!r}"
+        return f"{type(self).__name__}({self.path!r}, {split})"
+
+    def __iter__(self) -> Iterator[List[bytes]]:
+        if self.path == '-':
+            fp = sys.stdin.buffer
+        else:
+            fp = open(self.path, 'rb', buffering=0)
+        try:
+            if self.size:
+                yield from self.batches(self.chunks(fp))
+            else:
+                yield from self.batches(self.delimited(fp))
+        finally:
+            if fp is not sys.stdin.buffer:
+                fp.close()
+
+    def records(self) -> Iterator[bytes]:
+        """the records one by one"""
+        for batch in self:
+            yield from batch
+
+    def batches(self, pieces: Iterator[List[bytes]]):
+        batch_size = self.batch_size
+        batch = []
+        for records in pieces:
+            if batch:
+                missing = batch_size - len(batch)
+                batch.extend(records[:missing])
+                if len(batch) < batch_size:
+                    continue
+                yield batch
+                records = records[missing:]
+            full = len(records) - len(records) % batch_size
+            for start in range(0, full, batch_size):
+                yield records[start:start + batch_size]
+            batch = records[full:]
+        if batch:
+            yield batch
+
+    def delimited(self, fp) -> Iterator[List[bytes]]:
+        delimiter = self.delimiter
+        crlf = delimiter == b'\n'
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        filled = 0
+        while True:
+            if filled == len(buffer):
+                # a record longer than the buffer
+                view.release()
+                buffer.extend(bytes(len(buffer)))
+                view = memoryview(buffer)
+            count = fp.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+            end = buffer.rfind(delimiter, 0, filled)
+            if end < 0:
+                continue
+            data = bytes(view[:end])
+            if crlf and b'\r' in data:
+                data = data.replace(b'\r\n', b'\n')
+                if data.endswith(b'\r'):
+                    data = data[:-1]
+            end += len(delimiter)
+            rest = filled - end
+            buffer[:rest] = bytes(view[end:filled])
+            filled = rest
+            yield data.split(delimiter)
+        if filled:
+            record = bytes(view[:filled])
+            if crlf and record.endswith(b'\r'):
+                record = record[:-1]
+            yield [record]
+
+    def chunks(self, fp) -> Iterator[List[bytes]]:
+        size = self.size
+        buffer = bytearray(max(size, self.buffer_size // size * size))
+        view = memoryview(buffer)
+        filled = 0
+        while True:
+            count = fp.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+            end = filled - filled % size
+            yield [bytes(view[start:start + size])
+                   for start in range(0, end, size)]
+            rest = filled - end
+            buffer[:rest] = bytes(view[end:filled])
+            filled = rest
+        if filled:
+            yield [bytes(view[:filled])]
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""suggest.py: Did-you-mean suggestions for mistyped subcommands"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+__all__ = ('distance', 'NGramIndex')
+
+
+def distance(a: str, b: str, limit: int=None) -> int:
+    """Damerau-Levenshtein distance (optimal string alignment) of `a`
+    and `b`, i.e. transposed characters count as a single typo.
+    Exceeding `limit` stops early returning `limit + 1`."""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is None:
+        limit = len(a)
+    elif len(a) - len(b) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        append = current.append
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1,
+                       previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def ngrams(word: str, n: int=3) -> set:
+    """the set of (padded) n-grams of `word`"""
+    padded = f"{'^' * (n - 1)}{word}$"
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NGramIndex:
+    """Inverted trigram index of words. A lookup only compares the few
+    words sharing most trigrams with a mistyped word instead of all."""
+
+    __slots__ = ('postings', 'words')
+
+    # n-grams contained in more than this share of all words are too
+    # common to narrow down the candidates
+    COMMON = 0.1
+    CANDIDATES = 16
+
+    def __init__(self, words: Iterable[str]=()):
+        self.postings: Dict[str, List[str]] = defaultdict(list)
+        self.words = set()
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def add(self, word: str) -> None:
+        if word not in self.words:
+            self.words.add(word)
+            for ngram in ngrams(word):
+                self.postings[ngram].append(word)
+
+    def candidates(self, word: str) -> List[str]:
+        """words sharing most n-grams with `word`, best first"""
+        postings = [self.postings[ngram] for ngram in ngrams(word)
+                    if ngram in self.postings]
+        postings.sort(key=len)
+        limit = max(self.CANDIDATES, int(len(self.words) * self.COMMON))
+        counts = defaultdict(int)
+        for posting in postings:
+            if len(posting) > limit and counts:
+                break
+            for candidate in posting:
+                counts[candidate] += 1
+        return sorted(counts, key=counts.__getitem__,
+                      reverse=True)[:self.CANDIDATES]
+
+    def suggest(self, word: str, limit: int=3) -> List[str]:
+        """the `limit` closest words to a mistyped `word`"""
+        tolerance = 1 if len(word) <= 4 else 2 if len(word) <= 8 else 3
+        scored = sorted((distance(word, candidate, tolerance), candidate)
+                        for candidate in self.candidates(word))
+        return [candidate for d, candidate in scored[:limit]
+                if d <= tolerance]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""testing.py: In-process invocation of commands for test suites"""
+
+import contextlib
+import io
+import os
+import sys
+from typing import Dict, Optional, Union
+
+__all__ = ('Result', 'captured')
+
+
+class Result:
+    """Outcome of `Command.invoke`"""
+
+    __slots__ = ('exit_code', 'value', 'exception', 'stdout_bytes',
+                 'stderr_bytes')
+
+    def __init__(self):
+        self.exit_code = 0
+        self.value = None
+        self.exception = None
+        self.stdout_bytes = b''
+        self.stderr_bytes = b''
+
+    def __repr__(self) -> str:
+        exception = f" {self.exception!r}" if self.exception else ""
+        return f"<{type(self).__name__} exit_code={self.exit_code}" \
+            f"{exception}>"
+
+    @property
+    def stdout(self) -> str:
+        return self.stdout_bytes.decode('utf-8', 'replace')
+
+    @property
+    def stderr(self) -> str:
+        return self.stderr_bytes.decode('utf-8', 'replace')
+
+
+def stream(data: bytes=b'') -> io.TextIOWrapper:
+    """a text stream with a binary `buffer`, like the standard streams"""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8',
+                            write_through=True)
+
+
+@contextlib.contextmanager
+def captured(env: Dict[str, Optional[str]]=None,
+             stdin: Union[str, bytes]=None):
+    """Replaces the standard streams and updates the environment
+    (`None` values unset variables) for the duration of the context.
+    Yields a `Result` receiving the captured output."""
+    result = Result()
+    if isinstance(stdin, str):
+        stdin = stdin.encode('utf-8')
+    streams = (sys.stdin, sys.stdout, sys.stderr)
+    sys.stdin = stream(stdin or b'')
+    sys.stdout = stdout = stream()
+    sys.stderr = stderr = stream()
+    saved = {}
+    for name, value in (env or {}).items():
+        saved[name] = os.environ.get(name)
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    try:
+        yield result
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = streams
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        result.stdout_bytes = stdout.buffer.getvalue()
+        result.stderr_bytes = stderr.buffer.getvalue()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""vectors.py: Compact numeric vector and range arguments"""
+
+import argparse
+import array
+import re
+from typing import Callable, Union
+
+__all__ = ('vector_type', 'ranges_type', 'VectorAction', 'check_typecode')
+
+INTEGER_TYPECODES = 'bBhHiIlLqQ'
+FLOAT_TYPECODES = 'fd'
+
+# an integer or a range FIRST-LAST[:STEP], both bounds may be negative
+RANGE = re.compile(r'\s*([-+]?\d+)(?:-([-+]?\d+)(?::(\d+))?)?\s*$')
+
+
+def check_typecode(typecode: str) -> str:
+    """`typecode` of `Vector` and `Ranges`, see `array.array`"""
+    if typecode not in INTEGER_TYPECODES + FLOAT_TYPECODES:
+        raise ValueError(f"Unknown typecode {typecode!r}")
+    return typecode
+
+
+def vector_type(typecode: str='d') -> Callable[[str], array.array]:
+    """argument type converting comma separated numbers into an
+    `array.array` of `typecode`"""
+    convert = int if typecode in INTEGER_TYPECODES else float
+
+    def vector(text: str) -> array.array:
+        try:
+            return array.array(typecode,
+                               map(convert, filter(None, text.split(','))))
+        except OverflowError as error:
+            raise ValueError(text) from error
+    return vector
+
+
+def ranges_type(typecode: str='q') -> Callable[[str], Union[range,
+                                                             array.array]]:
+    """argument type converting comma separated integers and inclusive
+    ranges `FIRST-LAST[:STEP]` (e.g. `1-100000:2,5,9` or `-5--1`) into
+    a lazy `range` if it is a single range, otherwise an `array.array`
+    of `typecode`"""
+    def ranges(text: str) -> Union[range, array.array]:
+        parts = [parse_range(part) for part in text.split(',') if part]
+        if len(parts) == 1 and isinstance(parts[0], range):
+            return parts[0]
+        values = array.array(typecode)
+        try:
+            for part in parts:
+                if isinstance(part, range):
+                    values.extend(part)
+                else:
+                    values.append(part)
+        except OverflowError as error:
+            raise ValueError(text) from error
+        return values
+    return ranges
+
+
+def parse_range(text: str) -> Union[int, range]:
+    """an item of `ranges_type`: an integer or an inclusive range"""
+    match = RANGE.match(text)
+    if match is None:
+        raise ValueError(text)
+    first, last, step = match.groups()
+    if last is None:
+        return int(first)
+    step = int(step) if step else 1
+    if step < 1:
+        raise ValueError(text)
+    first, last = int(first), int(last)
+    return range(first, last + 1 if last >= first else last - 1,
+                 step if last >= first else -step)
+
+
+class VectorAction(argparse.Action):
+    """Stores a vector, concatenating the vectors of several values
+    or occurrences of the option into one `array.array`"""
+
+    def __init__(self, *args, typecode: str='d', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.typecode = typecode
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        if isinstance(values, list):
+            if len(values) == 1:
+                values = values[0]
+            else:
+                values = self.concat(None, values)
+        previous = getattr(namespace, self.dest, None)
+        if previous is not None and previous is not self.default:
+            values = self.concat(previous, (values,))
+        setattr(namespace, self.dest, values)
+
+    def concat(self, previous, vectors) -> array.array:
+        if isinstance(previous, array.array):
+            result = previous
+        else:
+            result = array.array(self.typecode, previous or ())
+        for vector in vectors:
+            result.extend(vector if isinstance(vector, array.array)
+                          else array.array(self.typecode, vector))
+        return result
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+#
+"""watch.py: Re-running commands when watched files change"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Iterable, Optional, Set
+
+__all__ = ('Changes', 'Watcher', 'Inotify', 'Polling')
+
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+           | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+
+EVENT = struct.Struct('iIII')
+
+
+class Changes:
+    """Annotates the parameter receiving the set of changed paths when
+    a command is re-run by `--watch` (None for the first run)"""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return type(self).__name__
+
+    @classmethod
+    def lookup(cls, parameter) -> bool:
+        """whether `parameter` is annotated to receive changes"""
+        annotation = parameter.annotation
+        return annotation is cls or isinstance(annotation, cls)
+
+
+def walk(paths: Iterable[str]):
+    """`(path, is_directory)` of `paths` and everything below them"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, files in os.walk(path):
+                yield root, True
+                for name in files:
+                    yield os.path.join(root, name), False
+        else:
+            yield path, False
+
+
+class Polling:
+    """Detects changes by comparing modification times and sizes
+    every `interval` seconds"""
+
+    def __init__(self, paths: Iterable[str], interval: float=0.5):
+        self.paths = tuple(paths)
+        self.interval = interval
+        self.state = self.scan()
+
+    def scan(self) -> dict:
+        state = {}
+        for path, is_directory in walk(self.paths):
+            if not is_directory:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = stat.st_mtime_ns, stat.st_size
+        return state
+
+    def read(self, timeout: float=None) -> Set[str]:
+        """changed paths after waiting the polling interval
+        (or less than `timeout` seconds)"""
+        time.sleep(self.interval if timeout is None
+                   else min(timeout, self.interval))
+        state = self.scan()
+        previous, self.state = self.state, state
+        return {path for path in previous.keys() | state.keys()
+                if previous.get(path) != state.get(path)}
+
+    def close(self) -> None:
+        pass
+
+
+class Inotify:
+    """Linux inotify(7) watches on the (parent) directories of `paths`,
+    accessed through ctypes. Watches use absolute paths, changes are
+    reported relative to the paths as given."""
+
+    def __init__(self, paths: Iterable[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.watches = {}
+        # absolute paths mapped to the paths as given
+        self.files = {}
+        self.directories = []
+        for path in paths:
+            absolute = os.path.abspath(path)
+            if os.path.isdir(path):
+                self.directories.append((os.path.join(absolute, ''), path))
+                for directory, is_directory in walk((absolute,)):
+                    if is_directory:
+                        self.add(directory)
+            else:
+                self.files[absolute] = path
+                self.add(os.path.dirname(absolute))
+
+    def add(self, directory: str) -> None:
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), IN_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        self.watches[wd] = directory
+
+    def given(self, path: str) -> Optional[str]:
+        """the absolute `path` relative to the paths as given, None if
+        it is not watched"""
+        if path in self.files:
+            return self.files[path]
+        for prefix, directory in self.directories:
+            if path.startswith(prefix):
+                return os.path.join(directory, path[len(prefix):])
+        return None
+
+    def read(self, timeout: float=None) -> Set[str]:
+        """changed paths within `timeout` seconds (or forever)"""
+        if not select.select((self.fd,), (), (), timeout)[0]:
+            return set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return set()
+        changes = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) \
+                if name else directory
+            given = self.given(path)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and given is not None:
+                    self.add(path)
+                continue
+            if given is not None:
+                changes.add(given)
+        return changes
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class Watcher:
+    """Waits for changes of files below `paths`, collecting them until
+    nothing changed for `debounce` seconds. Uses inotify where
+    available and polling otherwise."""
+
+    def __init__(self, paths: Iterable[str], debounce: float=0.1,
+                 interval: float=0.5, polling: bool=False):
+        paths = tuple(paths)
+        self.debounce = debounce
+        self.source = None
+        if not polling and sys.platform.startswith('linux'):
+            try:
+                self.source = Inotify(paths)
+            except (OSError, AttributeError, TypeError):
+                pass
+        if self.source is None:
+            self.source = Polling(paths, interval)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def wait(self, timeout: float=None) -> Optional[frozenset]:
+        """the changed paths (None if nothing changed within `timeout`)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changes = set()
+        while not changes:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+            changes = self.source.read(remaining)
+        quiet = time.monotonic() + self.debounce
+        while True:
+            remaining = quiet - time.monotonic()
+            if remaining <= 0:
+                return frozenset(changes)
+            more = self.source.read(remaining)
+            if more:
+                changes |= more
+                quiet = time.monotonic() + self.debounce
+
+    def close(self) -> None:
+        self.source.close()
@@ -17,9 +17,16 @@
 # You should have received a copy of the GNU General Public License
 # along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
 
+import array
+import sys
+
 import pytest
 
-from argparse_deco.arguments import Arg, Flag, Append, Count
+import argparse
+
+from argparse_deco.arguments import Arg, Flag, Append, Count, Response, \
+    Vector, Ranges, Records
+from argparse_deco.streams import Responses, RecordStream
 
 
 _marker = object()
@@ -37,6 +44,13 @@ class TestArg:
         assert arg.name_or_flags == (34, 23)
         assert arg.kwargs == dict(foo=21, bar=100)
 
+    def test__init__interns(self):
+        flag = ''.join(['--', 'interned'])
+        text = ''.join(['help ', 'text'])
+        arg = Arg(flag, help=text)
+        assert arg.name_or_flags[0] is sys.intern('--interned')
+        assert arg.kwargs['help'] is sys.intern('help text')
+
     def test__call__(self):
         arg = Arg(34, 23, foo=21, bar=100)
         assert arg(3, 7, bar=3, baz=10) is arg
@@ -47,6 +61,16 @@ class TestArg:
         arg = Arg(34, 23, foo=21, bar=100)
         assert repr(arg) == "Arg(34, 23, foo=21, bar=100)"
         assert repr(Arg['foo']) == "Arg['foo']()"
+        assert repr(Arg('--x', fanout=True)) == "Arg('--x', fanout=True)"
+
+    def test_fanout(self):
+        assert Arg().fanout is False
+        arg = Arg('--host', action='append', fanout='process')
+        assert (arg.fanout, arg.kwargs) == ('process', dict(action='append'))
+        assert arg(fanout=True).fanout is True
+        assert 'fanout' not in arg.kwargs
+        with pytest.raises(ValueError):
+            Arg(fanout='bogus')
 
     def test_apply(self, mocker):
         class Parser:
@@ -116,3 +140,89 @@ class TestCount:
         mock_add_argument.assert_called_once_with(
             34, 23, action='count',
             foo=21, bar=100, dest='bogus')
+
+
+class TestResponse:
+
+    def test_apply(self, tmp_path):
+        path = tmp_path / "paths.txt"
+        path.write_text("b\nc\n")
+        parser = argparse.ArgumentParser()
+        Response(help="paths").apply(parser, 'paths')
+        Response('--extra').apply(parser, 'extra', ('z',))
+        namespace = parser.parse_args(['a', f'@{path}'])
+        assert isinstance(namespace.paths, Responses)
+        assert list(namespace.paths) == ['a', 'b', 'c']
+        assert list(namespace.extra) == ['z']
+
+        namespace = parser.parse_args(
+            ['--extra', 'x', '--extra', f'@{path}'])
+        assert list(namespace.paths) == []
+        assert list(namespace.extra) == ['z', 'x', 'b', 'c']
+
+    def test_type_choices(self, tmp_path, capsys):
+        path = tmp_path / "ids.txt"
+        path.write_text("2\n3\n")
+        parser = argparse.ArgumentParser()
+        Response(type=int, choices=range(5)).apply(parser, 'ids')
+        namespace = parser.parse_args(['1', f'@{path}'])
+        assert list(namespace.ids) == [1, 2, 3]
+        path.write_text("4\nx\n")
+        with pytest.raises(ValueError, match="invalid int value 'x'"):
+            list(namespace.ids)
+        path.write_text("7\n")
+        with pytest.raises(ValueError, match="invalid choice 7"):
+            list(namespace.ids)
+        for args in (['x'], ['9'], [f'@{tmp_path / "missing"}']):
+            with pytest.raises(SystemExit):
+                parser.parse_args(args)
+        err = capsys.readouterr().err
+        assert "invalid int value: 'x'" in err
+        assert "invalid choice: 9" in err
+        assert "can't read response file" in err
+
+
+class TestRecords:
+
+    def test_apply(self, tmp_path):
+        path = tmp_path / "records"
+        path.write_bytes(b"a\0b\0c")
+        parser = argparse.ArgumentParser()
+        Records(delimiter=b'\0')(batch_size=2).apply(parser, 'records')
+        Records('--chunks', size=2).apply(parser, 'chunks', '-')
+        namespace = parser.parse_args([str(path)])
+        assert isinstance(namespace.records, RecordStream)
+        assert list(namespace.records) == [[b'a', b'b'], [b'c']]
+        assert namespace.chunks.path == '-'
+        assert namespace.chunks.size == 2
+
+
+class TestVector:
+
+    def test__call__(self):
+        vector = Vector['weights']('--weights', typecode='f', help="w")
+        assert (vector.group, vector.typecode) == ('weights', 'f')
+        assert vector.kwargs == dict(help="w")
+        with pytest.raises(ValueError):
+            Vector(typecode='x')
+
+    def test_apply(self):
+        parser = argparse.ArgumentParser()
+        Vector('--weights', nargs='+').apply(parser, 'weights')
+        Ranges('--ids').apply(parser, 'ids', range(3))
+        namespace = parser.parse_args([])
+        assert namespace.weights is None and namespace.ids == range(3)
+        namespace = parser.parse_args(
+            ['--weights', '0.5,1', '2', '--ids', '1-100000:2'])
+        assert namespace.weights == array.array('d', [0.5, 1, 2])
+        assert namespace.ids == range(1, 100001, 2)
+        namespace = parser.parse_args(['--ids', '1-3', '--ids', '7,9'])
+        assert namespace.ids == array.array('q', [1, 2, 3, 7, 9])
+        # negative leading values have to be attached to the option
+        namespace = parser.parse_args(['--weights=-0.5,0.2', '--ids=1,-3'])
+        assert namespace.weights == array.array('d', [-0.5, 0.2])
+        assert namespace.ids == array.array('q', [1, -3])
+        namespace = parser.parse_args(['--ids', '1,-3'])
+        assert namespace.ids == array.array('q', [1, -3])
+        with pytest.raises(SystemExit):
+            parser.parse_args(['--weights', '-0.5,0.2'])
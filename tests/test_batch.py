@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import json
+
+import pytest
+
+from argparse_deco.batch import (
+    Journal, Positions, ResultWriter, Shard, iter_lines, merge_shards, shard)
+
+
+class TestShard:
+
+    def test_init(self):
+        assert str(Shard(2, 8)) == '2-of-8'
+        with pytest.raises(ValueError):
+            Shard(8, 8)
+
+    @pytest.mark.parametrize('hashed', [False, True])
+    def test_selects(self, hashed):
+        lines = [f"line {i}".encode() for i in range(1000)]
+        shares = [[position for position, line in enumerate(lines)
+                   if Shard(index, 4, hashed).selects(position, line)]
+                  for index in range(4)]
+        assert sorted(sum(shares, [])) == list(range(1000))
+        assert all(150 < len(share) < 350 for share in shares)
+        if not hashed:
+            assert shares[1][:3] == [1, 5, 9]
+
+
+def test_shard():
+    assert (shard('1/3').index, shard('1/3').count) == (1, 3)
+    for text in ('3', '3/3', 'a/b'):
+        with pytest.raises(ValueError):
+            shard(text)
+
+
+def test_iter_lines(tmp_path):
+    path = tmp_path / 'batch'
+    path.write_bytes(b"a 1\r\n\n  \nb 2\nc 3\nd 4")
+    assert list(iter_lines(str(path))) == \
+        [(0, 'a 1'), (3, 'b 2'), (4, 'c 3'), (5, 'd 4')]
+    assert list(iter_lines(str(path), Shard(1, 2))) == [(3, 'b 2'), (5, 'd 4')]
+
+
+def test_result_writer(tmp_path):
+    path = tmp_path / 'results'
+    with ResultWriter(str(path)) as writer:
+        writer.write(0, [1, 2])
+        writer.write(3, error=ValueError("bad"))
+        writer.write(4, error=SystemExit(2))
+    assert (writer.count, writer.errors) == (3, 2)
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [
+        dict(item=0, result=[1, 2]), dict(item=3, error="ValueError: bad"),
+        dict(item=4, error="exit status 2")]
+    with ResultWriter(str(path), append=True) as writer:
+        writer.write(5, object)
+    assert len(path.read_text().splitlines()) == 4
+
+
+def test_positions():
+    positions = Positions()
+    for position in (0, 7, 8, 100000, 7):
+        positions.add(position)
+    assert len(positions) == 4
+    assert [position in positions for position in (0, 1, 8, 100000, 10**9)] \
+        == [True, False, True, True, False]
+    assert len(positions.bits) < 20000
+
+
+def test_journal(tmp_path):
+    path = tmp_path / 'journal'
+    results = tmp_path / 'results'
+    with Journal(str(path), str(results), sync_every=2) as journal, \
+            ResultWriter(str(results)) as writer:
+        assert not journal.resumed
+        writer.write(0, 'a')
+        assert not journal.record(0, offset=writer.offset)
+        writer.write(2, error=ValueError())
+        assert journal.record(2, True, writer.offset)
+        # records only reach the journal file when synced
+        assert path.read_text() == ''
+        writer.sync()
+        journal.sync()
+        assert journal.pending == []
+    size = results.stat().st_size
+    first = len(results.read_text().splitlines()[0]) + 1
+    assert path.read_text() == f"0 done {first}\n2 failed {size}\n"
+    # an interrupted run left an unjournaled result and a torn record
+    with open(results, 'a') as fp:
+        fp.write('{"item": 3, "result": "c"}\n{"item"')
+    with open(path, 'a') as fp:
+        fp.write('3 do')
+    journal = Journal(str(path), str(results))
+    assert journal.resumed and journal.offset == size
+    assert (0 in journal.completed, 2 in journal.completed,
+            3 in journal.completed) == (True, True, False)
+    assert path.read_text().endswith('failed %d\n' % size)
+    journal.truncate()
+    assert results.stat().st_size == size
+
+
+def test_journal_beyond_results(tmp_path):
+    path = tmp_path / 'journal'
+    results = tmp_path / 'results'
+    results.write_text('{"item": 0, "result": 1}\n')
+    size = results.stat().st_size
+    path.write_text(f"0 done {size}\n1 done {size + 25}\n2 done 99\n")
+    journal = Journal(str(path), str(results))
+    # results of the later records were lost, they are run again
+    assert (0 in journal.completed, 1 in journal.completed) == (True, False)
+    assert path.read_text() == f"0 done {size}\n"
+    results.write_text('')
+    journal.truncate()
+    assert results.stat().st_size == 0
+    assert not Journal(str(path), str(tmp_path / 'missing')).resumed
+
+
+def test_merge_shards(tmp_path):
+    paths = []
+    for index in range(3):
+        paths.append(str(tmp_path / f"results-{index}"))
+        with ResultWriter(paths[-1]) as writer:
+            for position in range(index, 10, 3):
+                writer.write(position, position * 2)
+    output = tmp_path / 'merged'
+    assert merge_shards(paths, str(output)) == 10
+    assert [json.loads(line)['result'] for line
+            in output.read_text().splitlines()] == list(range(0, 20, 2))
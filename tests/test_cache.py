@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import pathlib
+import pickle
+
+import pytest
+
+from argparse_deco.cache import ResultCache, fingerprint
+
+
+def test_fingerprint(tmp_path):
+    path = tmp_path / "input.txt"
+    assert fingerprint(path) == 'missing'
+    path.write_text("foo")
+    mtime = fingerprint(path)
+    content = fingerprint(path, 'content')
+    os.utime(path, ns=(0, 0))
+    assert fingerprint(path) != mtime
+    assert fingerprint(path, 'content') == content
+    directory = fingerprint(tmp_path)
+    (tmp_path / "other.txt").write_text("bar")
+    assert fingerprint(tmp_path) != directory
+
+
+class TestResultCache:
+
+    def test__init__(self):
+        with pytest.raises(ValueError):
+            ResultCache(fingerprint='bogus')
+        assert repr(ResultCache('dir', '1K')) == \
+            "ResultCache('dir', max_size=1024, fingerprint='mtime')"
+
+    def test_key(self, tmp_path):
+        def foo():
+            pass
+        cache = ResultCache(str(tmp_path))
+        key = cache.key(foo, dict(a=1, b=['x', 2.0]))
+        assert key == cache.key(foo, dict(b=['x', 2.0], a=1))
+        assert key != cache.key(foo, dict(a=1, b=['x', 3.0]))
+        assert cache.key(foo, dict(a=object())) is None
+
+        path = tmp_path / "input.txt"
+        path.write_text("foo")
+        key = cache.key(foo, dict(paths=[pathlib.Path(path)]))
+        os.utime(path, ns=(0, 0))
+        assert cache.key(foo, dict(paths=[pathlib.Path(path)])) != key
+
+    def test_get_put(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        with pytest.raises(KeyError):
+            cache.get('abcd')
+        assert cache.put('abcd', None)
+        assert cache.get('abcd') is None
+        assert cache.put('abce', dict(foo=[1, 2]))
+        assert cache.get('abce') == dict(foo=[1, 2])
+        assert not cache.put('abcf', (i for i in ()))
+        cache.clear()
+        with pytest.raises(KeyError):
+            cache.get('abce')
+
+    def test_evict(self, tmp_path):
+        cache = ResultCache(str(tmp_path), max_size=None)
+        for i, key in enumerate(('aa01', 'aa02', 'bb03')):
+            cache.put(key, b'x' * 1000)
+            os.utime(cache.filename(key), ns=(i, i))
+        cache.max_size = 2500
+        cache.get('aa01')
+        cache.put('bb04', b'x' * 1000)
+        keys = sorted(os.path.basename(filename)[:4]
+                      for mtime, size, filename in cache.entries())
+        assert keys == ['aa01', 'bb04']
+
+    def test_size_estimate(self, tmp_path, mocker):
+        cache = ResultCache(str(tmp_path), max_size=10000)
+        entry = len(pickle.dumps(b'x' * 1000, pickle.HIGHEST_PROTOCOL))
+        entries = mocker.spy(ResultCache, 'entries')
+        cache.put('aa01', b'x' * 1000)
+        # the first write scans once, later ones only add their size
+        assert entries.call_count == 1 and cache.size() == entry
+        for i in range(2, 9):
+            cache.put(f'aa0{i}', b'x' * 1000)
+        cache.put('aa01', b'x' * 1000)
+        assert entries.call_count == 1 and cache.size() == 8 * entry
+        # crossing max_size evicts down to the low water mark
+        cache.max_size = 8 * entry - 1
+        cache.put('bb09', b'x' * 1000)
+        assert entries.call_count == 2
+        assert len(list(cache.entries())) == 7
+        assert cache.size() == 7 * entry
+        cache.clear()
+        assert cache.size() is None
@@ -21,6 +21,8 @@ import pytest
 
 from argparse_deco.command import Command
 from argparse_deco.cli import CommandDecorator, default, CLI
+from argparse_deco.engine import ArgparseEngine, FastEngine
+from argparse_deco.executor import ExecutorPool
 
 
 _marker = object()
@@ -133,6 +135,119 @@ class TestCLI:
         assert isinstance(foo, Command)
         assert foo.options['parser'] == ((23, 3), dict(foo=2, bar=77))
 
+    def test_batch(self):
+        @CLI.batch()
+        def foo():
+            pass
+        assert foo.options['batch'] == 'stride'
+        with pytest.raises(ValueError):
+            CLI.batch('bogus')(foo)
+
+    def test_concurrency(self):
+        @CLI.concurrency('heavy', cost=10, limit=2)
+        def foo():
+            pass
+        concurrency = foo.options['concurrency']
+        assert (concurrency.name, concurrency.cost, concurrency.limit) == \
+            ('heavy', 10, 2)
+        with pytest.raises(ValueError):
+            CLI.concurrency('heavy', limit=0)(foo)
+
+    def test_shutdown(self):
+        @CLI.shutdown()
+        def foo():
+            pass
+        assert foo.options['shutdown'] == 10.0
+        with pytest.raises(ValueError):
+            CLI.shutdown(-1)(foo)
+
+    def test_bind(self):
+        class Executor:
+            pass
+        @CLI.bind(Executor)
+        def foo():
+            pass
+        assert foo.options['bind'] is Executor
+
+        @CLI.bind(Executor, pool=3)
+        def bar():
+            pass
+        assert isinstance(bar.options['bind'], ExecutorPool)
+        assert bar.options['bind'].executor_class is Executor
+        assert bar.options['bind'].size == 3
+
+    def test_engine(self):
+        @CLI.engine()
+        def foo():
+            pass
+        assert foo.options['engine'] is FastEngine
+        @CLI.engine(ArgparseEngine)
+        def foo():
+            pass
+        assert foo.options['engine'] is ArgparseEngine
+        with pytest.raises(ValueError):
+            CLI.engine('bogus')(foo)
+
+    def test_metrics(self):
+        @CLI.metrics(buckets=(1, 2))
+        def foo():
+            pass
+        assert foo.options['metrics'].buckets == (1, 2)
+
+    def test_output(self):
+        @CLI.output('csv', buffer_size=16)
+        def foo():
+            pass
+        format, sink = foo.options['output']
+        assert format == 'csv'
+        assert sink.buffer_size == 16
+
+    def test_watch(self):
+        @CLI.watch(debounce=0.5)
+        def foo():
+            pass
+        assert foo.options['watch'] == (0.5, 0.5)
+
+    def test_pipeline(self):
+        @CLI.pipeline()
+        def foo():
+            pass
+        assert foo.options['pipeline'] == '::'
+
+    def test_profile(self):
+        @CLI.profile(top=5)
+        def foo():
+            pass
+        assert foo.options['profile'].top == 5
+        assert foo.options['profile'].interval == 0.005
+
+    def test_provide(self):
+        @CLI.provide('db', dict, scope='process')
+        @CLI.provide('http', list)
+        def foo():
+            pass
+        (name1, provider1), (name2, provider2) = foo.options['provide']
+        assert (name1, provider1.factory, provider1.scope) == \
+            ('http', list, 'invocation')
+        assert (name2, provider2.factory, provider2.scope) == \
+            ('db', dict, 'process')
+
+    def test_limits(self):
+        @CLI.limits(timeout=30, max_rss="2G", cpu_seconds=60)
+        def foo():
+            pass
+        limits = foo.options['limits']
+        assert (limits.timeout, limits.max_rss, limits.cpu_seconds) == \
+            (30, 2 << 30, 60)
+
+    def test_cache(self):
+        @CLI.cache('/tmp/cache', max_size='10M', fingerprint='content')
+        def foo():
+            pass
+        cache = foo.options['cache']
+        assert (cache.directory, cache.max_size, cache.mode) == \
+            ('/tmp/cache', 10 << 20, 'content')
+
     def test_argument(self):
         @CLI.argument('foo3', "bar3", foo="baz3")
         @CLI.argument('foo2', group='grp2')
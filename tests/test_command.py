@@ -18,12 +18,31 @@
 # along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import asyncio
 import inspect
+import json
+import io
+import os
+import pathlib
+import signal
+import sys
+import threading
+import time
 
 import pytest
 
-from argparse_deco.arguments import Arg
-from argparse_deco.command import Command
+from argparse_deco.arguments import Append, Arg, Response
+from argparse_deco.batch import merge_shards
+from argparse_deco.cli import CLI
+from argparse_deco.executor import Executor
+from argparse_deco.fanout import FanoutError
+from argparse_deco.engine import FastEngine
+from argparse_deco.pipeline import Input
+from argparse_deco.resources import Resource
+from argparse_deco.shutdown import CancellationToken
+from argparse_deco.watch import Changes
+from argparse_deco.command import Command, NO_SUBCOMMANDS, arguments, \
+    signature
 
 _marker = object()
 _marker2 = object()
@@ -68,6 +87,64 @@ class TestCommand:
         assert command2.subcommands['baz'].definition.__call__ is Foo.baz
         assert command2.subcommands['zoo'].parent is command2
 
+    def test__init__compact(self):
+        def foo():
+            """bogus doc"""
+        class Bar:
+            def baz():
+                pass
+        command1 = Command(foo, compact=True)
+        assert command1.compact is True
+        assert command1.definition is foo
+        assert command1.subcommands is NO_SUBCOMMANDS
+        assert command1.subcommands == {}
+
+        command2 = Command(Bar, compact=True)
+        assert command2.definition is Bar
+        baz = command2.subcommands['baz']
+        assert baz.compact is True
+        assert baz.definition is Bar.baz
+        assert Command(foo, baz).compact is True
+        assert Command(foo, _marker).compact is False
+
+        # decorated subcommands are built before they have a parent
+        class Zoo:
+            @CLI.alias('q')
+            def qux():
+                """qux doc"""
+            @CLI.argument('--x')
+            class sub:
+                def leaf():
+                    pass
+        command3 = Command(Zoo, compact=True)
+        qux = command3.subcommands['qux']
+        assert qux.compact is True
+        assert qux.definition is qux.func
+        assert qux.subcommands is NO_SUBCOMMANDS
+        leaf = command3.subcommands['sub'].subcommands['leaf']
+        assert leaf.compact is True
+        assert inspect.isfunction(leaf.definition)
+        late = command3.subcommand(CLI.alias('l')(foo))
+        assert late.compact is True and late.definition is foo
+        # explicitly decided commands and regular trees are left alone
+        assert command3.subcommand(Command(Bar, compact=False)).compact \
+            is False
+        class Regular:
+            @CLI.alias('q')
+            def qux():
+                pass
+        assert not Command(Regular).subcommands['qux'].compact
+
+    def test_func(self):
+        def foo():
+            pass
+        class Bar:
+            def __call__(self):
+                pass
+        assert Command(foo).func is foo
+        assert Command(foo, compact=True).func is foo
+        assert Command(Bar).func is Bar.__call__
+
     def test_name(self):
         def foo():
             pass
@@ -90,6 +167,12 @@ class TestCommand:
         assert baz.parent is Foo
         assert Foo.subcommands == dict(bar=subcmd1, baz=baz)
 
+        # compact leaves get their own mapping on demand
+        leaf = Command(bar, compact=True)
+        leaf.subcommand(baz)
+        assert leaf.subcommands == dict(baz=baz)
+        assert NO_SUBCOMMANDS == {}
+
     def test_setup_parser(self, mocker):
         class TestParser:
             def __init__(self, *args, **kwargs):
@@ -376,5 +459,851 @@ class TestCommand:
         mock_setup_parser2.assert_called_with(
             mock_add_subparsers.return_value.add_parser, 'command2')
 
+    def test_setup_subparsers_compact(self):
+        class prog:
+            def foo(bar: Arg(help="bar help")):
+                """foo help"""
+            class baz:
+                def zoo():
+                    """zoo help"""
+            @CLI.argument('--y')
+            def qux():
+                """qux help"""
+        prog = Command(prog, compact=True)
+        parser = prog.setup_parser()
+        subparsers = parser._subparsers._group_actions[0]
+        for name in ('foo', 'baz', 'qux'):
+            subparser = subparsers.choices[name]
+            assert subparser._registries is parser._registries
+            assert all(group._registries is parser._registries
+                       for group in subparser._action_groups)
+        assert parser.parse_args(['foo', 'x']).bar == 'x'
+
+    def test_parser(self, mocker):
+        class TestCommand(Command):
+            """Subclass for being able to patch methods"""
+            pass
+        @TestCommand
+        class prog:
+            def foo(bar: Arg()):
+                """foo help"""
+                return bar
+            class baz:
+                def zoo():
+                    return 'zoo'
+        setup_parser = mocker.spy(prog, 'setup_parser')
+        parser = prog.parser
+        assert prog.parser is parser
+        setup_parser.assert_called_once_with()
+        baz = prog.subcommands['baz']
+        zoo = baz.subcommands['zoo']
+        assert baz.parser is prog.built_subparsers.choices['baz']
+        assert prog.nodes == {parser: prog, baz.built: baz, zoo.built: zoo,
+                              prog.subcommands['foo'].built:
+                              prog.subcommands['foo']}
+        assert prog.command_for(parser.parse_args(['baz', 'zoo'])) is zoo
+        assert prog.command_for(parser.parse_args([])) is prog
+        # bypassing `subcommand` does not patch the parser
+        prog.subcommands['bogus'] = Command(lambda: None, prog)
+        with pytest.raises(LookupError):
+            prog.subcommands['bogus'].parser
+
+    def test_engine(self):
+        @CLI.engine('fast')
+        @Command
+        class prog:
+            def foo(bar: Arg()):
+                return bar
+        engine = prog.engine
+        assert isinstance(engine, FastEngine)
+        assert engine.parser is prog.parser
+        assert prog.engine is engine
+        assert prog(['foo', 'x']) == 'x'
+        assert engine.fallbacks == 0
+        # patching the tree recreates the engine
+        @prog.subcommand
+        def baz():
+            return 'baz'
+        assert prog.engine is not engine
+        assert prog(['baz']) == 'baz'
+        foo = prog.subcommands['foo']
+        assert isinstance(foo.engine, FastEngine)
+        assert foo.engine.parser is foo.parser
+
+    def test_patch(self, mocker):
+        class TestCommand(Command):
+            """Subclass for being able to patch methods"""
+            pass
+        @TestCommand
+        class prog:
+            def foo():
+                """foo help"""
+                return 'foo'
+            def bar():
+                """bar help"""
+                return 'bar'
+        parser = prog.parser
+        setup_parser = mocker.spy(prog, 'setup_parser')
+
+        @prog.subcommand
+        def baz():
+            """baz help"""
+            return 'baz'
+        assert prog.parser is parser
+        assert prog(['baz']) == 'baz'
+        assert list(prog.built_subparsers.choices) == ['foo', 'bar', 'baz']
+
+        # aliases rebuild the subcommand only, keeping the order
+        CLI.alias('f')(prog.subcommands['foo'])
+        assert prog(['f']) == 'foo'
+        assert list(prog.built_subparsers.choices) == \
+            ['foo', 'f', 'bar', 'baz']
+        assert [choice.dest for choice
+                in prog.built_subparsers._choices_actions] == \
+            ['foo', 'bar', 'baz']
+
+        prog.remove_subcommand('foo')
+        assert list(prog.built_subparsers.choices) == ['bar', 'baz']
+        with pytest.raises(SystemExit):
+            prog(['foo'])
+        setup_parser.assert_not_called()
+
+        # refreshing the root rebuilds everything
+        prog.refresh()
+        setup_parser.assert_called_once_with()
+        assert prog.parser is not parser
+        assert prog(['bar']) == 'bar'
+
+    def test_patch_leaf(self):
+        @Command
+        def prog():
+            return 'prog'
+        prog.parser
+        @prog.subcommand
+        def foo():
+            return 'foo'
+        assert prog(['foo']) == 'foo'
+
+    def test_prewarm(self, mocker):
+        class TestCommand(Command):
+            """Subclass for being able to patch methods"""
+            pass
+        @TestCommand
+        class prog:
+            def foo(bar: Arg()):
+                return bar
+        setup_parser = mocker.spy(prog, 'setup_parser')
+        prog.subcommands['foo'].prewarm()
+        warmup = prog.warmup
+        assert warmup is not None
+        prog.prewarm()
+        assert prog.warmup is warmup
+        assert prog(['foo', 'x']) == 'x'
+        assert prog.warmup is None
+        assert not warmup.is_alive()
+        setup_parser.assert_called_once_with()
+        prog.prewarm()
+        assert prog.warmup is None
+
+        # errors are raised when the parser is needed
+        @CLI.mutually_exclusive('grp')
+        @CLI.group('grp')
+        def broken():
+            pass
+        broken.prewarm()
+        with pytest.raises(argparse.ArgumentError):
+            broken.parser
+
+    def test_suggest(self, capsys):
+        @Command
+        class prog:
+            @CLI.alias('ls')
+            def list():
+                pass
+            def show():
+                pass
+        assert prog.suggest('lst') == ['list', 'ls']
+        index = prog.index
+        assert prog.suggest('shw') == ['show']
+        assert prog.index is index
+        with pytest.raises(SystemExit):
+            prog(['shwo'])
+        assert "did you mean 'show'?" in capsys.readouterr().err
+
+        # patching the tree updates the index
+        @prog.subcommand
+        def shout():
+            pass
+        assert prog.index is None
+        assert prog.suggest('shot') == ['shout', 'show']
+
+    def test_dispatch(self):
+        @Command
+        class prog:
+            def foo(self, bar: Arg()):
+                return self, bar
+            def baz(bar: Arg('--bar')):
+                return bar
+        parser, namespace = prog.parse(['foo', 'x'])
+        assert prog.dispatch(parser, namespace) == (namespace, 'x')
+        assert prog.dispatch(*prog.parse(['baz', '--bar', 'y'])) == 'y'
+        assert prog.dispatch(*prog.parse([])) is None
+
+    def test_dispatch_bind(self):
+        class Session(Executor):
+            created = 0
+            def __init__(self, parser, namespace):
+                super().__init__(parser, namespace)
+                Session.created += 1
+                self.closed = False
+            def close(self):
+                self.closed = True
+        @CLI.bind(Session, pool=1)
+        class prog:
+            def foo(self, bar: Arg()):
+                return self, self.namespace.bar
+        session1, bar = prog(['foo', 'x'])
+        assert bar == 'x'
+        session2, bar = prog(['foo', 'y'])
+        assert bar == 'y'
+        assert session2 is session1
+        assert Session.created == 1
+        prog.close()
+        assert session1.closed
+
+        prog.options['bind'] = Session
+        session3, bar = prog(['foo', 'z'])
+        assert session3 is not session1
+        assert Session.created == 2
+
+    def test_resource(self):
+        created = []
+        def factory(name):
+            def create():
+                created.append(name)
+                yield name
+                created.remove(name)
+            return create
+        @CLI.provide('proc', factory('proc'), scope='process')
+        @CLI.provide('batch', factory('batch'), scope='batch')
+        @CLI.provide('inv', factory('inv'))
+        class prog:
+            def foo(proc: Resource, b: Resource['batch'], inv: Resource):
+                return proc, b, inv, sorted(created)
+            def bar():
+                return sorted(created)
+            def baz(unknown: Resource):
+                pass
+
+        assert prog(['bar']) == []
+        assert prog(['foo']) == ('proc', 'batch', 'inv',
+                                 ['batch', 'inv', 'proc'])
+        # only the process scoped resource survives an invocation
+        assert created == ['proc']
+        assert list(prog.run_many([['foo'], ['bar'], ['foo']])) == [
+            ('proc', 'batch', 'inv', ['batch', 'inv', 'proc']),
+            ['batch', 'proc'],
+            ('proc', 'batch', 'inv', ['batch', 'inv', 'proc'])]
+        assert created == ['proc']
+        prog.close()
+        assert created == []
+        with pytest.raises(LookupError):
+            prog(['baz'])
+
+    def test_resource_subcommand(self):
+        @CLI.provide('db', lambda: 'root')
+        class prog:
+            @CLI.provide('db', lambda: 'remote', scope='process')
+            @CLI.provide('cache', lambda: 'cache')
+            class remote:
+                def foo(db: Resource, cache: Resource):
+                    return db, cache
+            def bar(db: Resource):
+                return db
+            def baz(cache: Resource):
+                pass
+
+        # the provider nearest to the dispatched command wins
+        assert prog(['remote', 'foo']) == ('remote', 'cache')
+        assert prog(['bar']) == 'root'
+        with pytest.raises(LookupError):
+            prog(['baz'])
+        assert prog.subcommands['remote'].resources is not None
+        prog.close()
+
+    def test_dispatch_limits(self):
+        @Command
+        class prog:
+            @CLI.limits(timeout=5)
+            def foo(bar: Arg()):
+                return os.getpid(), bar
+            def baz():
+                return os.getpid()
+            async def zoo():
+                return 'zoo'
+            @CLI.limits(timeout=5)
+            def rows(count: Arg(type=int)):
+                for i in range(count):
+                    yield os.getpid(), i
+        pid, bar = prog(['foo', 'x'])
+        assert bar == 'x'
+        assert pid != os.getpid()
+        assert prog(['baz']) == os.getpid()
+        assert prog(['zoo']) == 'zoo'
+        rows = list(prog(['rows', '2']))
+        assert [i for pid, i in rows] == [0, 1]
+        assert rows[0][0] != os.getpid()
+
+    def test_dispatch_cache(self, tmp_path):
+        calls = []
+        path = tmp_path / "input.txt"
+        path.write_text("foo")
+        @Command
+        class prog:
+            @CLI.cache(str(tmp_path / "cache"))
+            def analyse(path: Arg(type=pathlib.Path), flag: Arg('--flag')):
+                calls.append(path)
+                return path.read_text()
+        assert prog(['analyse', str(path)]) == 'foo'
+        assert prog(['analyse', str(path)]) == 'foo'
+        assert len(calls) == 1
+        assert prog(['analyse', str(path), '--flag', 'x']) == 'foo'
+        assert len(calls) == 2
+        path.write_text("changed")
+        os.utime(path, ns=(0, 0))
+        assert prog(['analyse', str(path)]) == 'changed'
+        assert len(calls) == 3
+
+    def test_dispatch_cache_keys(self, tmp_path):
+        cache = str(tmp_path / "cache")
+        calls = []
+        @CLI.cache(cache)
+        @CLI.argument('--n', type=int)
+        @Command
+        class bound:
+            def __call__(self):
+                calls.append(self.n)
+                return self.n
+        assert bound(['--n', '1']) == 1
+        assert bound(['--n', '2']) == 2
+        assert bound(['--n', '1']) == 1
+        assert calls == [1, 2]
+
+        @CLI.pipeline()
+        @Command
+        class piped:
+            def gen(count: Arg(type=int)):
+                return list(range(count))
+            @CLI.cache(cache)
+            def total(values: Input):
+                return len(values)
+        assert piped(['gen', '3', '::', 'total']) == 3
+        assert piped(['gen', '5', '::', 'total']) == 5
+
+        path = tmp_path / "ids.txt"
+        path.write_text("a\nb\n")
+        @CLI.cache(cache)
+        @Command
+        def responses(ids: Response()):
+            return list(ids)
+        assert responses([f'@{path}']) == ['a', 'b']
+        path.write_text("c\n")
+        assert responses([f'@{path}']) == ['c']
+
+    def test_metrics(self):
+        @CLI.metrics()
+        class prog:
+            class foo:
+                def bar():
+                    pass
+                def baz():
+                    raise KeyError
+        assert prog.subcommands['foo'].subcommands['bar'].path == \
+            'prog foo bar'
+        prog(['foo', 'bar'])
+        with pytest.raises(KeyError):
+            prog(['foo', 'baz'])
+        with pytest.raises(SystemExit):
+            prog(['bogus'])
+        snapshot = prog.options['metrics'].snapshot()
+        assert sorted(snapshot['histograms']) == [
+            ('execute', 'prog foo bar'), ('execute', 'prog foo baz'),
+            ('parse', 'prog'), ('parse', 'prog foo bar'),
+            ('parse', 'prog foo baz')]
+        assert snapshot['errors'] == {('execute', 'prog foo baz'): 1,
+                                      ('parse', 'prog'): 1}
+
+    def test_profile(self, tmp_path):
+        @CLI.profile()
+        @Command
+        class prog:
+            def foo(n: Arg(type=int)):
+                return sum(range(n))
+        assert prog(['foo', '10']) == 45
+        output = tmp_path / 'foo.prof'
+        assert prog(['--profile', 'cprofile', '--profile-format', 'pstats',
+                     '--profile-output', str(output), 'foo', '10']) == 45
+        assert output.exists()
+        result = prog.invoke(['--profile', 'tracemalloc', 'foo', '10'])
+        assert result.value == 45
+        assert result.stderr.startswith('peak: ')
+        result = prog.invoke(['--profile', 'sample', '--profile-format',
+                              'pstats', 'foo', '10'])
+        assert result.exit_code == 2
+        assert 'sample profiles cannot be written as pstats' in result.stderr
+
+    def test_watch(self, tmp_path, capsys):
+        source = tmp_path / 'source'
+        source.write_text('')
+        runs = []
+        @CLI.watch(debounce=0.05, interval=0.01)
+        @Command
+        class prog:
+            def build(path: Arg(), changes: Changes):
+                runs.append(changes)
+                if len(runs) == 1:
+                    source.write_text('changed')
+                else:
+                    raise RuntimeError("broken")
+                return len(runs)
+        parser, namespace = prog.parse(
+            ['--watch', str(tmp_path), '--watch', 'other', 'build', 'x'])
+        assert namespace._watch == [str(tmp_path), 'other']
+        # errors do not end watching
+        assert prog.watch(parser, namespace, namespace._watch, runs=2) == 1
+        assert runs == [None, frozenset([str(source)])]
+        assert 'RuntimeError: broken' in capsys.readouterr().err
+
+    def test_watch_generator(self, tmp_path):
+        runs = []
+        @CLI.watch(debounce=0.05, interval=0.01)
+        @Command
+        class prog:
+            def lint(changes: Changes):
+                runs.append(changes)
+                (tmp_path / 'source').write_text(str(len(runs)))
+                yield len(runs)
+        parser, namespace = prog.parse(['--watch', str(tmp_path), 'lint'])
+        assert prog.watch(parser, namespace, namespace._watch, runs=3) == [3]
+        assert len(runs) == 3
+
+    def test_shell(self):
+        @Command
+        class prog:
+            def foo(bar: Arg()):
+                return bar.upper()
+        stdout = io.StringIO()
+        prog.shell(prompt='$ ', stdin=io.StringIO("foo x\nfoo y\n"),
+                   stdout=stdout)
+        assert stdout.getvalue() == '$ X\n$ Y\n$ \n'
+
+    def test_shell_output(self, capsys):
+        @CLI.output('jsonl')
+        class prog:
+            def rows(count: Arg(type=int)):
+                for i in range(count):
+                    yield dict(id=i)
+            def text():
+                return "text"
+        stdout = io.StringIO()
+        prog.shell(prompt='$ ', stdin=io.StringIO(
+            "rows 2\n--format csv rows 1\ntext\n"), stdout=stdout)
+        assert stdout.getvalue() == \
+            '$ {"id": 0}\n{"id": 1}\n$ id\n0\n$ text\n$ \n'
+        assert capsys.readouterr().out == ''
+
+    def test_fanout(self, capsys):
+        calls = []
+        @Command
+        class prog:
+            def ping(hosts: Arg(nargs='*', fanout=True),
+                     count: Arg('--count', type=int)=1):
+                calls.append(hosts)
+                if hosts == ['bad']:
+                    raise ConnectionError(hosts[0])
+                return [f"{host}:{count}" for host in hosts]
+            def size(paths: Arg(nargs='+', fanout='process')):
+                return os.getpid()
+        assert prog(['ping', 'a', 'b', 'c', '--count', '2']) == \
+            [['a:2'], ['b:2'], ['c:2']]
+        assert calls == [['a'], ['b'], ['c']]
+        assert prog(['ping', '--jobs', '3', 'a', 'b', 'c']) == \
+            [['a:1'], ['b:1'], ['c:1']]
+        # without items the command runs once
+        calls.clear()
+        assert prog(['ping']) == []
+        assert calls == [[]]
+        with pytest.raises(FanoutError) as info:
+            prog(['ping', '--jobs', '2', 'a', 'bad', 'c'])
+        assert info.value.results == [['a:1'], None, ['c:1']]
+        assert [item for item, error in info.value.errors] == ['bad']
+        with pytest.raises(SystemExit):
+            prog(['ping', '--jobs', '0', 'a'])
+        assert "invalid positive value: '0'" in capsys.readouterr().err
+        pids = prog(['size', '--jobs', '2', 'a', 'b'])
+        assert os.getpid() not in pids
+        with pytest.raises(TypeError):
+            @Command
+            def bogus(a: Arg(nargs='*', fanout=True),
+                      b: Arg(nargs='*', fanout=True)):
+                pass
+            bogus.parser
+        # a scalar would fan out over the characters of a string
+        with pytest.raises(ValueError, match='host must produce a list'):
+            @Command
+            def scalar(host: Arg('--host', fanout=True)):
+                pass
+            scalar.parser
+
+    def test_fanout_append(self):
+        @Command
+        def prog(host: Append('--host', fanout=True)):
+            return host
+        assert prog(['--host', 'a', '--host', 'b']) == [['a'], ['b']]
+        @Command
+        def pair(ports: Arg('--ports', type=int, nargs=2, fanout=True)):
+            return ports
+        assert pair(['--ports', '1', '2']) == [[1], [2]]
+
+    @pytest.mark.parametrize('kind', [True, 'process'])
+    def test_fanout_generator(self, kind):
+        events = []
+        def connect():
+            events.append('open')
+            yield 'conn'
+            events.append('close')
+        @CLI.provide('db', connect)
+        class prog:
+            def each(hosts: Arg(nargs='+', fanout=kind), db: Resource):
+                for host in hosts:
+                    if host == 'bad':
+                        raise ConnectionError(host)
+                    events.append(('use', db, host))
+                    yield host.upper()
+        assert prog(['each', '--jobs', '2', 'a', 'b']) == [['A'], ['B']]
+        if kind is True:
+            # the bodies ran before the resource was closed
+            assert events == ['open', ('use', 'conn', 'a'),
+                              ('use', 'conn', 'b'), 'close'] or \
+                events == ['open', ('use', 'conn', 'b'),
+                           ('use', 'conn', 'a'), 'close']
+        with pytest.raises(FanoutError) as info:
+            prog(['each', '--jobs', '2', 'a', 'bad'])
+        assert info.value.results == [['A'], None]
+        assert [item for item, error in info.value.errors] == ['bad']
+
+    @pytest.mark.parametrize('shard_by', ['stride', 'hash'])
+    def test_run_batch(self, tmp_path, shard_by, capsys):
+        parsed = []
+        @CLI.batch(shard_by)
+        @Command
+        class prog:
+            def add(a: Arg(type=int), b: Arg(type=int)):
+                parsed.append(a)
+                if b < 0:
+                    raise ValueError(b)
+                return a + b
+            def rows(n: Arg(type=int)):
+                yield from range(n)
+        batch = tmp_path / 'batch'
+        batch.write_text(''.join(f"add {i} {i}\n" for i in range(20))
+                         + "add 1 -1\nadd x\n\nrows 2\n")
+        results = str(tmp_path / 'results-{shard}.jsonl')
+        paths = []
+        for index in range(3):
+            assert prog(['--batch', str(batch), '--shard', f'{index}/3',
+                         '--results', results]) > 0
+            paths.append(results.replace('{shard}', f'{index}-of-3'))
+        # every node parses only its own lines
+        assert sorted(parsed) == sorted(list(range(20)) + [1])
+        merged = tmp_path / 'merged'
+        assert merge_shards(paths, str(merged)) == 23
+        records = [json.loads(line)
+                   for line in merged.read_text().splitlines()]
+        assert [record['item'] for record in records] == \
+            list(range(22)) + [23]
+        assert records[5] == dict(item=5, result=10)
+        assert records[20] == dict(item=20, error="ValueError: -1")
+        assert records[21] == dict(item=21, error="exit status 2")
+        assert records[22] == dict(item=23, result=[0, 1])
+        assert prog(['--batch', str(batch), '--results',
+                     str(tmp_path / 'all')]) == 23
+        assert "invalid int value: 'x'" in capsys.readouterr().err
+
+    def test_run_batch_journal(self, tmp_path):
+        ran = []
+        @CLI.batch()
+        @Command
+        class prog:
+            def echo(i: Arg(type=int)):
+                if i == 5 and 5 not in ran:
+                    ran.append(i)
+                    raise KeyboardInterrupt
+                ran.append(i)
+                return i
+        batch = tmp_path / 'batch'
+        batch.write_text(''.join(f"echo {i}\n" for i in range(10)))
+        args = ['--batch', str(batch), '--results',
+                str(tmp_path / 'results-{shard}'), '--journal',
+                str(tmp_path / 'journal-{shard}')]
+        with pytest.raises(KeyboardInterrupt):
+            prog(args)
+        assert ran == [0, 1, 2, 3, 4, 5]
+        assert (tmp_path / 'journal-all').read_text().count('done') == 5
+        assert prog(args) == 5
+        assert ran[6:] == [5, 6, 7, 8, 9]
+        assert [json.loads(line)['result'] for line in
+                (tmp_path / 'results-all').read_text().splitlines()] == \
+            list(range(10))
+        assert prog(args) == 0
+
+    def test_run_batch_journal_crash(self, tmp_path):
+        @CLI.batch()
+        @Command
+        class prog:
+            def echo(i: Arg(type=int)):
+                if i == 600 and crash:
+                    # dies without flushing any buffer
+                    os._exit(1)
+                return 'x' * 20
+        batch = tmp_path / 'batch'
+        batch.write_text(''.join(f"echo {i}\n" for i in range(1000)))
+        results = tmp_path / 'results'
+        args = ['--batch', str(batch), '--results', str(results),
+                '--journal', str(tmp_path / 'journal')]
+        crash = True
+        pid = os.fork()
+        if pid == 0:
+            prog(args)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        crash = False
+        prog(args)
+        records = [json.loads(line)
+                   for line in results.read_text().splitlines()]
+        assert sorted(record['item'] for record in records) == \
+            list(range(1000))
+        assert all(record['result'] == 'x' * 20 for record in records)
+
+    def test_run_many_jobs(self, tmp_path, capsys):
+        lock = threading.Lock()
+        running = []
+        peak = []
+        @CLI.batch()
+        @Command
+        class prog:
+            @CLI.concurrency('heavy', cost=5, limit=1)
+            class heavy:
+                def reindex(i: Arg(type=int)):
+                    with lock:
+                        running.append(i)
+                        peak.append(len(running))
+                    time.sleep(0.01)
+                    with lock:
+                        running.remove(i)
+                    return -i
+            def status(i: Arg(type=int)):
+                time.sleep(0.01)
+                return i
+        assert prog.subcommands['heavy'].subcommands['reindex'] \
+            .concurrency().name == 'heavy'
+        assert prog.subcommands['status'].concurrency().name == 'default'
+        argvs = [['heavy', 'reindex', str(i)] if i % 4 == 0
+                 else ['status', str(i)] for i in range(20)]
+        assert list(prog.run_many(argvs, jobs=4)) == \
+            [-i if i % 4 == 0 else i for i in range(20)]
+        assert max(peak) == 1
+        with pytest.raises(SystemExit):
+            list(prog.run_many([['status', 'x']], jobs=2))
+        batch = tmp_path / 'batch'
+        batch.write_text('\n'.join(' '.join(argv) for argv in argvs))
+        results = tmp_path / 'results'
+        capsys.readouterr()
+        assert prog(['--batch', str(batch), '--workers', '3',
+                     '--results', str(results)]) == 20
+        assert [json.loads(line)['item']
+                for line in results.read_text().splitlines()] == \
+            list(range(20))
+        report = capsys.readouterr().err
+        assert 'heavy' in report and 'default' in report
+
+    def test_shutdown(self, tmp_path, mocker):
+        class TestCommand(Command):
+            """Subclass for being able to patch methods"""
+            pass
+        done = []
+        @CLI.shutdown(grace=0.2)
+        @CLI.batch()
+        @TestCommand
+        class prog:
+            def loop(token: CancellationToken):
+                for i in range(100):
+                    if token.cancelled:
+                        return
+                    if i == 3:
+                        os.kill(os.getpid(), signal.SIGINT)
+                    done.append(i)
+            async def wait(seconds: Arg(type=float)):
+                loop = asyncio.get_running_loop()
+                loop.call_later(0.01, os.kill, os.getpid(), signal.SIGTERM)
+                await asyncio.sleep(seconds)
+            def stuck():
+                os.kill(os.getpid(), signal.SIGTERM)
+                while True:
+                    time.sleep(1)
+            def echo(i: Arg(type=int)):
+                if i == 2:
+                    os.kill(os.getpid(), signal.SIGTERM)
+                return i
+        close = mocker.spy(TestCommand, 'close')
+        previous = signal.getsignal(signal.SIGINT)
+        assert prog.invoke(['loop']).exit_code == 130
+        assert done == [0, 1, 2, 3]
+        assert close.call_count > 0
+        assert signal.getsignal(signal.SIGINT) is previous
+        assert prog.invoke(['wait', '10']).exit_code == 143
+        assert prog.invoke(['stuck']).exit_code == 143
+        assert prog(['echo', '1']) == 1
+        # a batch stops after the in-flight line, keeping its results
+        batch = tmp_path / 'batch'
+        batch.write_text(''.join(f"echo {i}\n" for i in range(5)))
+        results = tmp_path / 'results'
+        assert prog.invoke(['--batch', str(batch), '--results',
+                            str(results)]).exit_code == 143
+        assert [json.loads(line)['result']
+                for line in results.read_text().splitlines()] == [0, 1, 2]
+
+    def test_invoke(self, mocker):
+        class TestCommand(Command):
+            """Subclass for being able to patch methods"""
+            pass
+        @CLI.output('jsonl')
+        @TestCommand
+        class prog:
+            def echo(text: Arg()):
+                print(text)
+                return text
+            def env(name: Arg()):
+                return os.environ.get(name)
+            def cat():
+                return sys.stdin.read()
+            def rows():
+                yield dict(a=1)
+            def fail():
+                raise KeyError('foo')
+            def leave(code: Arg(type=int)):
+                sys.exit(code)
+        setup_parser = mocker.spy(prog, 'setup_parser')
+        result = prog.invoke(['echo', 'hello'])
+        assert (result.exit_code, result.stdout, result.stderr,
+                result.value, result.exception) == \
+            (0, "hello\n", "", "hello", None)
+        assert prog.invoke(['env', 'FOO'], env=dict(FOO='bar')).value == 'bar'
+        assert prog.invoke(['cat'], stdin="input").value == "input"
+        assert prog.invoke(['rows']).stdout == '{"a": 1}\n'
+        result = prog.invoke(['fail'])
+        assert result.exit_code == 1
+        assert isinstance(result.exception, KeyError)
+        assert prog.invoke(['leave', '3']).exit_code == 3
+        result = prog.invoke(['bogus'])
+        assert result.exit_code == 2
+        assert "invalid choice" in result.stderr
+        result = prog.invoke(['--help'])
+        assert result.exit_code == 0
+        assert result.stdout.startswith("usage:")
+        setup_parser.assert_called_once_with()
+
+    def test_run_many(self, mocker):
+        class TestCommand(Command):
+            """Subclass for being able to patch methods"""
+            pass
+        @TestCommand
+        class prog:
+            def foo(bar: Arg()):
+                return bar
+        setup_parser = mocker.spy(prog, 'setup_parser')
+        results = prog.run_many([['foo', 'a'], ['foo', 'b']])
+        setup_parser.assert_not_called()
+        assert list(results) == ['a', 'b']
+        setup_parser.assert_called_once_with()
+
+    def test_run_pipeline(self):
+        events = []
+        def session():
+            events.append('open')
+            yield
+            events.append('close')
+        @CLI.pipeline()
+        @CLI.provide('session', session)
+        class prog:
+            def extract(count: Arg(type=int), session: Resource):
+                for i in range(count):
+                    events.append(f'extract {i}')
+                    yield i
+            def transform(records: Input, factor: Arg(type=int)):
+                for record in records:
+                    events.append(f'transform {record}')
+                    yield record * factor
+            def load(records: Input):
+                return list(records)
+            def single(records: Input):
+                return records
+
+        assert prog(['extract', '2', '::', 'transform', '3', '::', 'load']) \
+            == [0, 3]
+        # stages run interleaved and resources outlive dispatching
+        assert events == ['open', 'extract 0', 'transform 0',
+                          'extract 1', 'transform 1', 'close']
+        assert prog(['single']) is None
+        with pytest.raises(SystemExit):
+            prog(['extract', '2', '::', 'extract', '1'])
+
+    def test_output(self, capsys):
+        @CLI.output('jsonl')
+        @CLI.pipeline()
+        class prog:
+            def rows(count: Arg(type=int)):
+                for i in range(count):
+                    yield dict(id=i)
+            def double(rows: Input):
+                for row in rows:
+                    yield dict(id=row['id'] * 2)
+            def text():
+                return "text"
+        assert prog(['rows', '2']) == 2
+        assert capsys.readouterr().out == '{"id": 0}\n{"id": 1}\n'
+        assert prog(['--format', 'csv', 'rows', '2']) == 2
+        assert capsys.readouterr().out == 'id\n0\n1\n'
+        assert prog(['rows', '2', '::', 'double']) == 2
+        assert capsys.readouterr().out == '{"id": 0}\n{"id": 2}\n'
+        assert prog(['text']) == "text"
+        assert capsys.readouterr().out == ''
+        assert '--format' in prog.setup_parser().format_usage()
+        assert '--format' not in \
+            prog.subcommands['rows'].setup_parser().format_usage()
+
+    def test_signature(self):
+        def foo(bar):
+            pass
+        assert signature(foo) is signature(foo)
+        assert list(signature(foo).parameters) == ['bar']
+        assert list(signature(len).parameters) == ['obj']
+        def baz(qux: 'Arg()'):
+            pass
+        assert isinstance(signature(baz).parameters['qux'].annotation, Arg)
+
+    def test_arguments(self, mocker):
+        def foo(bar: Arg(), count: int=3, other: object=None, *args):
+            pass
+        infer = mocker.spy(sys.modules['argparse_deco.command'], 'infer')
+        result = arguments(foo)
+        assert arguments(foo) is result
+        assert infer.call_count == 2
+        (name1, arg1, default1), (name2, arg2, default2) = result
+        assert (name1, default1) == ('bar', None)
+        assert arg1 is foo.__annotations__['bar']
+        assert (name2, arg2.name_or_flags, default2) == \
+            ('count', ('--count',), 3)
+
     def test__call__(self, mocker):
         raise NotImplementedError
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from argparse_deco import Arg, Flag
+from argparse_deco.cli import CLI
+from argparse_deco.engine import ENGINES, FastEngine, Trie
+
+
+@CLI("prog")
+@CLI.argument('-v', '--verbose', action='count', default=0)
+@CLI.argument('--level', type=int, default='3')
+class prog:
+    """conformance tree"""
+
+    @CLI.alias('cp')
+    def copy(source: Arg(nargs='+'), target: Arg(),
+             force: Flag('-f', '--force'),
+             mode: Arg('--mode', choices=('fast', 'safe'))='safe',
+             tags: Arg('--tag', action='append')=None):
+        pass
+
+    def head(path: Arg(nargs='?', default='-'),
+             lines: Arg('-n', '--lines', type=int)=10,
+             values: Arg('--values', nargs='*', type=float)=None):
+        pass
+
+    def pair(xy: Arg(nargs=2, type=int), rest: Arg(nargs='*')):
+        pass
+
+    @CLI.mutually_exclusive('how')
+    def either(on: Flag['how']('--on'),
+               off: Flag['how']('--off')):
+        pass
+
+
+CASES = [
+    [],
+    ['copy', 'a', 'b'],
+    ['-vv', 'copy', 'a', 'b'],
+    ['--verbose', '--verbose', 'cp', 'a', 'b', 'c'],
+    ['--level', '5', 'copy', '--force', 'a', 'b'],
+    ['--level=7', 'copy', 'a', 'b', '--mode', 'fast'],
+    ['--lev', '1', 'copy', 'a', 'b', '--mo=fast', '--tag', 'x', '--tag=y'],
+    ['copy', 'a', 'b', '--', '-c'],
+    ['copy', 'a', '--force', 'b'],
+    ['copy', 'a'],
+    ['copy', 'a', 'b', '--mode', 'slow'],
+    ['copy', 'a', 'b', '--bogus'],
+    ['copy', 'a', 'b', '--force=1'],
+    ['coyp', 'a', 'b'],
+    ['--level', 'x', 'copy', 'a', 'b'],
+    ['head'],
+    ['head', 'file'],
+    ['head', '-n', '3', 'file'],
+    ['head', 'file', '-n', '-3'],
+    ['head', '--lines=4', '--values', '1', '-2.5', '3'],
+    ['head', '--values'],
+    ['head', '-n3'],
+    ['head', 'a', 'b'],
+    ['pair', '1', '2'],
+    ['pair', '1', '2', 'x', 'y'],
+    ['pair', '1'],
+    ['pair', '1', 'x'],
+    ['either', '--on'],
+    ['either', '--on', '--off'],
+    ['--help'],
+    ['copy', '-h'],
+]
+
+
+def reference(args):
+    """result of argparse on a fresh parser"""
+    return reference_of(prog, args)
+
+
+def reference_of(command, args):
+    """result of argparse on a fresh parser of `command`"""
+    return outcome(command.setup_parser().parse_args, args)
+
+
+def outcome(parse_args, args):
+    try:
+        namespace = parse_args(list(args))
+    except SystemExit as exit:
+        return exit.code
+    values = vars(namespace)
+    values.pop('_parser')
+    func = values.pop('_func', None)
+    return getattr(func, '__name__', None), values
+
+
+@pytest.fixture(params=sorted(ENGINES))
+def engine(request):
+    return ENGINES[request.param](prog.setup_parser())
+
+
+@pytest.mark.parametrize('args', CASES, ids=' '.join)
+def test_conformance(engine, args, capsys):
+    expected = reference(args)
+    expected_output = capsys.readouterr()
+    assert outcome(engine.parse_args, args) == expected
+    assert capsys.readouterr() == expected_output
+
+
+def test_results(engine):
+    assert outcome(engine.parse_args, ['--lev=2', 'cp', 'a', 'b', 'c']) == (
+        'copy', dict(verbose=0, level=2, source=['a', 'b'], target='c',
+                     force=False, mode='safe', tags=None))
+    assert outcome(engine.parse_args, ['head', '-n', '-3']) == (
+        'head', dict(verbose=0, level=3, path='-', lines=-3, values=None))
+    assert outcome(engine.parse_args, ['pair', '1', '2', 'x']) == (
+        'pair', dict(verbose=0, level=3, xy=[1, 2], rest=['x']))
+
+
+def test_fallbacks():
+    engine = FastEngine(prog.setup_parser())
+    for args in (['-v', 'copy', 'a', 'b'], ['head', '--val', '1', '2'],
+                 ['pair', '1', '2'], ['--help'][:0]):
+        engine.parse_args(args)
+    assert engine.fallbacks == 0
+    for args in (['copy', 'a', '--force', 'b'], ['copy', 'a', 'b', '--', 'c'],
+                 ['head', '-n3'], ['either', '--on']):
+        engine.parse_args(args)
+    assert engine.fallbacks == 4
+    with pytest.raises(SystemExit):
+        engine.parse_args(['copy'])
+    assert engine.fallbacks == 5
+
+
+def test_tables():
+    engine = FastEngine(prog.setup_parser())
+    engine.parse_args(['cp', 'a', 'b'])
+    assert len(engine.tables) == 2
+    table = engine.tables[engine.parser]
+    assert table.prefixes.complete('--l') == (1, '--level')
+    assert table.subparsers.choices['cp'] is table.subparsers.choices['copy']
+
+
+class TestTrie:
+
+    def test_complete(self):
+        trie = Trie(['--level', '--lines', '--force'])
+        assert trie.complete('--f') == (1, '--force')
+        assert trie.complete('--l')[0] == 2
+        assert trie.complete('--lin') == (1, '--lines')
+        assert trie.complete('--x') == (0, None)
+        assert trie.complete('--level') == (1, '--level')
+
+
+@pytest.mark.parametrize('name', sorted(ENGINES))
+@pytest.mark.parametrize('args', [
+    ['run', '--out', 'x', 'A', 'B', '--out', 'y'],
+    ['run', '--out', 'x', 'A', '--out', 'y', 'B'],
+    ['run', '--out', 'x', 'A', '--', 'B'],
+    ['run', '--out', 'x', 'A', 'B', '--out', 'bad'],
+    ['run', '--out', 'bad', 'A'],
+], ids=' '.join)
+def test_conversions(name, args, capsys):
+    """converters run as often as with argparse alone, even if the
+    fast engine leaves the input to argparse"""
+    calls = []
+
+    def out(value):
+        calls.append(value)
+        if value == 'bad':
+            raise ValueError(value)
+        return value.upper()
+
+    @CLI("prog")
+    class tree:
+        def run(first: Arg(), second: Arg(),
+                out: Arg('--out', type=out, action='append')):
+            pass
+
+    expected = reference_of(tree, args)
+    expected_calls = list(calls)
+    calls.clear()
+    expected_output = capsys.readouterr()
+    engine = ENGINES[name](tree.setup_parser())
+    assert outcome(engine.parse_args, args) == expected
+    assert calls == expected_calls
+    assert capsys.readouterr() == expected_output
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import threading
+
+import pytest
+
+from argparse_deco.executor import Executor, ExecutorPool
+
+
+class Recorder(Executor):
+    instances = []
+
+    def __init__(self, parser, namespace):
+        super().__init__(parser, namespace)
+        self.resets = 0
+        self.closed = False
+        self.instances.append(self)
+
+    def reset(self, parser, namespace):
+        super().reset(parser, namespace)
+        self.resets = getattr(self, 'resets', -1) + 1
+
+    def close(self):
+        self.closed = True
+
+
+class TestExecutor:
+
+    def test__init__(self):
+        executor = Executor('parser', 'namespace')
+        assert executor.parser == 'parser'
+        assert executor.namespace == 'namespace'
+        assert executor.close() is None
+
+
+class TestExecutorPool:
+
+    def test__init__(self):
+        with pytest.raises(ValueError):
+            ExecutorPool(Recorder, 0)
+        pool = ExecutorPool(Recorder, 2)
+        assert repr(pool) == "<ExecutorPool Recorder size=2>"
+
+    def test_lease(self):
+        Recorder.instances = []
+        pool = ExecutorPool(Recorder)
+        with pool.lease('p', 1) as executor1:
+            assert executor1.namespace == 1
+            assert executor1.resets == 0
+        with pool.lease('p', 2) as executor2:
+            assert executor2 is executor1
+            assert executor2.namespace == 2
+            assert executor2.resets == 1
+        assert len(Recorder.instances) == 1
+
+    def test_size(self):
+        Recorder.instances = []
+        pool = ExecutorPool(Recorder, 2)
+        executor1 = pool.acquire('p', 1)
+        executor2 = pool.acquire('p', 2)
+        assert executor1 is not executor2
+
+        acquired = []
+        thread = threading.Thread(
+            target=lambda: acquired.append(pool.acquire('p', 3)))
+        thread.start()
+        thread.join(0.05)
+        assert not acquired
+        pool.release(executor2)
+        thread.join()
+        assert acquired == [executor2]
+        assert executor2.namespace == 3
+        assert len(Recorder.instances) == 2
+
+    def test_close(self):
+        Recorder.instances = []
+        pool = ExecutorPool(Recorder)
+        with pool.lease('p', 1) as executor:
+            pass
+        pool.close()
+        assert executor.closed
+        with pool.lease('p', 2) as executor2:
+            assert executor2 is not executor
+
+    def test_fork(self, monkeypatch):
+        Recorder.instances = []
+        pool = ExecutorPool(Recorder)
+        with pool.lease('p', 1) as executor:
+            pass
+        monkeypatch.setattr(os, 'getpid', lambda: -1)
+        with pool.lease('p', 2) as executor2:
+            assert executor2 is not executor
+        assert not executor.closed
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import threading
+import time
+
+import pytest
+
+from argparse_deco.fanout import FanoutError, fan_out, positive
+
+
+def square(item):
+    if item < 0:
+        raise ValueError(item)
+    return item * item
+
+
+@pytest.mark.parametrize('jobs, processes', [(1, False), (4, False),
+                                             (4, True)])
+def test_fan_out(jobs, processes):
+    assert fan_out(square, range(10), jobs, processes) == \
+        [item * item for item in range(10)]
+    assert fan_out(square, [], jobs, processes) == []
+    with pytest.raises(FanoutError) as info:
+        fan_out(square, [1, -2, 3, -4], jobs, processes)
+    error = info.value
+    assert [item for item, _ in error.errors] == [-2, -4]
+    assert isinstance(error.errors[0][1], ValueError)
+    assert error.results == [1, None, 9, None]
+    assert str(error).startswith("2 of 4 items failed: -2: ValueError")
+
+
+def test_fan_out_parallel():
+    barrier = threading.Barrier(3, timeout=5)
+    assert fan_out(lambda item: barrier.wait() is not None, range(3),
+                   jobs=3) == [True] * 3
+    pids = fan_out(lambda item: (time.sleep(0.05), os.getpid())[1],
+                   range(4), jobs=2, processes=True)
+    assert os.getpid() not in pids
+
+
+def test_positive():
+    assert positive('3') == 3
+    with pytest.raises(ValueError):
+        positive('0')
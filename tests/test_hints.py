@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import annotations
+
+import enum
+import pathlib
+from typing import List, Literal, Optional
+
+import pytest
+
+from argparse_deco import Arg, Flag
+from argparse_deco.cli import CLI
+from argparse_deco.hints import EnumType, infer, resolve
+from argparse_deco.resources import Resource
+
+
+class Color(enum.Enum):
+    red = 1
+    green = 2
+
+
+def command(source: pathlib.Path, count: int = 3,
+            paths: list[pathlib.Path] = (), ratio: Optional[float] = None,
+            color: Color = Color.red, mode: Literal['fast', 'safe'] = 'safe',
+            level: Literal[1, 2] = 1, dry_run: bool = False,
+            cache: bool = True, names: List[str] = None,
+            bar: Arg('--bar') = None, db: Resource = None, other: object = None,
+            *args, **kwargs):
+    return locals()
+
+
+def test_resolve():
+    parameters = resolve(command).parameters
+    assert parameters['count'].annotation is int
+    assert parameters['paths'].annotation == list[pathlib.Path]
+    assert isinstance(parameters['bar'].annotation, Arg)
+    assert parameters['db'].annotation is Resource
+    def unresolvable(x: Unknown):
+        pass
+    assert resolve(unresolvable).parameters['x'].annotation == 'Unknown'
+
+
+def test_infer():
+    arg = infer('count', int, 3)
+    assert (arg.name_or_flags, arg.kwargs) == \
+        (('--count',), dict(type=int, default=3))
+    arg = infer('source', pathlib.Path)
+    assert (arg.name_or_flags, arg.kwargs) == ((), dict(type=pathlib.Path))
+    arg = infer('paths', list[pathlib.Path])
+    assert arg.kwargs == dict(type=pathlib.Path, nargs='+')
+    arg = infer('dry_run', bool, False)
+    assert isinstance(arg, Flag) and arg.name_or_flags == ('--dry-run',)
+    assert infer('cache', bool, True).name_or_flags == ('--no-cache',)
+    assert infer('level', Literal[1, 2], 1).kwargs['type'] is int
+    assert 'type' not in infer('mode', Literal['a', 'b'], 'a').kwargs
+    assert infer('names', Optional[List[str]], None).kwargs == \
+        dict(nargs='*', default=None)
+    assert infer('other', object, None) is None
+    assert infer('other', int | str, None) is None
+    assert infer('flags', list[bool], ()) is None
+
+
+def test_enum_type():
+    convert = EnumType(Color)
+    assert convert('green') is Color.green
+    assert convert.__name__ == 'Color'
+    with pytest.raises(ValueError):
+        convert('blue')
+
+
+def test_parse(capsys):
+    prog = CLI.provide('db', lambda: 'db')(CLI(command))
+    assert prog(['src']) == dict(
+        source=pathlib.Path('src'), count=3, paths=(), ratio=None,
+        color=Color.red, mode='safe', level=1, dry_run=False, cache=True,
+        names=None, bar=None, db='db', other=None, args=(), kwargs={})
+    result = prog(['src', '--count', '5', '--paths', 'a', 'b',
+                   '--ratio=0.5', '--color', 'green', '--mode', 'fast',
+                   '--level', '2', '--dry-run', '--no-cache',
+                   '--names', 'x', '--bar', 'y'])
+    assert result['count'] == 5
+    assert result['paths'] == [pathlib.Path('a'), pathlib.Path('b')]
+    assert (result['ratio'], result['color']) == (0.5, Color.green)
+    assert (result['mode'], result['level']) == ('fast', 2)
+    assert (result['dry_run'], result['cache']) == (True, False)
+    assert (result['names'], result['bar']) == (['x'], 'y')
+    with pytest.raises(SystemExit):
+        prog(['src', '--color', 'blue'])
+    assert "invalid Color value: 'blue'" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        prog(['src', '--other', 'x'])
+
+
+def test_decorator_argument():
+    # a decorator argument takes precedence over the type hint
+    @CLI.argument('--count', type=int, default=2)
+    @CLI("prog")
+    def prog(count: int = 1, size: int = 4):
+        return count, size
+    assert prog(['--count', '3']) == (3, 4)
+    assert prog([]) == (2, 4)
+    assert prog(['--size', '5']) == (2, 5)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import asyncio
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from argparse_deco.limits import (
+    Limits, LimitError, CommandTimeout, ResourceLimitExceeded, parse_size)
+
+
+def getpid():
+    return os.getpid()
+
+
+def test_parse_size():
+    assert parse_size(None) is None
+    assert parse_size(1024) == 1024
+    assert parse_size("512") == 512
+    assert parse_size("2G") == 2 << 30
+    assert parse_size("64 MiB") == 64 << 20
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_errors():
+    error = pickle.loads(pickle.dumps(CommandTimeout('foo', 3)))
+    assert isinstance(error, LimitError)
+    assert isinstance(error, TimeoutError)
+    assert (error.command, error.limit, error.value) == ('foo', 'timeout', 3)
+    assert str(error) == "foo exceeded its timeout limit (3)"
+    error = pickle.loads(pickle.dumps(
+        ResourceLimitExceeded('foo', 'max_rss', 5)))
+    assert (error.command, error.limit, error.value) == ('foo', 'max_rss', 5)
+
+
+class TestLimits:
+
+    def test__init__(self):
+        assert repr(Limits(3, '1K')) == \
+            "Limits(timeout=3, max_rss=1024, cpu_seconds=None)"
+
+    def test_run(self):
+        def add(a, b=0):
+            return a + b
+        assert Limits(timeout=5).run(add, (1,), dict(b=2)) == 3
+
+    def test_run_error(self):
+        def fail():
+            raise KeyError('bogus')
+        with pytest.raises(KeyError):
+            Limits().run(fail, (), {})
+
+    def test_run_timeout(self):
+        def sleep():
+            time.sleep(5)
+        start = time.monotonic()
+        with pytest.raises(CommandTimeout):
+            Limits(timeout=0.1).run(sleep, (), {})
+        assert time.monotonic() - start < 2
+
+    def test_run_max_rss(self):
+        def allocate():
+            return len(bytearray(1 << 30))
+        with pytest.raises(ResourceLimitExceeded) as info:
+            Limits(max_rss='256M').run(allocate, (), {})
+        assert info.value.limit == 'max_rss'
+
+    def test_run_async(self):
+        async def sleep(duration):
+            await asyncio.sleep(duration)
+            return duration
+        assert Limits(timeout=1).run(sleep, (0,), {}) == 0
+        with pytest.raises(CommandTimeout):
+            Limits(timeout=0.05).run(sleep, (1,), {})
+
+    def test_run_generator(self):
+        def count(n):
+            yield os.getpid()
+            for i in range(n):
+                yield i
+            if n > 2:
+                raise KeyError(n)
+        items = Limits(timeout=5).run(count, (2,), {})
+        assert next(items) != os.getpid()
+        assert list(items) == [0, 1]
+        assert list(Limits().run(count, (0,), {}))[1:] == []
+        with pytest.raises(KeyError):
+            list(Limits().run(count, (3,), {}))
+
+    def test_run_generator_timeout(self):
+        def slow():
+            yield 1
+            time.sleep(5)
+            yield 2
+        items = Limits(timeout=0.2).run(slow, (), {})
+        assert next(items) == 1
+        with pytest.raises(CommandTimeout):
+            next(items)
+
+    def test_run_threads(self):
+        results = []
+        def run(func):
+            results.append(Limits(timeout=10).run(func, (), {}))
+        # picklable commands are started by a fork server
+        thread = threading.Thread(target=run, args=(getpid,))
+        thread.start()
+        thread.join()
+        assert results[0] != os.getpid()
+        def local():
+            return 'forked'
+        event = threading.Event()
+        thread = threading.Thread(target=event.wait)
+        thread.start()
+        try:
+            with pytest.warns(RuntimeWarning):
+                run(local)
+        finally:
+            event.set()
+            thread.join()
+        assert results[1] == 'forked'
+
+
+def test_lazy_imports():
+    """asyncio and multiprocessing are only imported when needed"""
+    script = ("import sys, argparse_deco; print(sorted(name for name in "
+              "('asyncio', 'multiprocessing', 'http.server') "
+              "if name in sys.modules))")
+    output = subprocess.check_output(
+        [sys.executable, '-c', script],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    assert output.strip() == b'[]'
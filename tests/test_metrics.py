@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import concurrent.futures
+import threading
+import urllib.request
+
+from argparse_deco.metrics import Metrics
+
+
+class TestMetrics:
+
+    def test_observe(self):
+        metrics = Metrics(buckets=(1, .1))
+        assert metrics.buckets == (.1, 1)
+        metrics.observe('parse', 'prog', .05)
+        metrics.observe('parse', 'prog', .1)
+        metrics.observe('parse', 'prog', 2)
+        metrics.error('parse', 'prog')
+        snapshot = metrics.snapshot()
+        assert snapshot['histograms'] == {
+            ('parse', 'prog'): [2, 0, 1, 2.15]}
+        assert snapshot['errors'] == {('parse', 'prog'): 1}
+
+    def test_shards(self):
+        metrics = Metrics()
+        def work():
+            for i in range(1000):
+                metrics.observe('execute', 'prog foo', .001)
+        threads = [threading.Thread(target=work) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # shards of ended threads are folded into one
+        assert len(metrics.shards) == 0
+        histogram = metrics.snapshot()['histograms'][('execute', 'prog foo')]
+        assert sum(histogram[:-1]) == 4000
+        # live threads keep their own shard
+        started = threading.Event()
+        done = threading.Event()
+        def live():
+            metrics.error('execute', 'prog foo')
+            started.set()
+            done.wait()
+        thread = threading.Thread(target=live)
+        thread.start()
+        started.wait()
+        assert len(metrics.shards) == 1
+        assert metrics.snapshot()['errors'] == {('execute', 'prog foo'): 1}
+        done.set()
+        thread.join()
+        assert len(metrics.shards) == 0
+        assert metrics.snapshot()['errors'] == {('execute', 'prog foo'): 1}
+
+    def test_shards_pools(self):
+        metrics = Metrics()
+        for i in range(50):
+            with concurrent.futures.ThreadPoolExecutor(4) as executor:
+                list(executor.map(
+                    lambda i: metrics.observe('execute', 'prog', .001),
+                    range(8)))
+        assert len(metrics.shards) == 0
+        histogram = metrics.snapshot()['histograms'][('execute', 'prog')]
+        assert sum(histogram[:-1]) == 400
+
+    def test_timer(self):
+        metrics = Metrics()
+        metrics.timer('execute', 'prog')(None, None, None)
+        metrics.timer('execute', 'prog')(KeyError, KeyError(), None)
+        metrics.timer('parse', 'prog')(SystemExit, SystemExit(0), None)
+        metrics.timer('parse', 'prog')(SystemExit, SystemExit(2), None)
+        snapshot = metrics.snapshot()
+        assert snapshot['errors'] == {('execute', 'prog'): 1,
+                                      ('parse', 'prog'): 1}
+        assert sum(snapshot['histograms'][('parse', 'prog')][:-1]) == 2
+
+    def test_render(self):
+        metrics = Metrics(buckets=(.1, 1))
+        metrics.observe('execute', 'prog "foo"', .5)
+        metrics.error('execute', 'prog "foo"')
+        lines = metrics.render().splitlines()
+        assert lines == [
+            "# HELP argparse_deco_parse_seconds "
+            "Time spent parsing command lines",
+            "# TYPE argparse_deco_parse_seconds histogram",
+            "# HELP argparse_deco_execute_seconds "
+            "Time spent executing commands",
+            "# TYPE argparse_deco_execute_seconds histogram",
+            'argparse_deco_execute_seconds_bucket'
+            '{command="prog \\"foo\\"",le="0.1"} 0',
+            'argparse_deco_execute_seconds_bucket'
+            '{command="prog \\"foo\\"",le="1"} 1',
+            'argparse_deco_execute_seconds_bucket'
+            '{command="prog \\"foo\\"",le="+Inf"} 1',
+            'argparse_deco_execute_seconds_sum'
+            '{command="prog \\"foo\\""} 0.5',
+            'argparse_deco_execute_seconds_count'
+            '{command="prog \\"foo\\""} 1',
+            "# HELP argparse_deco_errors_total "
+            "Failed parses and executions of commands",
+            "# TYPE argparse_deco_errors_total counter",
+            'argparse_deco_errors_total'
+            '{command="prog \\"foo\\"",stage="execute"} 1',
+        ]
+
+    def test_write_textfile(self, tmp_path):
+        metrics = Metrics()
+        metrics.observe('parse', 'prog', 1)
+        path = tmp_path / "prog.prom"
+        metrics.write_textfile(str(path))
+        assert path.read_text() == metrics.render()
+        assert [p.name for p in tmp_path.iterdir()] == ['prog.prom']
+
+    def test_serve(self):
+        metrics = Metrics()
+        metrics.observe('parse', 'prog', 1)
+        server = metrics.serve()
+        try:
+            host, port = server.server_address
+            with urllib.request.urlopen(f"http://{host}:{port}/") as r:
+                assert r.read().decode() == metrics.render()
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import io
+
+import pytest
+
+from argparse_deco.output import FORMATS, Sink
+
+
+RECORDS = [dict(id=1, name="a b"), dict(id=2, name="c\td")]
+
+
+@pytest.mark.parametrize('format, expected', [
+    ('plain', "{'id': 1, 'name': 'a b'}\n{'id': 2, 'name': 'c\\td'}\n"),
+    ('jsonl', '{"id": 1, "name": "a b"}\n{"id": 2, "name": "c\\td"}\n'),
+    ('csv', 'id,name\n1,a b\n2,c\td\n'),
+    ('tsv', 'id\tname\n1\ta b\n2\t"c\td"\n'),
+])
+def test_formats(format, expected):
+    assert ''.join(FORMATS[format](RECORDS)) == expected
+
+
+def test_formats_sequences():
+    assert ''.join(FORMATS['plain']([(1, 'a'), 2])) == "1 a\n2\n"
+    assert ''.join(FORMATS['csv']([(1, 'a'), 2])) == "1,a\n2\n"
+
+
+class TestSink:
+
+    def test_write_binary(self):
+        stream = io.BytesIO()
+        writes = []
+        stream.write = lambda data, write=stream.write: \
+            writes.append(data) or write(data)
+        sink = Sink(stream, buffer_size=8)
+        assert sink.write(iter(range(10))) == 10
+        assert stream.getvalue() == b"0\n1\n2\n3\n4\n5\n6\n7\n8\n9\n"
+        assert writes == [b"0\n1\n2\n3\n", b"4\n5\n6\n7\n", b"8\n9\n"]
+
+    def test_write_text(self):
+        stream = io.StringIO()
+        assert Sink(stream).write(['ä'], 'jsonl') == 1
+        assert stream.getvalue() == '"ä"\n'
+        with pytest.raises(ValueError):
+            Sink(stream).write([], 'bogus')
+
+    def test_write_broken_pipe(self):
+        class Stream(io.RawIOBase):
+            def writable(self):
+                return True
+            def write(self, data):
+                raise BrokenPipeError
+        consumed = []
+        def records():
+            try:
+                for i in range(100):
+                    consumed.append(i)
+                    yield i
+            finally:
+                consumed.append('closed')
+        with pytest.raises(SystemExit):
+            Sink(Stream(), buffer_size=4).write(records())
+        assert consumed[-1] == 'closed'
+        assert len(consumed) < 10
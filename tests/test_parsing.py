@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from argparse_deco import parsing
+from argparse_deco.parsing import ArgumentParser, SubParsersAction
+
+
+def make_parser(names, suggest=None):
+    parser = ArgumentParser(prog='prog')
+    subparsers = parser.add_subparsers()
+    for name in names:
+        subparsers.add_parser(name)
+    subparsers.suggest = suggest
+    return parser, subparsers
+
+
+def test_subparsers_action():
+    parser, subparsers = make_parser(['foo', 'bar'])
+    assert isinstance(subparsers, SubParsersAction)
+    assert parser.format_usage() == "usage: prog [-h] {foo,bar} ...\n"
+    parser, subparsers = make_parser(
+        [f"cmd{i}" for i in range(parsing.MAX_CHOICES + 1)])
+    assert parser.format_usage() == "usage: prog [-h] COMMAND ...\n"
+    subparsers.metavar = 'CMD'
+    assert parser.format_usage() == "usage: prog [-h] CMD ...\n"
+
+
+def test_check_value(capsys):
+    parser, subparsers = make_parser(
+        ['foo', 'bar'], lambda name: ['foo', 'bar'])
+    with pytest.raises(SystemExit):
+        parser.parse_args(['fo'])
+    assert "invalid choice: 'fo' (did you mean 'foo' or 'bar'?)" in \
+        capsys.readouterr().err
+
+    # without suggestions short lists of choices are shown
+    subparsers.suggest = lambda name: []
+    with pytest.raises(SystemExit):
+        parser.parse_args(['xyz'])
+    assert "choose from" in capsys.readouterr().err
+
+    parser, subparsers = make_parser(
+        [f"cmd{i}" for i in range(parsing.MAX_CHOICES + 1)],
+        lambda name: [])
+    with pytest.raises(SystemExit):
+        parser.parse_args(['xyz'])
+    error = capsys.readouterr().err
+    assert "invalid choice: 'xyz'\n" in error
+    assert "cmd0" not in error
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import contextlib
+import inspect
+
+from argparse_deco.pipeline import Input, split_stages, closing
+
+
+def test_input_lookup():
+    def foo(a, b: Input, c: Input()):
+        pass
+    parameters = inspect.signature(foo).parameters.values()
+    assert [Input.lookup(parameter) for parameter in parameters] == \
+        [False, True, True]
+    assert repr(Input()) == "Input"
+
+
+def test_split_stages():
+    assert split_stages([]) == [[]]
+    assert split_stages(['a', '1', '::', 'b', '::', 'c', '2']) == \
+        [['a', '1'], ['b'], ['c', '2']]
+    assert split_stages(['a', '|', 'b', '::'], '|') == [['a'], ['b', '::']]
+
+
+def test_closing():
+    events = []
+    with contextlib.ExitStack() as stack:
+        stack.callback(events.append, 'closed')
+        generator = closing(iter(range(3)), stack.pop_all())
+    assert events == []
+    assert list(generator) == [0, 1, 2]
+    assert events == ['closed']
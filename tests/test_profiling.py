@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import pstats
+import time
+
+import pytest
+
+from argparse_deco.profiling import Profiler, Sampler
+
+
+def busy(seconds: float=0.05):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiler:
+
+    def test_session(self):
+        profiler = Profiler()
+        with pytest.raises(ValueError):
+            with profiler.session('bogus'):
+                pass
+        with pytest.raises(ValueError):
+            with profiler.session('tracemalloc', 'pstats'):
+                pass
+        with pytest.raises(ValueError):
+            with profiler.session('cprofile', 'pstats'):
+                pass
+
+    def test_cprofile(self, tmp_path, capsys):
+        profiler = Profiler(top=5)
+        with profiler.session('cprofile'):
+            busy()
+        assert 'busy' in capsys.readouterr().err
+        output = tmp_path / 'prof'
+        with profiler.session('cprofile', 'pstats', str(output)):
+            busy()
+        stats = pstats.Stats(str(output))
+        assert any(function == 'busy' for _, _, function in stats.stats)
+
+    def test_sample(self, tmp_path, capsys):
+        profiler = Profiler(interval=0.001)
+        output = tmp_path / 'stacks'
+        with profiler.session('sample', output=str(output)):
+            busy()
+        lines = output.read_text().splitlines()
+        assert any('test_profiling:busy' in line for line in lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+        with profiler.session('sample', 'top'):
+            busy()
+        assert 'samples' in capsys.readouterr().err
+
+    def test_tracemalloc(self, tmp_path):
+        output = tmp_path / 'allocations'
+        with Profiler(top=3).session('tracemalloc', output=str(output)):
+            data = [bytearray(1000) for _ in range(1000)]
+        lines = output.read_text().splitlines()
+        assert lines[0].startswith('peak: ')
+        assert int(lines[0].split()[1]) >= 1000000
+        assert 'test_profiling.py' in lines[2]
+        assert len(lines) <= 5
+
+
+def test_sampler():
+    sampler = Sampler(0, interval=0.001)
+    sampler.counts.update({'a:f;a:g': 3, 'a:f': 1, 'b:h;a:g': 1})
+    assert sampler.collapsed() == ['a:f 1', 'a:f;a:g 3', 'b:h;a:g 1']
+    top = sampler.top(1)
+    assert top[0].startswith('5 samples')
+    assert top[2].split() == ['4', '80.0%', 'a:g']
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import contextlib
+import inspect
+
+import pytest
+
+from argparse_deco.resources import (
+    Resource, Provider, Scope, PROCESS, BATCH, INVOCATION)
+
+
+class TestResource:
+
+    def test__class_getitem__(self):
+        resource = Resource['http']
+        assert isinstance(resource, Resource)
+        assert resource.name == 'http'
+        assert repr(resource) == "Resource['http']"
+        assert repr(Resource()) == "Resource"
+
+    def test_lookup(self):
+        def foo(a, b: Resource, c: Resource('db'), d: Resource()):
+            pass
+        parameters = inspect.signature(foo).parameters
+        assert [Resource.lookup(parameter)
+                for parameter in parameters.values()] == \
+            [None, 'b', 'db', 'd']
+
+
+class TestProvider:
+
+    def test__init__(self):
+        provider = Provider(dict)
+        assert provider.scope == INVOCATION
+        assert repr(provider) == "Provider(dict, scope='invocation')"
+        with pytest.raises(ValueError):
+            Provider(dict, 'bogus')
+
+    def test_create(self):
+        events = []
+        def session():
+            events.append('open')
+            yield 'session'
+            events.append('close')
+        with contextlib.ExitStack() as stack:
+            assert Provider(session, BATCH).create(stack) == 'session'
+            assert Provider(list, PROCESS).create(stack) == []
+            assert events == ['open']
+        assert events == ['open', 'close']
+
+
+class TestScope:
+
+    def test_get(self):
+        calls = []
+        def factory():
+            calls.append(1)
+            return object()
+        provider = Provider(factory)
+        with Scope() as scope:
+            resource = scope.get('foo', provider)
+            assert scope.get('foo', provider) is resource
+            assert len(calls) == 1
+        assert scope.instances == {}
+        assert scope.get('foo', provider) is not resource
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+
+import pytest
+
+from argparse_deco.scheduling import Concurrency, Scheduler, Task
+
+
+def test_concurrency():
+    assert repr(Concurrency('io', 2, 4)) == \
+        "Concurrency('io', cost=2, limit=4)"
+    for kwargs in (dict(cost=0), dict(limit=0)):
+        with pytest.raises(ValueError):
+            Concurrency('io', **kwargs)
+
+
+def test_limits():
+    heavy = Concurrency('heavy', cost=10, limit=2)
+    cheap = Concurrency('cheap')
+    lock = threading.Lock()
+    running = dict(heavy=0, cheap=0)
+    peaks = dict(heavy=0, cheap=0)
+
+    def call(name, value):
+        def run():
+            with lock:
+                running[name] += 1
+                peaks[name] = max(peaks[name], running[name])
+            time.sleep(0.02)
+            with lock:
+                running[name] -= 1
+            return value
+        return run
+    tasks = [Task(i, call('heavy', i), heavy) if i % 3 == 0
+             else Task(i, call('cheap', i), cheap) for i in range(30)]
+    scheduler = Scheduler(6)
+    assert [task.result for task in scheduler.run(tasks)] == list(range(30))
+    assert peaks['heavy'] == 2 and peaks['cheap'] > 2
+    report = scheduler.report()
+    assert (report['heavy']['count'], report['cheap']['count']) == (10, 20)
+    assert report['cheap']['throughput'] > 0
+    assert report['heavy']['p95'] >= report['heavy']['p50'] >= 0.02
+    assert 'heavy' in scheduler.format_report()
+
+
+def test_stealing():
+    event = threading.Event()
+    tasks = [Task(0, lambda: event.wait(5))]
+    tasks += [Task(i, lambda: i) for i in range(1, 9)]
+    # the last task unblocks the first, wherever it was queued
+    tasks.append(Task(9, event.set))
+    assert [task.result for task in Scheduler(2).run(tasks)][0] is True
+
+
+def test_errors():
+    def fail():
+        raise ValueError('bad')
+    tasks = [Task(0, fail), Task(1, None, error=SystemExit(2)),
+             Task(2, lambda: 2)]
+    done = list(Scheduler(2).run(tasks))
+    assert [task.position for task in done] == [0, 1, 2]
+    assert isinstance(done[0].error, ValueError)
+    assert done[1].error.code == 2 and done[2].result == 2
+
+
+def test_cancel():
+    started = []
+    stop = threading.Event()
+
+    def call(i):
+        def run():
+            started.append(i)
+            if i == 0:
+                stop.set()
+                time.sleep(0.05)
+            return i
+        return run
+    tasks = [Task(i, call(i)) for i in range(50)]
+    done = list(Scheduler(1).run(tasks, stop.is_set))
+    assert [task.result for task in done] == [0]
+    assert started == [0]
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import io
+
+from argparse_deco import Arg, Flag
+from argparse_deco.cli import CLI
+from argparse_deco.resources import Resource
+from argparse_deco.shell import Shell
+
+
+def make_prog(created):
+    def connect():
+        created.append('db')
+        return 'db'
+
+    @CLI.provide('db', connect, scope='batch')
+    @CLI("prog")
+    class prog:
+        def add(a: Arg(type=int), b: Arg(type=int),
+                verbose: Flag('--verbose')):
+            return a + b
+
+        def query(sql: Arg(), db: Resource):
+            return f"{db}: {sql}"
+
+        def rows(count: Arg(type=int)):
+            yield from range(count)
+
+        def fail():
+            raise RuntimeError("broken")
+    return prog
+
+
+def run(prog, text: str) -> str:
+    stdout = io.StringIO()
+    Shell(prog, stdin=io.StringIO(text), stdout=stdout).cmdloop()
+    return stdout.getvalue()
+
+
+def test_session(capsys):
+    created = []
+    prog = make_prog(created)
+    output = run(prog, "add 1 2\n\nquery 'select 1'\nquery x\n"
+                       "add 1\nfail\nrows 2\nhelp add\nadd 3 4\n")
+    assert output.split('\n') == [
+        'prog> 3', 'prog> prog> db: select 1', 'prog> db: x',
+        'prog> prog> prog> 0', '1', 'prog> prog> 7', 'prog> ', '']
+    # the resource lives for the whole session
+    assert created == ['db']
+    captured = capsys.readouterr()
+    assert 'usage: prog add' in captured.out
+    assert 'the following arguments are required: b' in captured.err
+    assert 'RuntimeError: broken' in captured.err
+
+
+def test_exit():
+    created = []
+    output = run(make_prog(created), "add 1 2\nexit\nadd 3 4\n")
+    assert output == 'prog> 3\nprog> '
+
+
+def test_complete():
+    shell = Shell(make_prog([]))
+    assert shell.completenames('a') == ['add']
+    assert shell.completenames('--') == ['--help']
+    line = 'add 1 --v'
+    assert shell.completedefault('--v', line, 6, len(line)) == ['--verbose']
+    assert shell.completedefault('', 'bogus ', 6, 6)[:3] == \
+        ['--help', '-h', 'add']
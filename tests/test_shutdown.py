@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import signal
+
+import pytest
+
+from argparse_deco.fanout import FanoutError, fan_out
+from argparse_deco.shutdown import (
+    Cancelled, CancellationToken, Shutdown, current)
+
+
+class TestCancellationToken:
+
+    def test_cancel(self):
+        token = CancellationToken()
+        calls = []
+        token.add_callback(lambda: calls.append(1))
+        token.check()
+        assert not token.wait(0.01)
+        token.cancel(signal.SIGINT)
+        token.cancel(signal.SIGTERM)
+        assert token.cancelled and token.wait(0)
+        assert (token.signum, token.exit_code) == (signal.SIGINT, 130)
+        assert calls == [1]
+        token.add_callback(lambda: calls.append(2))
+        assert calls == [1, 2]
+        with pytest.raises(Cancelled):
+            token.check()
+
+    def test_remove_callback(self):
+        token = CancellationToken()
+        calls = []
+        token.add_callback(calls.append)
+        token.remove_callback(calls.append)
+        token.cancel()
+        assert calls == [] and token.exit_code == 143
+
+
+class TestShutdown:
+
+    def test_handlers(self):
+        previous = signal.getsignal(signal.SIGTERM)
+        assert current() is None
+        with Shutdown(grace=None) as token:
+            assert current() is token
+            os.kill(os.getpid(), signal.SIGTERM)
+            assert token.cancelled and token.exit_code == 143
+            with pytest.raises(KeyboardInterrupt):
+                os.kill(os.getpid(), signal.SIGINT)
+        assert current() is None
+        assert signal.getsignal(signal.SIGTERM) is previous
+
+    def test_grace(self):
+        with Shutdown(grace=0.05) as token:
+            with pytest.raises(KeyboardInterrupt):
+                os.kill(os.getpid(), signal.SIGINT)
+                token.wait(5)
+                # sleeping on is interrupted after the grace period
+                while True:
+                    signal.pause()
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_fan_out(jobs):
+    def call(item):
+        if item == 1:
+            os.kill(os.getpid(), signal.SIGTERM)
+        return item
+    with Shutdown() as token:
+        with pytest.raises(FanoutError) as info:
+            fan_out(call, range(20), jobs)
+    assert token.cancelled
+    errors = info.value.errors
+    assert 0 < len(errors) < 20
+    assert all(isinstance(error, Cancelled) for item, error in errors)
+    assert info.value.results[:2] == [0, 1]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import io
+
+import pytest
+
+from argparse_deco import streams
+from argparse_deco.streams import (
+    split_records, iter_records, ResponseFile, Responses, RecordStream)
+
+
+def test_split_records():
+    assert list(split_records(b"a\nb\r\n\nc")) == ['a', 'b', 'c']
+    assert list(split_records(b"a b\0c\nd\0")) == ['a b', 'c\nd']
+    assert list(split_records(b"a;b;", b';')) == ['a', 'b']
+    assert list(split_records(b"")) == []
+
+
+@pytest.mark.parametrize('threshold', [0, 1 << 20])
+def test_iter_records(tmp_path, monkeypatch, threshold):
+    monkeypatch.setattr(streams, 'MMAP_THRESHOLD', threshold)
+    path = tmp_path / "paths.txt"
+    path.write_bytes(b"foo\nbar baz\n")
+    records = iter_records(path)
+    assert not isinstance(records, list)
+    assert list(records) == ['foo', 'bar baz']
+
+
+def test_responses(tmp_path):
+    path = tmp_path / "paths.txt"
+    path.write_bytes(b"foo\0bar\0")
+    responses = Responses(['x']) + [ResponseFile(str(path)), 'y']
+    assert repr(responses) == \
+        f"Responses(['x', ResponseFile({str(path)!r}), 'y'])"
+    assert list(responses) == ['x', 'foo', 'bar', 'y']
+    # iterating twice reads the file again
+    assert list(responses) == ['x', 'foo', 'bar', 'y']
+
+
+class TestRecordStream:
+
+    @pytest.mark.parametrize('buffer_size', [1, 3, 1 << 20])
+    def test_lines(self, tmp_path, buffer_size):
+        path = tmp_path / "records"
+        path.write_bytes(b"a\nbb\r\n\nccc\nlong line\ndd")
+        stream = RecordStream(str(path), batch_size=2,
+                              buffer_size=buffer_size)
+        assert list(stream) == [[b'a', b'bb'], [b'', b'ccc'],
+                                [b'long line', b'dd']]
+        assert list(stream.records())[-1] == b'dd'
+
+    def test_delimiter(self, tmp_path):
+        path = tmp_path / "records"
+        path.write_bytes(b"a\nb\0c\0")
+        assert list(RecordStream(str(path), b'\0', buffer_size=2)) == \
+            [[b'a\nb', b'c']]
+
+    @pytest.mark.parametrize('buffer_size', [1, 7, 1 << 20])
+    def test_chunks(self, tmp_path, buffer_size):
+        path = tmp_path / "records"
+        path.write_bytes(bytes(range(10)))
+        stream = RecordStream(str(path), size=4, batch_size=2,
+                              buffer_size=buffer_size)
+        assert list(stream) == [[bytes(range(4)), bytes(range(4, 8))],
+                                [bytes(range(8, 10))]]
+
+    def test_stdin(self, monkeypatch):
+        monkeypatch.setattr('sys.stdin', io.TextIOWrapper(io.BytesIO(
+            b"x\ny\n")))
+        assert list(RecordStream('-')) == [[b'x', b'y']]
+        with pytest.raises(ValueError):
+            RecordStream('-', delimiter=b'')
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+from argparse_deco.suggest import distance, ngrams, NGramIndex
+
+
+def test_distance():
+    assert distance('', '') == 0
+    assert distance('list', 'list') == 0
+    assert distance('list', 'lsit') == 1
+    assert distance('show', 'shwo') == 1
+    assert distance('ca', 'abc') == 3
+    assert distance('status', 'stats') == 1
+    assert distance('', 'abc') == distance('abc', '') == 3
+    assert distance('abcdef', 'uvwxyz', 2) == 3
+    assert distance('abcdef', 'a', 2) == 3
+    assert distance('abcdef', 'abcdfe', 2) == 1
+
+
+def test_ngrams():
+    assert ngrams('ab') == {'^^a', '^ab', 'ab$'}
+
+
+class TestNGramIndex:
+
+    def test_add(self):
+        index = NGramIndex(['foo', 'bar', 'foo'])
+        assert len(index) == 2
+        assert index.postings['^fo'] == ['foo']
+
+    def test_suggest(self):
+        names = [f"{verb}-{noun}" for verb in ('list', 'show', 'delete')
+                 for noun in ('user', 'group', 'role', 'policy')]
+        index = NGramIndex(names)
+        assert index.suggest('lsit-user')[0] == 'list-user'
+        assert index.suggest('show-gruop', 1) == ['show-group']
+        assert index.suggest('delete-polcy')[0] == 'delete-policy'
+        assert index.suggest('xyzzy') == []
+
+    def test_suggest_large(self):
+        index = NGramIndex(f"command-{i}" for i in range(5000))
+        assert index.suggest('comand-4242')[0] == 'command-4242'
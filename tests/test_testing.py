@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import sys
+
+from argparse_deco.testing import Result, captured
+
+
+def test_result():
+    result = Result()
+    assert repr(result) == "<Result exit_code=0>"
+    result.stdout_bytes = "ä".encode()
+    assert result.stdout == "ä"
+    result.exception = KeyError('foo')
+    result.exit_code = 1
+    assert repr(result) == "<Result exit_code=1 KeyError('foo')>"
+
+
+def test_captured(monkeypatch):
+    monkeypatch.setenv('ARGPARSE_DECO_UNSET', 'value')
+    monkeypatch.delenv('ARGPARSE_DECO_SET', raising=False)
+    stdout = sys.stdout
+    with captured(dict(ARGPARSE_DECO_SET='foo', ARGPARSE_DECO_UNSET=None),
+                  stdin="input") as result:
+        assert os.environ['ARGPARSE_DECO_SET'] == 'foo'
+        assert 'ARGPARSE_DECO_UNSET' not in os.environ
+        assert sys.stdin.read() == "input"
+        print("out")
+        sys.stdout.buffer.write(b"bytes\n")
+        print("err", file=sys.stderr)
+    assert sys.stdout is stdout
+    assert 'ARGPARSE_DECO_SET' not in os.environ
+    assert os.environ['ARGPARSE_DECO_UNSET'] == 'value'
+    assert result.stdout == "out\nbytes\n"
+    assert result.stderr == "err\n"
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+import array
+
+import pytest
+
+from argparse_deco.vectors import ranges_type, vector_type
+
+
+def test_vector_type():
+    vector = vector_type('d')
+    assert vector('0.1,0.2,,3') == array.array('d', [0.1, 0.2, 3])
+    assert vector_type('h')('1,-2') == array.array('h', [1, -2])
+    for text in ('1,x', '1.5'):
+        with pytest.raises(ValueError):
+            vector_type('i')(text)
+    with pytest.raises(ValueError):
+        vector_type('b')('1000')
+
+
+def test_ranges_type():
+    ranges = ranges_type()
+    assert ranges('1-100000:2') == range(1, 100001, 2)
+    assert ranges('5-1') == range(5, 0, -1)
+    assert ranges('7') == array.array('q', [7])
+    assert ranges('1-10:3,20,30-31') == \
+        array.array('q', [1, 4, 7, 10, 20, 30, 31])
+    # negative items and bounds
+    assert ranges('1,-3') == array.array('q', [1, -3])
+    assert ranges('-3') == array.array('q', [-3])
+    assert ranges('-5--1') == range(-5, 0)
+    assert ranges('2--2:2') == range(2, -3, -2)
+    assert ranges('-1-1,9') == array.array('q', [-1, 0, 1, 9])
+    for text in ('1-x', '1-5:0', '1-5:-1', 'a', '5:2', '1-2-3', '--1'):
+        with pytest.raises(ValueError):
+            ranges(text)
+    with pytest.raises(ValueError):
+        ranges_type('B')('1,256')
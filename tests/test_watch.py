@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 by Gregor Giesen
+#
+# This file is part of argparse-deco.
+#
+# argparse-deco is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License,
+# or (at your option) any later version.
+#
+# argparse-deco is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with argparse-deco. If not, see <http://www.gnu.org/licenses/>.
+
+
+import inspect
+import threading
+
+import pytest
+
+from argparse_deco.watch import Changes, Inotify, Polling, Watcher
+
+
+def touch(path, text='x'):
+    with open(path, 'a') as fp:
+        fp.write(text)
+
+
+@pytest.fixture(params=['polling', 'inotify'])
+def source(request, tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'file').write_text('')
+    (tmp_path / 'sub' / 'other').write_text('')
+    paths = [str(tmp_path / 'sub'), str(tmp_path / 'file')]
+    if request.param == 'polling':
+        source = Polling(paths, interval=0.01)
+    else:
+        try:
+            source = Inotify(paths)
+        except (OSError, AttributeError, TypeError):
+            pytest.skip("inotify is not available")
+    yield source
+    source.close()
+
+
+def test_source(source, tmp_path):
+    assert source.read(0.05) == set()
+    touch(tmp_path / 'file')
+    assert source.read(0.05) == {str(tmp_path / 'file')}
+    touch(tmp_path / 'unwatched')
+    touch(tmp_path / 'sub' / 'other')
+    assert source.read(0.05) == {str(tmp_path / 'sub' / 'other')}
+    (tmp_path / 'sub' / 'new').mkdir()
+    source.read(0.05)
+    touch(tmp_path / 'sub' / 'new' / 'deep')
+    assert str(tmp_path / 'sub' / 'new' / 'deep') in source.read(0.05)
+
+
+@pytest.mark.parametrize('polling', [True, False])
+def test_relative_paths(tmp_path, monkeypatch, polling):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'sub').mkdir()
+    touch('foo.txt')
+    try:
+        source = Polling(['foo.txt', 'sub'], interval=0.01) if polling \
+            else Inotify(['foo.txt', 'sub'])
+    except (OSError, AttributeError, TypeError):
+        pytest.skip("inotify is not available")
+    try:
+        touch('foo.txt')
+        assert source.read(0.05) == {'foo.txt'}
+        touch(tmp_path / 'sub' / 'bar')
+        assert source.read(0.05) == {'sub/bar'}
+    finally:
+        source.close()
+
+
+class TestWatcher:
+
+    @pytest.mark.parametrize('polling', [True, False])
+    def test_wait(self, tmp_path, polling):
+        path = str(tmp_path / 'file')
+        touch(path)
+        with Watcher([str(tmp_path)], debounce=0.2, interval=0.01,
+                     polling=polling) as watcher:
+            assert watcher.wait(0.05) is None
+
+            def edit():
+                for name in ('file', 'second'):
+                    touch(tmp_path / name)
+                    threading.Event().wait(0.05)
+            thread = threading.Thread(target=edit)
+            thread.start()
+            # changes are collected until nothing changed for a while
+            assert watcher.wait(5) == {path, str(tmp_path / 'second')}
+            thread.join()
+
+
+def test_changes():
+    def foo(a: Changes, b: Changes(), c):
+        pass
+    parameters = inspect.signature(foo).parameters
+    assert Changes.lookup(parameters['a'])
+    assert Changes.lookup(parameters['b'])
+    assert not Changes.lookup(parameters['c'])